@@ -0,0 +1,20 @@
+# ============================================================================
+# GUNICORN.CONF.PY - Production WSGI server settings (picked up by `gunicorn`)
+# ============================================================================
+#
+# WEB_CONCURRENCY worker processes of GUNICORN_THREADS threads each: every
+# thread serves one request at a time with its own database connection, so
+# the database settings (DATABASE_POOL_MAX_SIZE, see settings.py) are sized
+# from the same numbers.
+
+import multiprocessing
+import os
+
+wsgi_app = 'zonner_backend.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+# Recycle workers now and then, staggered, so slow leaks can't build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
@@ -0,0 +1,19 @@
+"""
+Celery application for zonner_backend.
+
+Configured from the CELERY_* Django settings; tasks live in each app's
+tasks.py. Start a worker and the beat scheduler with:
+
+    celery -A zonner_backend worker -l info
+    celery -A zonner_backend beat -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zonner_backend.settings')
+
+app = Celery('zonner_backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -76,6 +76,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS
 
 
 MIDDLEWARE = [
+    'zooner.profiling.ProfilingMiddleware',  # Off unless PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files serving
@@ -110,13 +111,92 @@ WSGI_APPLICATION = 'zonner_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite tuned for several gunicorn workers writing at once: WAL lets
+# readers run alongside the (single) writer, writers queue for up to
+# SQLITE_TIMEOUT seconds instead of failing with "database is locked", and
+# IMMEDIATE transactions take the write lock up front, since a read lock
+# can't be upgraded while another connection writes. The PRAGMAs run on
+# every new connection; WAL is stored in the database file, set once by
+# migration 0014, so merely connecting never rewrites the file.
+SQLITE_PATH = config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3'))
+SQLITE_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL;'  # Durable across crashes of the app in WAL mode; fsyncs at checkpoints
+    f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)};"
+    f"PRAGMA cache_size=-{config('SQLITE_CACHE_KB', default=64 * 1024, cast=int)};"  # Negative: in KiB
+    'PRAGMA temp_store=MEMORY'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_PATH,
+        'OPTIONS': {
+            'timeout': config('SQLITE_TIMEOUT', default=20, cast=int),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_PRAGMAS,
+        },
+        # A file rather than in-memory, so the threaded tests get connections
+        # of their own and SQLite's real locking
+        'TEST': {'NAME': str(BASE_DIR / 'test_db.sqlite3')},
     }
 }
 
+# Optional read-only connection serving the public list/detail GETs
+# (zooner.routers): the database file itself (SQLITE_READ_REPLICA=True),
+# so reads never queue behind the write lock, or a replicated copy of it
+# (SQLITE_READ_REPLICA_PATH, e.g. kept by Litestream or LiteFS).
+SQLITE_READ_REPLICA_PATH = config(
+    'SQLITE_READ_REPLICA_PATH',
+    default=SQLITE_PATH if config('SQLITE_READ_REPLICA', default=False, cast=bool) else '',
+)
+if SQLITE_READ_REPLICA_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{SQLITE_READ_REPLICA_PATH}?mode=ro',
+        'OPTIONS': {
+            'timeout': config('SQLITE_TIMEOUT', default=20, cast=int),
+            'init_command': 'PRAGMA query_only=ON;' + SQLITE_PRAGMAS,
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# PostgreSQL (or any DATABASE_URL dj-database-url understands) instead of
+# SQLite. Each gunicorn worker process runs GUNICORN_THREADS requests at a
+# time (gunicorn.conf.py), each holding one connection while it runs:
+#
+#   * By default connections persist across requests for
+#     DATABASE_CONN_MAX_AGE seconds, one per thread, and are checked before
+#     being reused after an error (conn_health_checks); no connection setup
+#     (TCP, TLS, auth) per request.
+#   * DATABASE_POOL=True (psycopg 3 with psycopg-pool) shares a pool of
+#     DATABASE_POOL_MIN_SIZE..DATABASE_POOL_MAX_SIZE connections between
+#     the threads of a process instead; a request waits up to
+#     DATABASE_POOL_TIMEOUT seconds for one. Size max to the threads: more
+#     is never used, fewer makes requests queue.
+#
+# Either way a deployment can open WEB_CONCURRENCY x GUNICORN_THREADS
+# connections (x max size when pooled), plus the Celery workers': keep that
+# under the server's max_connections, or put PgBouncer in front.
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=4, cast=int)  # Read by gunicorn.conf.py too
+DATABASE_URL = config('DATABASE_URL', default='')
+if DATABASE_URL:
+    DATABASES = {
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=config('DATABASE_CONN_MAX_AGE', default=600, cast=int),
+            conn_health_checks=True,
+        ),
+    }
+    if config('DATABASE_POOL', default=False, cast=bool):
+        DATABASES['default']['CONN_MAX_AGE'] = 0  # The pool keeps them open; Django refuses both
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': config('DATABASE_POOL_MIN_SIZE', default=1, cast=int),
+            'max_size': config('DATABASE_POOL_MAX_SIZE', default=GUNICORN_THREADS, cast=int),
+            'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=int),
+        }
+
+DATABASE_ROUTERS = ['zooner.routers.ReplicaRouter']
+
 # Custom User Model
 AUTH_USER_MODEL = 'zooner.User'
 
@@ -195,6 +275,7 @@ REST_FRAMEWORK = {
         'user': '1000/hour',
         'login': '5/minute',
         'register': '3/minute',
+        'engagement': '120/minute',
     },
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -217,7 +298,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # Recorded by zooner.activity, at most once per ACTIVITY_WRITE_INTERVAL
+    'UPDATE_LAST_LOGIN': False,
     
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -315,11 +397,58 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers.DatabaseScheduler'
+CELERY_TASK_IGNORE_RESULT = True
+# Run tasks inline instead of through the broker (tests, or development
+# without Redis); CELERY_BROKER_URL=memory:// also works for a local worker
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+CELERY_TASK_EAGER_PROPAGATES = True
+# Tasks are queued from the request (zooner.signals): when the broker is
+# down, fail the publish at once (logged, the request still succeeds)
+# instead of retrying the publish and the connection (2s of sleeps), and
+# give up connecting after a fraction of a second. Workers still reconnect
+# (broker_connection_retry).
+CELERY_TASK_PUBLISH_RETRY = False
+CELERY_BROKER_CONNECTION_TIMEOUT = config('CELERY_BROKER_CONNECTION_TIMEOUT', default=0.3, cast=float)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'max_retries': 0,
+    'socket_connect_timeout': CELERY_BROKER_CONNECTION_TIMEOUT,
+}
+# Installed into django_celery_beat's database schedule on beat startup
+CELERY_BEAT_SCHEDULE = {
+    'flush-counter-shards': {
+        'task': 'zooner.tasks.flush_counters',
+        'schedule': 60.0,
+    },
+    'replay-engagement-log': {
+        'task': 'zooner.tasks.replay_engagement_log',
+        'schedule': 60.0,
+    },
+    'rollup-business-analytics': {
+        'task': 'zooner.tasks.rollup_business_analytics',
+        'schedule': 15 * 60.0,
+    },
+}
 
 # =============================================================================
 # CACHING CONFIGURATION
 # =============================================================================
 
+# Rendered responses of the public catalogue endpoints (zooner.cache).
+# Local memory by default; set RESPONSE_CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache and
+# RESPONSE_CACHE_LOCATION to a directory to share entries between processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default='zoner-responses'),
+        'TIMEOUT': config('RESPONSE_CACHE_TTL', default=300, cast=int),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
 # CACHES = {
 #     'default': {
 #         'BACKEND': 'django_redis.cache.RedisCache',
@@ -359,6 +488,10 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'message': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -372,6 +505,13 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        'profiling': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': config('PROFILING_LOG', default=str(BASE_DIR / 'logs' / 'profiling.log')),
+            'formatter': 'message',
+            'delay': True,  # Only created once something is profiled
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -388,6 +528,12 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # One JSON line per profiled request, see zooner.profiling
+        'zooner.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -432,4 +578,60 @@ ZONER_SETTINGS = {
     'MAX_IMAGES_PER_POST': 5,
     'FEATURED_BUSINESS_DURATION_DAYS': 30,
     'VERIFICATION_REQUIRED_FOR_FEATURES': ['messaging', 'analytics'],
+    # Posts with at least this many likes spread like/comment counter writes
+    # over COUNTER_SHARDS rows, flushed into Post by `flush_counters`
+    'SHARDED_COUNTER_THRESHOLD': config('SHARDED_COUNTER_THRESHOLD', default=1000, cast=int),
+    'COUNTER_SHARDS': 16,
+    # Precomputed home feeds (?following=1). Businesses with more followers
+    # than TIMELINE_FANOUT_LIMIT are merged in at read time instead.
+    'TIMELINE_ENABLED': config('TIMELINE_ENABLED', default=False, cast=bool),
+    'TIMELINE_FANOUT_LIMIT': config('TIMELINE_FANOUT_LIMIT', default=10000, cast=int),
+    'TIMELINE_BACKFILL_POSTS': 50,
+    # /businesses/nearby/: per-process LRU of geohash cells
+    'NEARBY_MAX_RADIUS_KM': 50,
+    'NEARBY_CACHE_SIZE': 1024,
+    'NEARBY_CACHE_TTL': 60,
+    # Anonymous catalogue responses (towns, categories, businesses) served
+    # from CACHES['responses'], see zooner.cache
+    'RESPONSE_CACHE_ENABLED': config('RESPONSE_CACHE_ENABLED', default=True, cast=bool),
+    # Replies embedded under each top-level comment; the rest are paged from
+    # /posts/<id>/comments/<id>/replies/
+    'COMMENT_REPLIES_LIMIT': 3,
+    # Like/comment/follow/message notifications of one target are merged
+    # into the recipient's unread one if it is younger than this (seconds)
+    'NOTIFICATION_COALESCE_WINDOW': config('NOTIFICATION_COALESCE_WINDOW', default=3600, cast=int),
+    # Logins and token refreshes write User.last_login/last_active at most
+    # once per user per this many seconds (zooner.activity)
+    'ACTIVITY_WRITE_INTERVAL': config('ACTIVITY_WRITE_INTERVAL', default=300, cast=int),
+    # /dashboard/stats/ per owner; analytics rollups and business edits
+    # refresh it sooner, counter changes (likes, follows) only after this
+    'DASHBOARD_CACHE_TTL': config('DASHBOARD_CACHE_TTL', default=120, cast=int),
+    # /businesses/<id>/analytics/: sums of closed days (zooner.analytics.series)
+    # are cached this long, or until a backfill rewrites them; a series spans
+    # at most ANALYTICS_MAX_POINTS buckets
+    'ANALYTICS_CACHE_TTL': config('ANALYTICS_CACHE_TTL', default=86400, cast=int),
+    'ANALYTICS_MAX_POINTS': 400,
+    # Per-request SQL/serializer profiling (zooner.profiling) of a sample of
+    # requests: Server-Timing headers and JSON lines in PROFILING_LOG,
+    # summarized by `manage.py profile_report`
+    'PROFILING_ENABLED': config('PROFILING_ENABLED', default=False, cast=bool),
+    'PROFILING_SAMPLE_RATE': config('PROFILING_SAMPLE_RATE', default=1.0, cast=float),
+    'PROFILING_DUPLICATE_THRESHOLD': 3,  # Same SQL this often in one request: likely an N+1
+    'PROFILING_SERVER_TIMING': config('PROFILING_SERVER_TIMING', default=True, cast=bool),
+    'PROFILING_LOG': config('PROFILING_LOG', default=str(BASE_DIR / 'logs' / 'profiling.log')),
+    # POST /engagement/ (zooner.engagement): events are logged to
+    # ENGAGEMENT_LOG_DIR and bulk-inserted every FLUSH_SIZE events or
+    # FLUSH_INTERVAL seconds; past MAX_PENDING unstored events batches get 503
+    'ENGAGEMENT_MAX_BATCH': 500,
+    'ENGAGEMENT_FLUSH_SIZE': config('ENGAGEMENT_FLUSH_SIZE', default=2000, cast=int),
+    'ENGAGEMENT_FLUSH_INTERVAL': config('ENGAGEMENT_FLUSH_INTERVAL', default=2, cast=int),
+    'ENGAGEMENT_MAX_PENDING': config('ENGAGEMENT_MAX_PENDING', default=50000, cast=int),
+    'ENGAGEMENT_LOG_DIR': config('ENGAGEMENT_LOG_DIR', default=str(BASE_DIR / 'logs' / 'engagement')),
+    'ENGAGEMENT_LOG_FSYNC': config('ENGAGEMENT_LOG_FSYNC', default=False, cast=bool),
+    # WebSocket pushes on /ws/ (zooner.websocket). The in-process broker only
+    # reaches sockets of the publishing process; run several ASGI workers
+    # with zooner.realtime.RedisBroker instead.
+    'REALTIME_ENABLED': config('REALTIME_ENABLED', default=False, cast=bool),
+    'REALTIME_BROKER': config('REALTIME_BROKER', default='zooner.realtime.InProcessBroker'),
+    'REALTIME_REDIS_URL': config('REALTIME_REDIS_URL', default='redis://localhost:6379/2'),
 }
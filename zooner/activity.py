@@ -0,0 +1,45 @@
+# ============================================================================
+# ACTIVITY.PY - Coalesced User.last_login / last_active writes
+# ============================================================================
+#
+# Every token handed out (login, refresh) means the user is active, but
+# writing their row each time turns a login storm after an app release
+# into a storm of UPDATEs on the users table. touch() records a user's
+# activity at most once per ACTIVITY_WRITE_INTERVAL instead: the first call
+# of an interval wins a cache.add() on a per-user key and writes the
+# timestamps with a single UPDATE; the calls after it within the interval
+# are dropped. last_login and last_active are therefore up to
+# ACTIVITY_WRITE_INTERVAL behind, per cache (per process with the default
+# LocMemCache, shared with Redis).
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import User
+
+
+def _key(user_id, login):
+    return f'activity:{"login" if login else "active"}:{user_id}'
+
+
+def touch(user_id, login=False):
+    """
+    Update last_active (and with ``login`` last_login) of ``user_id``,
+    unless that was done within the interval; returns whether it was.
+    """
+    interval = settings.ZONER_SETTINGS['ACTIVITY_WRITE_INTERVAL']
+    if not caches['default'].add(_key(user_id, login), True, interval):
+        return False
+    record(user_id, timezone.now(), login)
+    return True
+
+
+def record(user_id, at, login=False):
+    """Write the timestamps in one UPDATE, never moving them back"""
+    # Through update(): no post_save, so no cache invalidation for a timestamp
+    fields = {'last_active': Greatest(F('last_active'), at)}
+    if login:
+        fields['last_login'] = Greatest(Coalesce(F('last_login'), at), at)
+    User.objects.filter(pk=user_id).update(**fields)
@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils import timezone
 from .models import (
     User, Town, Category, Business, Post, Follow, Like, Comment,
@@ -18,12 +18,16 @@ class UserAdmin(BaseUserAdmin):
     list_display = ['username', 'email', 'role', 'is_verified', 'is_active', 'last_active', 'created_at']
     list_filter = ['role', 'is_verified', 'is_active', 'is_staff', 'date_joined']
     search_fields = ['username', 'email', 'first_name', 'last_name']
-    readonly_fields = ['id', 'created_at', 'updated_at', 'last_login', 'date_joined']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'last_login', 'date_joined', 'followers_count', 'following_count']
     
     fieldsets = BaseUserAdmin.fieldsets + (
         ('Profile Information', {
             'fields': ('phone_number', 'bio', 'location', 'profile_image', 'role', 'is_verified')
         }),
+        ('Statistics', {
+            'fields': ('followers_count', 'following_count'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'last_active'),
             'classes': ('collapse',)
@@ -46,12 +50,14 @@ class TownAdmin(admin.ModelAdmin):
     readonly_fields = ['id', 'created_at', 'business_count']
     
     def business_count(self, obj):
-        return obj.businesses.count()
-    business_count.short_description = 'Businesses'
+        return obj.business_count
+    business_count.short_description = 'Active businesses'
+    business_count.admin_order_field = 'business_count'
     
     def get_queryset(self, request):
+        # Same definition as businesses_count in the API
         return super().get_queryset(request).annotate(
-            business_count=Count('businesses')
+            business_count=Count('businesses', filter=Q(businesses__status='active'))
         )
 
 
@@ -80,8 +86,15 @@ class CategoryAdmin(admin.ModelAdmin):
     color_display.short_description = 'Color'
     
     def business_count(self, obj):
-        return obj.businesses.count()
-    business_count.short_description = 'Businesses'
+        return obj.business_count
+    business_count.short_description = 'Active businesses'
+    business_count.admin_order_field = 'business_count'
+    
+    def get_queryset(self, request):
+        # Same definition as businesses_count in the API
+        return super().get_queryset(request).annotate(
+            business_count=Count('businesses', filter=Q(businesses__status='active'))
+        )
 
 
 # Business Admin
@@ -90,7 +103,7 @@ class BusinessAdmin(admin.ModelAdmin):
     list_display = ['name', 'owner', 'town', 'category', 'status', 'is_verified', 'is_featured', 'followers_count', 'posts_count', 'created_at']
     list_filter = ['status', 'is_verified', 'is_featured', 'category', 'town', 'created_at']
     search_fields = ['name', 'description', 'owner__username', 'owner__email']
-    readonly_fields = ['id', 'slug', 'created_at', 'updated_at', 'followers_count', 'posts_count']
+    readonly_fields = ['id', 'slug', 'created_at', 'updated_at', 'followers_count', 'posts_count', 'likes_count']
     raw_id_fields = ['owner']
     list_editable = ['status', 'is_verified', 'is_featured']
     
@@ -111,7 +124,7 @@ class BusinessAdmin(admin.ModelAdmin):
             'fields': ('business_hours', 'status', 'is_featured', 'is_verified')
         }),
         ('Statistics', {
-            'fields': ('followers_count', 'posts_count'),
+            'fields': ('followers_count', 'posts_count', 'likes_count'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -216,10 +229,10 @@ class CommentAdmin(admin.ModelAdmin):
 # Chat Admin
 @admin.register(Chat)
 class ChatAdmin(admin.ModelAdmin):
-    list_display = ['id', 'chat_type', 'business', 'participant_list', 'is_active', 'updated_at']
+    list_display = ['id', 'chat_type', 'business', 'participant_list', 'is_active', 'last_message_at', 'updated_at']
     list_filter = ['chat_type', 'is_active', 'created_at']
     search_fields = ['business__name', 'participants__username']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'last_message_at', 'created_at', 'updated_at']
     raw_id_fields = ['business']
     filter_horizontal = ['participants']
     
@@ -251,10 +264,10 @@ class MessageAdmin(admin.ModelAdmin):
 # Notification Admin
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['recipient', 'notification_type', 'title', 'is_read', 'is_sent', 'created_at']
+    list_display = ['recipient', 'notification_type', 'title', 'events_count', 'is_read', 'is_sent', 'updated_at']
     list_filter = ['notification_type', 'is_read', 'is_sent', 'created_at']
     search_fields = ['recipient__username', 'sender__username', 'title', 'message']
-    readonly_fields = ['id', 'created_at', 'read_at']
+    readonly_fields = ['id', 'events_count', 'created_at', 'read_at']
     raw_id_fields = ['recipient', 'sender', 'related_post', 'related_business', 'related_chat']
     list_editable = ['is_sent']
     date_hierarchy = 'created_at'
@@ -0,0 +1,298 @@
+# ============================================================================
+# ANALYTICS.PY - Daily BusinessAnalytics rollups
+# ============================================================================
+#
+# BusinessAnalytics holds one row per business per day, aggregated from the
+# raw activity tables:
+#
+#   profile_views, post_views, reach  UserEngagement ('profile_view' / 'view')
+#   new_followers                     Follow
+#   total_likes, total_comments       Like, Comment on the business's posts
+#   engagement_rate                   (likes + comments) / post views, in %
+#
+# Every metric is one grouped query over a date range (GROUP BY business,
+# day) whatever the number of businesses, and the results are upserted with
+# bulk_create(update_conflicts=True). Whole days are always recomputed, so a
+# run is idempotent and any range can be re-run; rows for days that no
+# longer have any activity are removed.
+#
+# rollup() is incremental: a RollupWatermark records when the last run
+# started, and the next run only recomputes the days from that point minus
+# ROLLUP_LAG, which covers rows still being committed. Engagement rows can
+# be written long after their created_at (a replayed log segment keeps its
+# events' time): the run also goes back to the oldest day of the rows
+# written since the watermark (UserEngagement.written_at). Backfills go
+# through the same code in chunks of CHUNK_DAYS.
+#
+# No share events are recorded yet, so total_shares stays 0.
+#
+# series() serves the charts: the rows of one business summed per day, week
+# or month in the database. Days before closed_before() are only rewritten
+# by backfills, so their part of a series is cached until one runs
+# (HISTORY_NAMESPACE); only the open days are read on every request.
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from . import cache
+from .models import BusinessAnalytics, Comment, Follow, Like, RollupWatermark, UserEngagement
+
+WATERMARK = 'business_analytics'
+ROLLUP_LAG = timedelta(hours=1)
+CHUNK_DAYS = 31
+BATCH_SIZE = 1000
+METRICS = ('profile_views', 'post_views', 'reach', 'new_followers', 'total_likes', 'total_comments')
+HISTORY_NAMESPACE = 'analytics-history'
+MAX_RATE = Decimal('999.99')  # engagement_rate is DecimalField(max_digits=5, decimal_places=2)
+
+
+def _bounds(first_day, last_day):
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return start, end
+
+
+def _grouped(queryset, business, start, end, **metrics):
+    """``{(business id, day): {metric: value}}`` of one grouped query"""
+    rows = (
+        queryset.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(business_key=business, day=TruncDate('created_at'))
+        .exclude(business_key=None)
+        .values('business_key', 'day')
+        .annotate(**metrics)
+        .order_by()
+    )
+    return {(row.pop('business_key'), row.pop('day')): row for row in rows}
+
+
+def compute(first_day, last_day):
+    """Metrics of every business with activity between the two days (inclusive)"""
+    start, end = _bounds(first_day, last_day)
+    sources = [
+        _grouped(
+            UserEngagement.objects.filter(engagement_type__in=('view', 'profile_view')),
+            Coalesce('related_post__business', 'related_business'), start, end,
+            profile_views=Count('id', filter=Q(engagement_type='profile_view')),
+            post_views=Count('id', filter=Q(engagement_type='view')),
+            reach=Count('user', distinct=True),
+        ),
+        _grouped(Follow.objects.all(), F('business'), start, end, new_followers=Count('id')),
+        _grouped(Like.objects.all(), F('post__business'), start, end, total_likes=Count('id')),
+        _grouped(Comment.objects.filter(is_active=True), F('post__business'), start, end,
+                 total_comments=Count('id')),
+    ]
+    days = {}
+    for source in sources:
+        for key, values in source.items():
+            days.setdefault(key, dict.fromkeys(METRICS, 0)).update(values)
+    return days
+
+
+def engagement_rate(metrics):
+    if not metrics['post_views']:
+        return Decimal('0.00')
+    rate = Decimal(100 * (metrics['total_likes'] + metrics['total_comments'])) / metrics['post_views']
+    return min(rate, MAX_RATE).quantize(Decimal('0.01'))
+
+
+def rollup_range(first_day, last_day):
+    """Recompute BusinessAnalytics for the days between the two (inclusive); returns rows written"""
+    written = 0
+    day = first_day
+    while day <= last_day:
+        chunk_end = min(day + timedelta(days=CHUNK_DAYS - 1), last_day)
+        written += _rollup_chunk(day, chunk_end)
+        day = chunk_end + timedelta(days=1)
+    cache.invalidate('dashboards')
+    if first_day < closed_before():
+        cache.invalidate(HISTORY_NAMESPACE)
+    return written
+
+
+def _rollup_chunk(first_day, last_day):
+    days = compute(first_day, last_day)
+    rows = [
+        BusinessAnalytics(business_id=business_id, date=day, engagement_rate=engagement_rate(metrics), **metrics)
+        for (business_id, day), metrics in days.items()
+    ]
+    with transaction.atomic():
+        BusinessAnalytics.objects.bulk_create(
+            rows, batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['business', 'date'],
+            update_fields=[*METRICS, 'engagement_rate', 'updated_at'],
+        )
+        stale = [
+            pk for pk, business_id, day in
+            BusinessAnalytics.objects.filter(date__range=(first_day, last_day))
+            .values_list('pk', 'business_id', 'date')
+            if (business_id, day) not in days
+        ]
+        for start in range(0, len(stale), BATCH_SIZE):
+            BusinessAnalytics.objects.filter(pk__in=stale[start:start + BATCH_SIZE]).delete()
+    return len(rows)
+
+
+def first_activity():
+    """Date of the oldest row any metric is computed from, or None"""
+    dates = [
+        UserEngagement.objects.aggregate(first=Min('created_at'))['first'],
+        Follow.objects.aggregate(first=Min('created_at'))['first'],
+        Like.objects.aggregate(first=Min('created_at'))['first'],
+        Comment.objects.aggregate(first=Min('created_at'))['first'],
+    ]
+    dates = [value for value in dates if value is not None]
+    return timezone.localdate(min(dates)) if dates else None
+
+
+def rollup():
+    """
+    Recompute the days touched since the previous run (everything on the
+    first run) and move the watermark; returns the number of rows written.
+    """
+    started_at = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    if watermark is not None:
+        since = watermark.value - ROLLUP_LAG
+        late = UserEngagement.objects.filter(written_at__gte=since).aggregate(first=Min('created_at'))['first']
+        first_day = timezone.localdate(min(since, late) if late else since)
+    else:
+        first_day = first_activity()
+    written = 0
+    if first_day is not None:
+        written = rollup_range(first_day, timezone.localdate(started_at))
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': started_at})
+    return written
+
+
+# Reading the rollups
+
+def with_rate(metrics):
+    return {**metrics, 'engagement_rate': engagement_rate(metrics)}
+
+
+def empty_metrics():
+    return with_rate(dict.fromkeys(METRICS, 0))
+
+
+def last_rollup():
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    return watermark.value if watermark else None
+
+
+def summarize(businesses, first_day, last_day):
+    """
+    Rolled-up metrics of ``businesses`` (a queryset) between the two days:
+    ``({day: metrics}, {business id: metrics})``, two grouped queries.
+    Reach is summed, so someone reached on two days or by two businesses
+    counts twice.
+    """
+    rows = BusinessAnalytics.objects.filter(business__in=businesses, date__range=(first_day, last_day))
+    sums = {metric: Sum(metric) for metric in METRICS}
+    daily = {row.pop('date'): with_rate(row) for row in rows.values('date').annotate(**sums).order_by()}
+    per_business = {
+        row.pop('business'): with_rate(row) for row in rows.values('business').annotate(**sums).order_by()
+    }
+    return daily, per_business
+
+
+def total(series):
+    """Sum of several metric dicts"""
+    totals = dict.fromkeys(METRICS, 0)
+    for metrics in series:
+        for metric in METRICS:
+            totals[metric] += metrics[metric]
+    return with_rate(totals)
+
+
+# Chart series
+
+BUCKETS = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def closed_before():
+    """
+    First day incremental rollups may still rewrite: the run after midnight
+    recomputes yesterday, older days only change in a backfill.
+    """
+    return timezone.localdate() - timedelta(days=1)
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_count(first_day, last_day, bucket):
+    if bucket == 'week':
+        return (bucket_start(last_day, bucket) - bucket_start(first_day, bucket)).days // 7 + 1
+    if bucket == 'month':
+        return (last_day.year - first_day.year) * 12 + last_day.month - first_day.month + 1
+    return (last_day - first_day).days + 1
+
+
+def _bucketed(business_id, first_day, last_day, bucket):
+    """``{bucket start: metrics}`` of one business between the two days, one grouped query"""
+    rows = BusinessAnalytics.objects.filter(business_id=business_id, date__range=(first_day, last_day))
+    if BUCKETS[bucket] is None:
+        return {row.pop('date'): row for row in rows.values('date', *METRICS)}
+    rows = (
+        rows.annotate(start=BUCKETS[bucket]('date'))
+        .values('start')
+        .annotate(**{metric: Sum(metric) for metric in METRICS})
+        .order_by()
+    )
+    return {row.pop('start'): row for row in rows}
+
+
+def _closed_bucketed(business_id, first_day, last_day, bucket):
+    if not settings.ZONER_SETTINGS['RESPONSE_CACHE_ENABLED']:
+        return _bucketed(business_id, first_day, last_day, bucket)
+    version, = cache.versions([HISTORY_NAMESPACE])
+    key = f'analytics:{business_id}:{bucket}:{first_day}:{last_day}:{version}'
+    store = caches[cache.CACHE_ALIAS]
+    sums = store.get(key)
+    if sums is None:
+        sums = _bucketed(business_id, first_day, last_day, bucket)
+        store.set(key, sums, settings.ZONER_SETTINGS['ANALYTICS_CACHE_TTL'])
+    return sums
+
+
+def series(business_id, first_day, last_day, bucket):
+    """
+    Metrics of a business per ``bucket`` ('day', 'week' or 'month') between
+    the two days, every bucket included. Weeks start on Monday; the first
+    and last bucket are cut to the range (``start``/``end``).
+    """
+    boundary = closed_before()
+    parts = []
+    if first_day < boundary:
+        parts.append(_closed_bucketed(business_id, first_day, min(last_day, boundary - timedelta(days=1)), bucket))
+    if last_day >= boundary:
+        parts.append(_bucketed(business_id, max(first_day, boundary), last_day, bucket))
+
+    points = []
+    start = bucket_start(first_day, bucket)
+    while start <= last_day:
+        following = next_bucket(start, bucket)
+        points.append({
+            'start': max(start, first_day),
+            'end': min(following - timedelta(days=1), last_day),
+            **total(part[start] for part in parts if start in part),
+        })
+        start = following
+    return points
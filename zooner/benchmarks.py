@@ -0,0 +1,75 @@
+# ============================================================================
+# BENCHMARKS.PY - Shared helpers for the benchmark_* management commands
+# ============================================================================
+
+import time
+from contextlib import ExitStack, contextmanager
+from django.db import connection, connections
+
+
+@contextmanager
+def scratch_database(path=None):
+    """
+    Run the enclosed block against a freshly migrated throwaway database,
+    created and destroyed the same way the test runner does it, so
+    benchmarks never touch real data. ``path`` puts an SQLite one in that
+    file instead of in memory, for benchmarks whose processes share it.
+    Aliases that mirror 'default' in tests (the read replica) open it too,
+    with their own options.
+    """
+    old_name = connection.settings_dict['NAME']
+    old_test = connection.settings_dict['TEST']
+    if path is not None:
+        connection.settings_dict['TEST'] = {**old_test, 'NAME': str(path)}
+    elif connection.vendor == 'sqlite':
+        # Not the test runner's file (DATABASES['default']['TEST'])
+        connection.settings_dict['TEST'] = {**old_test, 'NAME': None}
+    mirrors = {alias: connections[alias].settings_dict for alias in connections
+               if connections[alias].settings_dict['TEST'].get('MIRROR') == connection.alias}
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    for alias, settings_dict in mirrors.items():
+        connections[alias].close()
+        connections[alias].settings_dict = {**settings_dict, 'NAME': connection.settings_dict['NAME']}
+    try:
+        yield
+    finally:
+        for alias, settings_dict in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict = settings_dict
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST'] = old_test
+
+
+@contextmanager
+def count_queries(using=None):
+    """
+    Collect the SQL run inside the block on ``using`` (every database by
+    default, the read replica included), whatever DEBUG is; unlike
+    CaptureQueriesContext it doesn't read the bounded queries log.
+    """
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in [using] if using else connections:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+        yield queries
+
+
+def measure(func, repeat):
+    """Call ``func`` ``repeat`` times and return the timings in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,129 @@
+# ============================================================================
+# CACHE.PY - Cached responses for the public catalogue endpoints
+# ============================================================================
+#
+# Rendered responses are stored in the 'responses' cache under a key built
+# from the request URL, the renderer and the current version of every
+# namespace the payload depends on ('towns', 'business:<slug>', ...).
+# zooner.signals bumps a namespace's version whenever a row it covers
+# changes, so stale entries are never read again and simply expire.
+#
+# Each entry carries an ETag; a matching If-None-Match gets a 304 without
+# the payload being rendered or sent again. The Vary header is stored too
+# and restored on a hit, so downstream caches keep per-user responses apart.
+
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+CACHE_ALIAS = 'responses'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(namespace):
+    return f'ns:{namespace}'
+
+
+def versions(namespaces):
+    """Current version of each namespace, in order"""
+    keys = [_version_key(ns) for ns in namespaces]
+    found = _cache().get_many(keys)
+    return [found.get(key, 0) for key in keys]
+
+
+def invalidate(*namespaces):
+    """Move ``namespaces`` to a new version, orphaning their cached responses"""
+    cache = _cache()
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        # Versions must outlive the responses keyed on them
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Evicted between add() and incr()
+                cache.set(key, 1, timeout=None)
+
+
+# Business fields the town and category business counts depend on
+COUNTED_FIELDS = ('status', 'town_id', 'category_id')
+
+
+def business_namespace(slug):
+    return f'business:{slug}'
+
+
+def dashboard_namespace(owner_id):
+    return f'dashboard:{owner_id}'
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses from the response cache.
+
+    ``cache_namespaces`` (or ``get_cache_namespaces()``) lists what the
+    payload depends on. Only anonymous requests are cached unless
+    ``cache_authenticated`` is set, for payloads that never vary by user
+    or whose namespaces are per user.
+    """
+    cache_namespaces = ()
+    cache_authenticated = False
+    cache_timeout = DEFAULT_TIMEOUT
+
+    def get_cache_namespaces(self):
+        return self.cache_namespaces
+
+    def is_cacheable(self, request):
+        return settings.ZONER_SETTINGS['RESPONSE_CACHE_ENABLED'] and (
+            self.cache_authenticated or not request.user.is_authenticated
+        )
+
+    def get_response_cache_key(self, request):
+        namespaces = list(self.get_cache_namespaces())
+        # Absolute URL: payloads embed absolute links (pagination, media)
+        parts = [request.accepted_renderer.format, request.build_absolute_uri()]
+        parts += [f'{ns}={version}' for ns, version in zip(namespaces, versions(namespaces))]
+        # 'v2': entries hold the Vary header since; older ones are never read
+        return 'response:v2:' + hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def get(self, request, *args, **kwargs):
+        self.response_cache_key = None
+        if not self.is_cacheable(request):
+            return super().get(request, *args, **kwargs)
+
+        self.response_cache_key = self.get_response_cache_key(request)
+        entry = _cache().get(self.response_cache_key)
+        if entry is None:
+            return super().get(request, *args, **kwargs)
+
+        content, content_type, etag, vary = entry
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Vary'] = vary
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key is None or request.method != 'GET':
+            return response
+        patch_vary_headers(response, ['Authorization'])
+        if response.status_code == 200 and not response.has_header('ETag'):
+            response.render()
+            etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+            response['ETag'] = etag
+            _cache().set(key, (response.content, response['Content-Type'], etag, response['Vary']),
+                         self.cache_timeout)
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                return HttpResponseNotModified(headers={'ETag': etag, 'Vary': response['Vary']})
+        return response
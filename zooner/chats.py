@@ -0,0 +1,36 @@
+# ============================================================================
+# CHATS.PY - Chat operations shared by the REST views and the WebSocket
+# ============================================================================
+
+from django.db import transaction
+from django.utils import timezone
+from . import realtime
+from .models import Chat, ChatReadState, Message
+
+
+def participant_ids(chat_id):
+    return list(Chat.participants.through.objects.filter(chat_id=chat_id).values_list('user_id', flat=True))
+
+
+def mark_read(chat, user):
+    """
+    Mark every message of ``chat`` sent by the other participants as read,
+    reset ``user``'s unread counter and send them a read receipt. Returns the
+    number of messages marked.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Locking the read state holds back concurrent messages (their
+        # unread bump) until the counter is reset, so none is lost
+        state, _ = ChatReadState.objects.select_for_update().get_or_create(chat=chat, user=user)
+        marked = (
+            Message.objects.filter(chat=chat, is_read=False)
+            .exclude(sender=user)
+            .update(is_read=True, read_at=now)
+        )
+        ChatReadState.objects.filter(pk=state.pk).update(unread_count=0, last_read_at=now)
+        if realtime.is_enabled():
+            others = [pk for pk in participant_ids(chat.pk) if pk != user.pk]
+            event = realtime.read_event(chat.pk, user.pk, now)
+            transaction.on_commit(lambda: realtime.publish_to_users(others, event))
+    return marked
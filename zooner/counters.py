@@ -0,0 +1,213 @@
+# ============================================================================
+# COUNTERS.PY - Denormalized counter maintenance
+# ============================================================================
+#
+# Counter columns (Business.followers_count, User.following_count, ...) are
+# kept up to date incrementally by zooner.signals. The helpers here apply
+# those increments atomically and rebuild/verify the columns in bulk.
+#
+# Post like/comment counters of viral posts are sharded: increments land on
+# one of several PostCounterShard rows picked at random, so concurrent writers
+# stop queueing on the single Post row. flush_counter_shards() folds the
+# pending deltas back into Post.
+#
+# Views that delete a row and count the delete themselves (unfollow,
+# unlike) decrement only if their DELETE actually removed it, so racing
+# requests can't decrement twice; they delete under counted_by_caller() so
+# the post_delete handlers, which count every other delete (cascades, the
+# admin), leave those rows alone.
+
+import contextvars
+import random
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from .models import Business, Comment, Follow, Like, Post, PostCounterShard, User
+
+
+_counted_by_caller = contextvars.ContextVar('zooner_counted_by_caller', default=False)
+
+
+@contextmanager
+def counted_by_caller():
+    """The deletes of the enclosed block update their counters themselves"""
+    token = _counted_by_caller.set(True)
+    try:
+        yield
+    finally:
+        _counted_by_caller.reset(token)
+
+
+def is_counted_by_caller():
+    return _counted_by_caller.get()
+
+
+def bump(queryset, field, delta):
+    """
+    Atomically add ``delta`` to ``field`` on every row in ``queryset``.
+    Decrements never take a counter below zero.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def update_follow_counters(follow, delta):
+    """Business.followers_count, and the following/followers counts of the follower and the owner"""
+    bump(Business.objects.filter(pk=follow.business_id), 'followers_count', delta)
+    bump(User.objects.filter(pk=follow.user_id), 'following_count', delta)
+    bump(User.objects.filter(owned_businesses=follow.business_id), 'followers_count', delta)
+
+
+def is_sharded(post):
+    threshold = settings.ZONER_SETTINGS['SHARDED_COUNTER_THRESHOLD']
+    return threshold is not None and post.likes_count >= threshold
+
+
+def increment_post_counter(post, field, delta):
+    """
+    Add ``delta`` to ``post.<field>`` (likes_count or comments_count) without
+    a read-modify-write, and return the resulting value. Likes also roll up
+    into Business.likes_count.
+    """
+    if not is_sharded(post):
+        bump(Post.objects.filter(pk=post.pk), field, delta)
+        if field == 'likes_count':
+            bump(Business.objects.filter(pk=post.business_id), 'likes_count', delta)
+        return Post.objects.filter(pk=post.pk).values_list(field, flat=True).get()
+
+    shard = random.randrange(settings.ZONER_SETTINGS['COUNTER_SHARDS'])
+    shards = PostCounterShard.objects.filter(post=post, shard=shard)
+    if not shards.update(**{field: F(field) + delta}):
+        try:
+            with transaction.atomic():
+                PostCounterShard.objects.create(post=post, shard=shard, **{field: delta})
+        except IntegrityError:
+            # Another writer created the shard first
+            shards.update(**{field: F(field) + delta})
+    return current_post_counter(post, field)
+
+
+def current_post_counter(post, field):
+    """Flushed value plus whatever is still pending in the shards"""
+    flushed = Post.objects.filter(pk=post.pk).values_list(field, flat=True).get()
+    pending = post.counter_shards.aggregate(total=Sum(field))['total'] or 0
+    return max(flushed + pending, 0)
+
+
+def flush_counter_shards(post=None):
+    """
+    Move pending shard deltas into their Post (and Business) rows, of every
+    post or only ``post``. Safe to run while writers keep incrementing: each
+    shard is decremented by exactly what was applied. Returns the number of
+    shards flushed.
+    """
+    flushed = 0
+    pending = PostCounterShard.objects.exclude(likes_count=0, comments_count=0)
+    if post is not None:
+        pending = pending.filter(post=post)
+    for shard in pending.select_related('post').iterator():
+        with transaction.atomic():
+            Post.objects.filter(pk=shard.post_id).update(
+                likes_count=Greatest(F('likes_count') + shard.likes_count, 0),
+                comments_count=Greatest(F('comments_count') + shard.comments_count, 0),
+            )
+            Business.objects.filter(pk=shard.post.business_id).update(
+                likes_count=Greatest(F('likes_count') + shard.likes_count, 0),
+            )
+            PostCounterShard.objects.filter(pk=shard.pk).update(
+                likes_count=F('likes_count') - shard.likes_count,
+                comments_count=F('comments_count') - shard.comments_count,
+            )
+        flushed += 1
+    return flushed
+
+
+def _count(queryset, outer_field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{outer_field: OuterRef('pk')})
+            .order_by()
+            .values(outer_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def _pending(field, shard_field):
+    """The deltas still pending in the counter shards, which flush_counter_shards() adds on top later"""
+    return Coalesce(
+        Subquery(
+            PostCounterShard.objects.filter(**{shard_field: OuterRef('pk')})
+            .order_by()
+            .values(shard_field)
+            .annotate(total=Sum(field))
+            .values('total')
+        ),
+        0,
+    )
+
+
+# (model, counter field, expression computing the true value per row,
+#  expression of the deltas pending in counter shards or None)
+COUNTERS = [
+    (Business, 'followers_count', lambda: _count(Follow.objects.all(), 'business'), None),
+    (Business, 'posts_count', lambda: _count(Post.objects.all(), 'business'), None),
+    (Business, 'likes_count', lambda: _count(Like.objects.all(), 'post__business'),
+     lambda: _pending('likes_count', 'post__business')),
+    (User, 'followers_count', lambda: _count(Follow.objects.all(), 'business__owner'), None),
+    (User, 'following_count', lambda: _count(Follow.objects.all(), 'user'), None),
+    (Post, 'likes_count', lambda: _count(Like.objects.all(), 'post'), lambda: _pending('likes_count', 'post')),
+    (Post, 'comments_count', lambda: _count(Comment.objects.all(), 'post'),
+     lambda: _pending('comments_count', 'post')),
+]
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def verify_counters():
+    """
+    Return ``{'Model.field': rows_out_of_sync}`` for every counter. Read-only:
+    pending shard deltas are added to the stored values, not flushed.
+    """
+    drift = {}
+    for model, field, count, pending in COUNTERS:
+        current = Greatest(F(field) + pending(), 0) if pending else F(field)
+        drift[f'{model.__name__}.{field}'] = (
+            model.objects.annotate(current=current, actual=count())
+            .exclude(current=F('actual'))
+            .count()
+        )
+    return drift
+
+
+def rebuild_counters(names=None):
+    """
+    Recompute every counter column (or only ``names``, as 'Model.field'),
+    safe to run while writers keep counting. Rows are rebuilt in pk order,
+    REBUILD_BATCH_SIZE at a time, each batch in its own transaction once its
+    rows are locked: writers that already changed a row have committed, so
+    the UPDATE counts their rows, and writers still to come add to the
+    rebuilt value instead of being overwritten by it. Only the batch being
+    rebuilt holds writers up. Pending shard deltas stay in their shards and
+    are left out of the rebuilt value.
+    """
+    for model, field, count, pending in COUNTERS:
+        if names is not None and f'{model.__name__}.{field}' not in names:
+            continue
+        value = Greatest(count() - pending(), 0) if pending else count()
+        last = None
+        while True:
+            with transaction.atomic():
+                rows = model.objects.order_by('pk')
+                if last is not None:
+                    rows = rows.filter(pk__gt=last)
+                batch = list(rows.select_for_update().values_list('pk', flat=True)[:REBUILD_BATCH_SIZE])
+                if not batch:
+                    break
+                model.objects.filter(pk__in=batch).update(**{field: value})
+            last = batch[-1]
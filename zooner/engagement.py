@@ -0,0 +1,236 @@
+# ============================================================================
+# ENGAGEMENT.PY - Buffered ingestion of UserEngagement events
+# ============================================================================
+#
+# POST /api/engagement/ accepts batches of events from the app. Accepted
+# events are appended to a local log segment (JSON lines) and kept in an
+# in-process buffer; a background thread writes the buffer with bulk_create
+# once it holds ENGAGEMENT_FLUSH_SIZE events or ENGAGEMENT_FLUSH_INTERVAL
+# seconds have passed, then deletes the segments it covered. Requests never
+# wait on the database.
+#
+# Delivery is at least once, never silently lossy:
+#
+#   * Events carry a client-generated UUID that becomes the row's primary
+#     key, and rows are inserted with ignore_conflicts, so client retries and
+#     log replays are idempotent.
+#   * A segment is deleted only after its events are committed, and stays
+#     flock()ed by its process until then (a failed flush is retried with the
+#     next one). Segments a stopped or crashed process left behind are
+#     replayed by replay_segments(): `manage.py flush_engagement`, also run
+#     periodically by Celery beat.
+#   * Once ENGAGEMENT_MAX_PENDING events are waiting for the database, new
+#     batches are refused with 503 and Retry-After instead of growing the
+#     buffer without bound.
+
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Business, Post, UserEngagement
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+SEGMENT_SUFFIX = '.jsonl'
+
+
+class Backpressure(Exception):
+    """Too many events are waiting for the database; retry later"""
+
+
+def _options():
+    return settings.ZONER_SETTINGS
+
+
+def _row(row):
+    row = dict(row)
+    row['created_at'] = parse_datetime(row['created_at'])
+    return UserEngagement(**row)
+
+
+def write_rows(rows):
+    """Insert engagement rows (dicts), skipping ids already stored"""
+    rows = list(rows)
+    for start in range(0, len(rows), BATCH_SIZE):
+        UserEngagement.objects.bulk_create([_row(row) for row in rows[start:start + BATCH_SIZE]],
+                                           ignore_conflicts=True)
+    return len(rows)
+
+
+class Segment:
+    """An append-only log file, exclusively locked while this process owns it"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        name = f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex}{SEGMENT_SUFFIX}'
+        self.path = os.path.join(directory, name)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def append(self, rows):
+        self.file.write(''.join(json.dumps(row) + '\n' for row in rows))
+        self.file.flush()  # Survives a crash of this process
+        if _options()['ENGAGEMENT_LOG_FSYNC']:
+            os.fsync(self.file.fileno())  # ...and of the machine
+
+    def discard(self):
+        os.remove(self.path)
+        self.file.close()
+
+
+class EngagementBuffer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._rows = []
+        self._segment = None
+        self._full_segments = []  # Rotated, waiting for their rows to be committed
+        self._pending = 0         # Accepted and not committed yet
+        self._flusher = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def add(self, rows):
+        """Log and buffer ``rows`` (JSON-serializable dicts) or raise Backpressure"""
+        options = _options()
+        with self._lock:
+            if self._pending + len(rows) > options['ENGAGEMENT_MAX_PENDING']:
+                raise Backpressure()
+            if self._segment is None:
+                self._segment = Segment(options['ENGAGEMENT_LOG_DIR'])
+            self._segment.append(rows)
+            self._rows.extend(rows)
+            self._pending += len(rows)
+            full = len(self._rows) >= options['ENGAGEMENT_FLUSH_SIZE']
+        self._start_flusher()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                if self._segment is not None:
+                    self._full_segments.append(self._segment)
+                    self._segment = None
+                segments, self._full_segments = self._full_segments, []
+            if not rows:
+                return 0
+            try:
+                write_rows(rows)
+            except Exception:
+                # Whatever failed, the events stay buffered and logged rather than dropped
+                logger.exception("Engagement flush failed; %d events kept for the next attempt", len(rows))
+                with self._lock:
+                    self._rows[:0] = rows
+                    self._full_segments[:0] = segments
+                return 0
+            for segment in segments:
+                segment.discard()
+            with self._lock:
+                self._pending -= len(rows)
+            return len(rows)
+
+    def _start_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._lock:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._run, name='engagement-flusher', daemon=True)
+                    self._flusher.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(_options()['ENGAGEMENT_FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Engagement flusher error")
+            finally:
+                close_old_connections()
+
+
+buffer = EngagementBuffer()
+
+
+def _existing(model, ids):
+    ids = {pk for pk in ids if pk is not None}
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
+
+def accept(user, events):
+    """
+    Queue validated events (EngagementEventSerializer data) of ``user``;
+    returns how many. References to posts or businesses that no longer exist
+    are dropped rather than failing the batch, which the client would only
+    retry forever.
+    """
+    posts = _existing(Post, (event.get('post') for event in events))
+    businesses = _existing(Business, (event.get('business') for event in events))
+    received_at = timezone.now().isoformat()
+    rows = [
+        {
+            'id': str(event['id']),
+            'user_id': str(user.pk),
+            'engagement_type': event['type'],
+            'related_post_id': str(event['post']) if event.get('post') in posts else None,
+            'related_business_id': str(event['business']) if event.get('business') in businesses else None,
+            'metadata': event['metadata'],
+            'session_id': event['session_id'],
+            'created_at': received_at,
+        }
+        for event in events
+    ]
+    buffer.add(rows)
+    return len(rows)
+
+
+def replay_segments(directory=None):
+    """
+    Write the events of log segments no live process holds (crashed
+    processes, failed flushes) and delete them; returns the number of events.
+    """
+    directory = directory or _options()['ENGAGEMENT_LOG_DIR']
+    if not os.path.isdir(directory):
+        return 0
+    total = 0
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(SEGMENT_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            file = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            continue  # Flushed meanwhile
+        with file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # Still owned
+            if not os.path.exists(path):
+                continue  # Replayed by another process while we waited to open it
+            rows = []
+            for line in file:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    pass  # Torn last line of a crashed write; the client retries it
+            total += write_rows(rows)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Another replay got there first; its rows were the same
+    return total
@@ -0,0 +1,112 @@
+# ============================================================================
+# GENERATORS.PY - Shared helpers for the generate_* management commands
+# ============================================================================
+#
+# The generators build load-testing datasets (a million users, ten million
+# likes) in minutes:
+#
+#   * Rows come from one random.Random(--seed) stream and small word pools,
+#     so the same seed rebuilds the same dataset, ids included.
+#   * Related rows are picked from id lists loaded once, never with a query
+#     per row, and inserted with bulk_create(ignore_conflicts=True) in
+#     --batch-size batches: pairs that already exist (a user liking a post
+#     twice) are skipped by the database instead of checked beforehand.
+#   * bulk_create sends no signals, so the commands rebuild the counters
+#     they affect (zooner.counters) and set the derived columns the signals
+#     would have (Business.geohash, Comment.root/depth) themselves.
+
+import itertools
+import random
+import time
+import uuid
+from django.db import transaction
+
+DEFAULT_BATCH_SIZE = 5000
+
+FIRST_NAMES = [
+    'Achieng', 'Amani', 'Baraka', 'Chebet', 'Faith', 'Grace', 'Hassan', 'Imani', 'James', 'Jepchirchir',
+    'Kamau', 'Kariuki', 'Kipchoge', 'Lilian', 'Mercy', 'Mohamed', 'Mwangi', 'Naliaka', 'Njeri', 'Nyambura',
+    'Odhiambo', 'Otieno', 'Peter', 'Rehema', 'Wanjiku', 'Wafula', 'Zawadi', 'Brian', 'Cynthia', 'Dennis',
+]
+LAST_NAMES = [
+    'Wanjiru', 'Ochieng', 'Kiprotich', 'Mutua', 'Njoroge', 'Omondi', 'Kamau', 'Were', 'Mohamed', 'Akinyi',
+    'Koech', 'Muthoni', 'Barasa', 'Maina', 'Onyango', 'Chege', 'Rotich', 'Nduta', 'Juma', 'Kibet',
+]
+LOCATIONS = [
+    'Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Naivasha', 'Machakos', 'Nyeri', 'Meru',
+    'Kakamega', 'Kericho', 'Bungoma', 'Embu', 'Narok', 'Voi', 'Lamu', 'Isiolo', 'Nanyuki', 'Kitui',
+]
+WORDS = (
+    'fresh local deals today new shop open quality best price service customers welcome visit weekend '
+    'offer discount market town family friendly quick delivery order call now event join us special '
+    'launch products stock available great value community support thanks everyone handmade organic '
+    'coffee bakery salon repairs fitness classes school books fashion style tech phones'
+).split()
+
+
+def add_arguments(parser, count_help):
+    parser.add_argument('--count', type=int, default=None, help=count_help)
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed of the random stream; the same seed generates the same rows')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Rows per INSERT (default: {DEFAULT_BATCH_SIZE})')
+
+
+class Generator(random.Random):
+    """random.Random with the few helpers the generate_* commands share"""
+
+    def uuid(self):
+        return uuid.UUID(int=self.getrandbits(128), version=4)
+
+    def sentence(self, words):
+        return ' '.join(self.choices(WORDS, k=words)).capitalize() + '.'
+
+    def phone(self):
+        return f'+2547{self.randrange(10 ** 8):08d}'
+
+
+def ids(queryset):
+    """Primary keys of ``queryset`` in a stable order, so seeded runs repeat"""
+    return list(queryset.order_by('pk').values_list('pk', flat=True))
+
+
+def pairs(rng, left, right, count=None, per_left=(0, 0)):
+    """
+    Distinct (left id, right id) pairs: a random number between ``per_left``
+    bounds for each left id, or about ``count`` in total, spread unevenly
+    """
+    for index, left_id in enumerate(left):
+        if count is None:
+            wanted = min(rng.randint(*per_left), len(right))
+        else:
+            remaining = len(left) - index
+            wanted = count if remaining == 1 else rng.randint(0, round(2 * count / remaining))
+            wanted = min(wanted, count, len(right))
+            count -= wanted
+        for right_id in rng.sample(right, wanted):
+            yield left_id, right_id
+
+
+def insert(model, rows, batch_size):
+    """
+    bulk_create ``rows`` (an iterable of unsaved instances) in batches,
+    skipping conflicts; returns the number of rows added.
+    """
+    before = model.objects.count()
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+    return model.objects.count() - before
+
+
+class Timer:
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    def __str__(self):
+        return f'{time.perf_counter() - self.start:.1f}s'
@@ -0,0 +1,179 @@
+# ============================================================================
+# GEO.PY - "Near me" lookups on a geohash index
+# ============================================================================
+#
+# Every business with coordinates stores the geohash of its location in an
+# indexed column. A geohash prefix is a rectangular cell, and all businesses
+# inside a cell share that prefix, so a radius query becomes a handful of
+# index range scans followed by an exact haversine check on the candidates.
+# No PostGIS or SpatiaLite needed. The radius's bounding box is covered with
+# the finest cells that take at most MAX_CELLS of them, so the scanned area
+# stays within a small factor of the circle whatever the radius.
+#
+# The candidates of each cell are kept in a small per-process LRU cache so
+# hot regions are served from memory. Saving or deleting a business clears
+# the cells it was in; other processes catch up after NEARBY_CACHE_TTL.
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from .models import Business
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9  # ~5m cells, stored on Business.geohash
+MAX_CELLS = 16
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """Geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, float(longitude)) if even else (lat_range, float(latitude))
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(south, west, north, east) in degrees; west > east across the antimeridian"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    dlon = math.degrees(radius_km / EARTH_RADIUS_KM / math.cos(math.radians(latitude)))
+    if dlon >= 180:
+        return south, -180.0, north, 180.0
+    wrap = lambda lon: (lon + 180) % 360 - 180
+    return south, wrap(longitude - dlon), north, wrap(longitude + dlon)
+
+
+def _steps(start, end, step):
+    """Points from start to end (inclusive) no more than ``step`` apart"""
+    count = math.ceil((end - start) / step)
+    return [start + i * step for i in range(count)] + [end]
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    The finest set of at most MAX_CELLS geohash cells covering the bounding
+    box of the radius
+    """
+    south, west, north, east = bounding_box(latitude, longitude, radius_km)
+    span = 360.0 if (west, east) == (-180.0, 180.0) else (east - west) % 360
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.ceil((north - south) / height) + 1
+        columns = math.ceil(span / width) + 1
+        if rows * columns <= MAX_CELLS or precision == 1:
+            break
+    return {
+        encode(lat, (west + offset + 180) % 360 - 180, precision)
+        for lat in _steps(south, north, height)
+        for offset in _steps(0.0, span, width)
+    }
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class CellCache:
+    """Thread-safe LRU of ``cell -> [(business id, lat, lon), ...]``"""
+
+    def __init__(self):
+        self._cells = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cell):
+        with self._lock:
+            entry = self._cells.get(cell)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._cells.move_to_end(cell)
+            return entry[1]
+
+    def set(self, cell, rows):
+        options = settings.ZONER_SETTINGS
+        with self._lock:
+            self._cells[cell] = (time.monotonic() + options['NEARBY_CACHE_TTL'], rows)
+            self._cells.move_to_end(cell)
+            while len(self._cells) > options['NEARBY_CACHE_SIZE']:
+                self._cells.popitem(last=False)
+
+    def invalidate(self, geohash):
+        """Drop every cached cell containing ``geohash``"""
+        if not geohash:
+            return
+        with self._lock:
+            for cell in [c for c in self._cells if geohash.startswith(c)]:
+                del self._cells[cell]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+
+
+cell_cache = CellCache()
+
+
+def _cell_rows(cell):
+    rows = cell_cache.get(cell)
+    if rows is None:
+        # Prefix match as a range so it can use the index on every backend
+        rows = list(
+            Business.objects.filter(status='active', geohash__gte=cell, geohash__lt=cell + '~')
+            .values_list('pk', 'latitude', 'longitude')
+        )
+        rows = [(pk, float(lat), float(lon)) for pk, lat, lon in rows]
+        cell_cache.set(cell, rows)
+    return rows
+
+
+def _within(latitude, longitude, radius_km):
+    matches = []
+    south, _, north, _ = bounding_box(latitude, longitude, radius_km)
+    for cell in covering_cells(latitude, longitude, radius_km):
+        for pk, lat, lon in _cell_rows(cell):
+            if not south <= lat <= north:
+                continue
+            distance = haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                matches.append((distance, pk))
+    return matches
+
+
+def nearby(latitude, longitude, radius_km, limit):
+    """``[(business id, distance in km), ...]`` within the radius, nearest first"""
+    # In dense areas the nearest ``limit`` are usually much closer than the
+    # radius; anything within a smaller radius is nearer than anything outside
+    # it, so widen step by step and stop once there are enough matches.
+    for radius in (radius_km / 16, radius_km / 4, radius_km):
+        matches = _within(latitude, longitude, radius)
+        if len(matches) >= limit:
+            break
+    matches.sort()
+    return [(pk, distance) for distance, pk in matches[:limit]]
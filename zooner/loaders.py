@@ -0,0 +1,236 @@
+# ============================================================================
+# LOADERS.PY - Batched lookups used by list serializers
+# ============================================================================
+#
+# Nested serializers (post -> business -> owner/town/category -> counts) used
+# to run their own queries for every row. The loaders below fetch everything a
+# page needs in a fixed number of grouped queries and park the results in the
+# serializer context, where the SerializerMethodFields pick them up. Anything
+# not preloaded still falls back to a per-object query.
+
+from django.conf import settings
+from django.db.models import Count, F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+from .models import Business, ChatReadState, Comment, Follow, Like, Post
+
+RECENT_POSTS_LIMIT = 3
+
+
+def _unique(objects):
+    seen = {}
+    for obj in objects:
+        if obj is not None and obj.pk not in seen:
+            seen[obj.pk] = obj
+    return list(seen.values())
+
+
+def _request_user(context):
+    request = context.get('request')
+    if request and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+def _missing(context, key, objects):
+    """Return the primary keys of ``objects`` not yet loaded under ``key``"""
+    loaded = context.setdefault(key, {})
+    return [obj.pk for obj in objects if obj.pk not in loaded]
+
+
+def _includes(fields, name):
+    return fields is None or name in fields
+
+
+def _nested_fields(fields, name):
+    """Fields of the nested serializer ``name`` (None when all fields are wanted)"""
+    return None if fields is None else fields[name].fields
+
+
+def load_recent_posts(businesses, context):
+    """Latest active posts per business, fetched with a single windowed query"""
+    ids = _missing(context, 'recent_posts', businesses)
+    if not ids:
+        return []
+    recent = context['recent_posts']
+    for pk in ids:
+        recent[pk] = []
+    posts = list(
+        Post.objects.filter(business_id__in=ids, is_active=True)
+        .select_related('author', 'category')
+        .annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('business_id'),
+            order_by=F('published_at').desc(),
+        ))
+        .filter(row_number__lte=RECENT_POSTS_LIMIT)
+        .order_by('business_id', 'row_number')
+    )
+    for post in posts:
+        recent[post.business_id].append(post)
+    return posts
+
+
+def load_liked_posts(posts, context):
+    ids = _missing(context, 'liked_posts', posts)
+    if not ids:
+        return
+    liked = context['liked_posts']
+    user = _request_user(context)
+    liked_ids = set()
+    if user is not None:
+        liked_ids = set(
+            Like.objects.filter(user=user, post_id__in=ids).values_list('post_id', flat=True)
+        )
+    for pk in ids:
+        liked[pk] = pk in liked_ids
+
+
+def load_followed_businesses(businesses, context):
+    ids = _missing(context, 'followed_businesses', businesses)
+    if not ids:
+        return
+    followed = context['followed_businesses']
+    user = _request_user(context)
+    followed_ids = set()
+    if user is not None:
+        followed_ids = set(
+            Follow.objects.filter(user=user, business_id__in=ids).values_list('business_id', flat=True)
+        )
+    for pk in ids:
+        followed[pk] = pk in followed_ids
+
+
+def _load_active_business_counts(objects, context, key, field):
+    ids = _missing(context, key, objects)
+    if not ids:
+        return
+    counts = context[key]
+    counts.update(dict.fromkeys(ids, 0))
+    counts.update(
+        Business.objects.filter(**{f'{field}__in': ids}, status='active')
+        .values(field)
+        .annotate(total=Count('id'))
+        .values_list(field, 'total')
+    )
+
+
+def load_town_business_counts(towns, context, fields=None):
+    if _includes(fields, 'businesses_count'):
+        _load_active_business_counts(towns, context, 'town_business_counts', 'town_id')
+
+
+def load_category_business_counts(categories, context, fields=None):
+    if _includes(fields, 'businesses_count'):
+        _load_active_business_counts(categories, context, 'category_business_counts', 'category_id')
+
+
+def preload_businesses(businesses, context, fields=None, categories=()):
+    """
+    Load everything BusinessSerializer needs for a whole page: related rows,
+    recent posts, likes, follows and town/category counts. Costs a constant
+    number of queries regardless of page size.
+
+    ``fields`` are the serializer fields actually rendered (None for all);
+    data for fields pruned by ?view=compact or ?fields= is not loaded.
+    Counts for the extra ``categories`` are loaded in the same query.
+    """
+    prefetch_related_objects(businesses, *[f for f in ('owner', 'town', 'category') if _includes(fields, f)])
+    categories = list(categories)
+    if _includes(fields, 'recent_posts'):
+        recent_posts = load_recent_posts(businesses, context)
+        load_liked_posts(recent_posts, context)
+        categories += [p.category for p in recent_posts]
+    if _includes(fields, 'is_following'):
+        load_followed_businesses(businesses, context)
+    if _includes(fields, 'town'):
+        load_town_business_counts(_unique(b.town for b in businesses), context, _nested_fields(fields, 'town'))
+    if _includes(fields, 'category') and _includes(_nested_fields(fields, 'category'), 'businesses_count'):
+        categories += [b.category for b in businesses]
+    load_category_business_counts(_unique(categories), context)
+
+
+def preload_posts(posts, context, fields=None):
+    prefetch_related_objects(posts, *[f for f in ('business', 'author', 'category') if _includes(fields, f)])
+    if _includes(fields, 'is_liked'):
+        load_liked_posts(posts, context)
+    categories = []
+    if _includes(fields, 'category') and _includes(_nested_fields(fields, 'category'), 'businesses_count'):
+        categories = [p.category for p in posts]
+    if _includes(fields, 'business'):
+        businesses = _unique(p.business for p in posts)
+        preload_businesses(businesses, context, _nested_fields(fields, 'business'), categories)
+    else:
+        load_category_business_counts(_unique(categories), context)
+
+
+def preload_notifications(notifications, context, fields=None):
+    prefetch_related_objects(notifications, *[f for f in ('sender', 'related_business') if _includes(fields, f)])
+    if _includes(fields, 'related_business'):
+        businesses = _unique(n.related_business for n in notifications)
+        preload_businesses(businesses, context, _nested_fields(fields, 'related_business'))
+
+
+def load_comment_replies(comments, context):
+    """
+    First COMMENT_REPLIES_LIMIT replies of each thread (one windowed query)
+    and the reply count of each thread (one grouped query)
+    """
+    ids = _missing(context, 'comment_replies', comments)
+    if not ids:
+        return
+    replies = context['comment_replies']
+    counts = context.setdefault('comment_reply_counts', {})
+    for pk in ids:
+        replies[pk] = []
+    thread_replies = (
+        Comment.objects.filter(root_id__in=ids, is_active=True)
+        .select_related('user')
+        .annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('root_id'),
+            order_by=[F('created_at').asc(), F('id').asc()],
+        ))
+        .filter(row_number__lte=settings.ZONER_SETTINGS['COMMENT_REPLIES_LIMIT'])
+        .order_by('root_id', 'row_number')
+    )
+    for reply in thread_replies:
+        replies[reply.root_id].append(reply)
+    counts.update(dict.fromkeys(ids, 0))
+    counts.update(
+        Comment.objects.filter(root_id__in=ids, is_active=True)
+        .values('root_id')
+        .annotate(total=Count('id'))
+        .values_list('root_id', 'total')
+    )
+
+
+def preload_comments(comments, context, fields=None):
+    if _includes(fields, 'user'):
+        prefetch_related_objects(comments, 'user')
+    if any(_includes(fields, f) for f in ('replies', 'replies_count', 'replies_next')):
+        load_comment_replies([c for c in comments if c.root_id is None], context)
+
+
+def load_chat_unread_counts(chats, context):
+    ids = _missing(context, 'chat_unread_counts', chats)
+    if not ids:
+        return
+    counts = context['chat_unread_counts']
+    counts.update(dict.fromkeys(ids, 0))
+    user = _request_user(context)
+    if user is not None:
+        counts.update(
+            ChatReadState.objects.filter(user=user, chat_id__in=ids).values_list('chat_id', 'unread_count')
+        )
+
+
+def preload_chats(chats, context, fields=None):
+    """The inbox: participants, last messages, unread counters and businesses"""
+    prefetch_related_objects(chats, *[f for f in ('participants', 'business') if _includes(fields, f)])
+    if _includes(fields, 'last_message'):
+        prefetch_related_objects(chats, 'last_message__sender')
+    if _includes(fields, 'unread_count'):
+        load_chat_unread_counts(chats, context)
+    if _includes(fields, 'business'):
+        businesses = _unique(c.business for c in chats)
+        preload_businesses(businesses, context, _nested_fields(fields, 'business'))
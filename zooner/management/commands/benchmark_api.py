@@ -0,0 +1,224 @@
+import gc
+import io
+import json
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from zooner import analytics, search, timeline
+from zooner.benchmarks import count_queries, measure, percentile, scratch_database
+from zooner.models import Business, Chat, ChatReadState, Follow, Message, Notification, Post, User
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'api_baseline.json'
+
+# Rows seeded per unit of --scale
+DATASET = {'users': 2000, 'businesses': 100, 'posts': 2000, 'likes': 20000, 'follows': 6000, 'comments': 1000}
+CHATS = 30
+MESSAGES_PER_CHAT = 20
+NOTIFICATIONS = 200
+BYTES_TOLERANCE = 0.1  # Allowed payload growth over the baseline
+# Timed alongside the endpoints to gauge the machine: latencies are compared
+# in units of it, so a baseline recorded on a faster or slower machine holds
+REFERENCE_URL = '/api/categories/'
+
+# (name, who is signed in, URL template filled from the seeded fixtures)
+ENDPOINTS = [
+    ('feed', 'user', '/api/posts/?following=1'),
+    ('posts', None, '/api/posts/'),
+    ('business list', None, '/api/businesses/'),
+    ('business detail', None, '/api/businesses/{slug}/'),
+    ('search', None, '/api/search/?q=fresh'),
+    ('comments', None, '/api/posts/{post}/comments/'),
+    ('chat inbox', 'user', '/api/chats/'),
+    ('notifications', 'user', '/api/notifications/'),
+    ('dashboard', 'owner', '/api/dashboard/stats/'),
+    ('business analytics', 'owner', '/api/businesses/{business}/analytics/?bucket=week&from={year_ago}'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Measure SQL queries, payload size and latency of the main endpoints and fail on query or payload '
+            'growth over a stored baseline (and with --check-latency, on slowdowns)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1,
+                            help=f'Dataset size multiplier; 1 seeds {DATASET["users"]} users, '
+                                 f'{DATASET["likes"]} likes, ... (default: 1)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the generated dataset (default: 42)')
+        parser.add_argument('--repeat', type=int, default=30, help='Timed requests per endpoint (default: 30)')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help='Baseline JSON file (default: benchmarks/api_baseline.json)')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write the results as the new baseline instead of comparing')
+        parser.add_argument('--check-latency', action='store_true',
+                            help='Also fail on latency growth, relative to a reference request timed in the '
+                                 'same run; still noisier than queries and bytes')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p50 latency growth over the baseline, as a fraction (default: 0.25)')
+        parser.add_argument('--p95-tolerance', type=float, default=1.0,
+                            help='Allowed p95 latency growth, as a fraction; the tail is noisier (default: 1.0)')
+        parser.add_argument('--min-slowdown', type=float, default=2.0,
+                            help='Latency growth in ms always tolerated, to absorb timer noise (default: 2)')
+
+    def handle(self, *args, **options):
+        dataset = {'scale': options['scale'], 'seed': options['seed']}
+        baseline = None
+        if not options['save_baseline']:
+            baseline = self.load_baseline(options['baseline'], dataset)
+
+        # A private response cache, and no throttling (its history lives in the default cache)
+        caches = {
+            **settings.CACHES,
+            'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            'responses': {**settings.CACHES['responses'],
+                          'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                          'LOCATION': 'benchmark-api'},
+        }
+        with override_settings(DEBUG=False, CACHES=caches), scratch_database():
+            fixtures = self.seed(options['scale'], options['seed'])
+            # Keep collections of whatever seeding left in memory out of the timings
+            gc.collect()
+            gc.freeze()
+            results = self.run(fixtures, options['repeat'])
+            reference = round(percentile(measure(lambda: self.client(None).get(REFERENCE_URL), options['repeat']),
+                                         50), 3)
+        self.stdout.write(f"{'reference':<20} {reference:>7.2f}ms")
+
+        if options['save_baseline']:
+            path = Path(options['baseline'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({'dataset': dataset, 'reference_ms': reference, 'endpoints': results},
+                                       indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"✅ Baseline saved to {path}"))
+            return
+        self.compare(results, reference, baseline, options)
+
+    def load_baseline(self, path, dataset):
+        try:
+            baseline = json.loads(Path(path).read_text())
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {path}. Record one with --save-baseline.")
+        if baseline['dataset'] != dataset:
+            raise CommandError(
+                f"The baseline was recorded with {baseline['dataset']}; run with the same --scale and --seed "
+                f"or record a new one with --save-baseline."
+            )
+        return baseline
+
+    # Dataset
+
+    def seed(self, scale, seed):
+        sizes = {name: rows * scale for name, rows in DATASET.items()}
+        self.stdout.write("Seeding " + ", ".join(f"{rows} {name}" for name, rows in sizes.items()) + "...")
+        quiet = {'stdout': io.StringIO()}
+        call_command('generate_towns', **quiet)
+        call_command('generate_categories', **quiet)
+        for name, rows in sizes.items():
+            call_command(f'generate_{name}', count=rows, seed=seed, **quiet)
+        search.rebuild_index()
+        if timeline.is_enabled():
+            timeline.rebuild()
+        analytics.rollup()
+
+        owner = User.objects.filter(role='business').annotate(n=Count('owned_businesses')).order_by('-n', 'pk')[0]
+        business = owner.owned_businesses.order_by('pk')[0]
+        user = User.objects.filter(role='user').order_by('-following_count', 'pk')[0]
+        post = Post.objects.order_by('-comments_count', 'pk')[0]
+        self.seed_inbox(user)
+        Notification.objects.bulk_create([
+            Notification(recipient=user, sender=owner, notification_type='like', title='New like',
+                         message=f'{owner.username} liked your post', related_business=business)
+            for _ in range(NOTIFICATIONS)
+        ])
+        return {
+            'users': {'user': user, 'owner': owner},
+            'slug': Business.objects.filter(status='active').order_by('-followers_count', 'pk')[0].slug,
+            'business': business.pk,
+            'post': post.pk,
+            'year_ago': timezone.localdate() - timedelta(days=364),
+        }
+
+    def seed_inbox(self, user):
+        """Chats of ``user`` with the businesses they follow, with their inbox previews"""
+        follows = Follow.objects.filter(user=user).select_related('business')[:CHATS]
+        for follow in follows:
+            chat = Chat.objects.create(business=follow.business)
+            chat.participants.add(user, follow.business.owner_id)
+            messages = Message.objects.bulk_create([
+                Message(chat=chat, sender_id=(user.pk, follow.business.owner_id)[i % 2], content=f'Message {i}')
+                for i in range(MESSAGES_PER_CHAT)
+            ])
+            # What the message signals maintain, which bulk_create skips
+            Chat.objects.filter(pk=chat.pk).update(last_message=messages[-1],
+                                                   last_message_at=messages[-1].created_at)
+            ChatReadState.objects.filter(chat=chat, user=user).update(unread_count=MESSAGES_PER_CHAT // 2)
+
+    # Measurements
+
+    def client(self, user):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client
+
+    def run(self, fixtures, repeat):
+        results = {}
+        self.stdout.write(f"\n{'endpoint':<20} {'p50':>9} {'p95':>9} {'queries':>8} {'bytes':>9}")
+        for name, signed_in, template in ENDPOINTS:
+            client = self.client(fixtures['users'][signed_in] if signed_in else None)
+            url = template.format(**fixtures)
+            # Queries of the first (uncached) request, so caching can't hide an N+1
+            with count_queries() as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"GET {url} returned {response.status_code}: {response.content[:200]!r}")
+            samples = measure(lambda: client.get(url), repeat)
+            results[name] = {
+                'p50_ms': round(percentile(samples, 50), 2),
+                'p95_ms': round(percentile(samples, 95), 2),
+                'queries': len(queries),
+                'bytes': len(response.content),
+            }
+            result = results[name]
+            self.stdout.write(f"{name:<20} {result['p50_ms']:>7.2f}ms {result['p95_ms']:>7.2f}ms "
+                              f"{result['queries']:>8} {result['bytes']:>9}")
+        return results
+
+    def compare(self, results, reference, baseline, options):
+        budgets = {}
+        if options['check_latency']:
+            if 'reference_ms' not in baseline:
+                raise CommandError("The baseline has no reference timing; record a new one with --save-baseline.")
+            budgets = {'p50_ms': options['tolerance'], 'p95_ms': options['p95_tolerance']}
+            # Baseline latencies as this machine would run them
+            speed = reference / baseline['reference_ms']
+            self.stdout.write(f"Latencies scaled by {speed:.2f} (reference {reference:.2f}ms, "
+                              f"baseline {baseline['reference_ms']:.2f}ms)")
+        regressions = []
+        for name, result in results.items():
+            before = baseline['endpoints'].get(name)
+            if before is None:
+                self.stdout.write(self.style.WARNING(f"⚠️ {name}: not in the baseline"))
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: {result['queries']} queries (baseline {before['queries']})")
+            for metric, tolerance in budgets.items():
+                expected = before[metric] * speed
+                if result[metric] - expected > options['min_slowdown'] and \
+                        result[metric] > expected * (1 + tolerance):
+                    regressions.append(f"{name}: {metric[:3]} {result[metric]:.2f}ms "
+                                       f"(baseline {before[metric]:.2f}ms, {expected:.2f}ms here)")
+            if result['bytes'] > before['bytes'] * (1 + BYTES_TOLERANCE):
+                regressions.append(f"{name}: {result['bytes']} bytes (baseline {before['bytes']})")
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"❌ {regression}"))
+            raise CommandError(f"{len(regressions)} regressions against the baseline.")
+        self.stdout.write(self.style.SUCCESS("✅ No regressions against the baseline."))
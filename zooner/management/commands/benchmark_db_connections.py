@@ -0,0 +1,111 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+from zooner.benchmarks import percentile, scratch_database
+from zooner.models import Business
+
+# (mode, CONN_MAX_AGE, pooled)
+MODES = [
+    ('new connection per request', 0, False),
+    ('persistent (CONN_MAX_AGE)', 600, False),
+    ('pooled (psycopg_pool)', 0, True),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/second with per-request, persistent and pooled PostgreSQL connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode (default: 2000)')
+        parser.add_argument('--threads', type=int, default=settings.GUNICORN_THREADS,
+                            help='Concurrent requests, as the threads of one gunicorn worker '
+                                 '(default: GUNICORN_THREADS)')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'postgresql':
+            raise CommandError(f"Point DATABASE_URL at PostgreSQL; the default database is {connection.vendor}.")
+        settings_dict = connection.settings_dict
+        saved = {key: settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+
+        # The response cache would answer without touching the database
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        caches = {**settings.CACHES, 'default': dummy, 'responses': dummy}
+        with override_settings(CACHES=caches), scratch_database():
+            url = f'/api/businesses/{self.seed()}/'
+            self.stdout.write(f"\n{options['requests']} GET {url} on {options['threads']} threads")
+            self.stdout.write(f"{'mode':<30} {'req/s':>8} {'p50':>9} {'p95':>9} {'new connections':>16}")
+            try:
+                for mode, conn_max_age, pooled in MODES:
+                    # Updated in place: the connections of new threads are built from this dict
+                    options_dict = {key: value for key, value in saved['OPTIONS'].items() if key != 'pool'}
+                    settings_dict.update(CONN_MAX_AGE=conn_max_age, CONN_HEALTH_CHECKS=True,
+                                         OPTIONS={**options_dict, 'pool': True} if pooled else options_dict)
+                    try:
+                        connection.pool
+                    except ImproperlyConfigured as e:
+                        self.stdout.write(self.style.WARNING(f"⚠️ {mode}: skipped, {e}"))
+                        continue
+                    try:
+                        self.run(mode, url, options['requests'], options['threads'])
+                    finally:
+                        connection.close_pool()
+            finally:
+                settings_dict.update(saved)
+
+    def seed(self):
+        quiet = {'stdout': io.StringIO()}
+        call_command('generate_towns', **quiet)
+        call_command('generate_categories', **quiet)
+        call_command('generate_users', count=50, seed=42, **quiet)
+        call_command('generate_businesses', count=10, seed=42, **quiet)
+        return Business.objects.filter(status='active').order_by('pk').values_list('slug', flat=True)[0]
+
+    def run(self, mode, url, requests, threads):
+        """``requests`` GETs of ``url`` through the WSGI handler, as the threads of a gunicorn worker serve them"""
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        opened = set()  # Server connections; the pool and persistent connections reuse theirs
+
+        def track(sender, connection, **kwargs):
+            opened.add(connection.connection)
+
+        def serve(_):
+            start = time.perf_counter()
+            response = handler(factory.get(url).environ, lambda status, headers: None)
+            ok = response.status_code == 200
+            response.close()  # request_finished: Django closes, keeps or returns the connection
+            if not ok:
+                raise CommandError(f"GET {url} returned {response.status_code}")
+            return (time.perf_counter() - start) * 1000
+
+        # Each thread closes its own connection, as the worker would on exit
+        barrier = threading.Barrier(threads)
+
+        def close(_):
+            barrier.wait()
+            connections.close_all()
+
+        connections.close_all()
+        connection_created.connect(track)
+        try:
+            with ThreadPoolExecutor(threads) as executor:
+                list(executor.map(serve, range(threads)))  # Start the threads
+                warm = set(opened)
+                start = time.perf_counter()
+                timings = list(executor.map(serve, range(requests)))
+                elapsed = time.perf_counter() - start
+                list(executor.map(close, range(threads)))
+        finally:
+            connection_created.disconnect(track)
+        self.stdout.write(f"{mode:<30} {requests / elapsed:>8.0f} {percentile(timings, 50):>7.2f}ms "
+                          f"{percentile(timings, 95):>7.2f}ms {len(opened - warm):>16}")
@@ -0,0 +1,83 @@
+import tempfile
+import time
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from zooner import engagement
+from zooner.benchmarks import scratch_database
+from zooner.models import Business, Post, Town, User, UserEngagement
+from zooner.views import EngagementIngestView
+
+
+class Command(BaseCommand):
+    help = 'Compare engagement events/second of one INSERT per event with batched ingestion via /engagement/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=50000, help='Events to ingest (default: 50000)')
+        parser.add_argument('--batch', type=int, default=200, help='Events per request (default: 200)')
+        parser.add_argument('--naive-events', type=int, default=5000,
+                            help='Events inserted one by one for the baseline (default: 5000)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as log_dir, scratch_database():
+            overrides = {**settings.ZONER_SETTINGS, 'ENGAGEMENT_LOG_DIR': log_dir,
+                         'ENGAGEMENT_MAX_PENDING': options['events'] + options['batch']}
+            with override_settings(ZONER_SETTINGS=overrides):
+                user, post = self.seed()
+                self.naive(user, post, options['naive_events'])
+                self.batched(user, post, options['events'], options['batch'])
+
+    def seed(self):
+        user = User.objects.create(username='bench', email='bench@zoner.app')
+        town = Town.objects.create(name='Bench Town', slug='bench-town')
+        business = Business.objects.create(owner=user, name='Bench', slug='bench', description='-',
+                                           town=town, status='active')
+        return user, Post.objects.create(business=business, author=user, caption='Bench')
+
+    def event(self, post):
+        return {'id': str(uuid.uuid4()), 'type': 'view', 'post': str(post.pk), 'session_id': 'bench',
+                'metadata': {'screen': 'feed', 'position': 3}}
+
+    def report(self, label, events, seconds):
+        self.stdout.write(f"  {label:<40} {events:>8} events {seconds:>8.2f}s {events / seconds:>10.0f} events/s")
+
+    def naive(self, user, post, count):
+        self.stdout.write("One INSERT per event")
+        start = time.perf_counter()
+        for _ in range(count):
+            UserEngagement.objects.create(user=user, engagement_type='view', related_post=post,
+                                          session_id='bench', metadata={'screen': 'feed', 'position': 3})
+        self.report('UserEngagement.objects.create()', count, time.perf_counter() - start)
+
+    def batched(self, user, post, count, batch_size):
+        self.stdout.write(f"Batched through POST /api/engagement/ ({batch_size} per request)")
+        factory = APIRequestFactory()
+        view = EngagementIngestView.as_view(throttle_classes=[])
+        stored_before = UserEngagement.objects.count()
+        batches = [[self.event(post) for _ in range(batch_size)] for _ in range(count // batch_size)]
+
+        start = time.perf_counter()
+        for batch in batches:
+            request = factory.post('/api/engagement/', {'events': batch}, format='json')
+            force_authenticate(request, user)
+            response = view(request)
+            assert response.status_code == 202, response.data
+        accepted = time.perf_counter() - start
+
+        while engagement.buffer.pending:
+            time.sleep(0.01)
+        stored = time.perf_counter() - start
+
+        total = len(batches) * batch_size
+        self.report('accepted (validated, logged, buffered)', total, accepted)
+        self.report('stored (bulk_create by the flusher)', total, stored)
+
+        # Clients retry whole batches: resending is deduplicated on the event ids
+        request = factory.post('/api/engagement/', {'events': batches[0]}, format='json')
+        force_authenticate(request, user)
+        view(request)
+        engagement.buffer.flush()
+        duplicates = UserEngagement.objects.count() - stored_before - total
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} events stored, {duplicates} duplicates after a retried batch"))
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from zooner.benchmarks import measure, percentile, scratch_database
+from zooner.models import Business, Post, Town, User
+from zooner.pagination import PostCursorPagination
+
+
+class Command(BaseCommand):
+    help = 'Compare page-N latency of page-number (OFFSET) and keyset pagination on the post feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Number of posts to seed (default: 200000)')
+        parser.add_argument('--depths', type=int, nargs='+', default=[1, 10, 100, 1000, 5000],
+                            help='Page numbers to measure')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per page (default: 20)')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['rows'])
+            self.run(options['rows'], options['depths'], options['repeat'])
+
+    def seed(self, rows):
+        self.stdout.write(f"Seeding {rows} posts...")
+        owner = User.objects.create(username='bench', email='bench@zoner.app')
+        town = Town.objects.create(name='Bench Town', slug='bench-town')
+        business = Business.objects.create(owner=owner, name='Bench', slug='bench', description='-',
+                                           town=town, status='active')
+        start = timezone.now()
+        batch = []
+        for i in range(rows):
+            # Every 10th post shares its timestamp with the previous one to exercise the id tie-breaker
+            published_at = start - timedelta(seconds=i - (1 if i % 10 == 0 and i else 0))
+            batch.append(Post(business=business, author=owner, caption=f'Post {i}', published_at=published_at))
+            if len(batch) == 10000:
+                Post.objects.bulk_create(batch)
+                batch = []
+        Post.objects.bulk_create(batch)
+
+    def run(self, rows, depths, repeat):
+        factory = APIRequestFactory()
+        queryset = Post.objects.filter(is_active=True)
+        page_size = PostCursorPagination.page_size
+
+        self.stdout.write(f"{'page':>8} {'offset p50':>12} {'offset p95':>12} {'keyset p50':>12} {'keyset p95':>12}")
+        for depth in depths:
+            if (depth - 1) * page_size >= rows:
+                continue
+
+            def offset_page():
+                request = Request(factory.get('/api/posts/', {'page': depth}))
+                list(PageNumberPagination().paginate_queryset(queryset, request))
+
+            cursor = None
+            if depth > 1:
+                last_seen = queryset.order_by(*PostCursorPagination.ordering)[(depth - 1) * page_size - 1]
+                cursor = PostCursorPagination().encode_cursor(last_seen)
+
+            def keyset_page():
+                params = {'cursor': cursor} if cursor else {}
+                request = Request(factory.get('/api/posts/', params))
+                PostCursorPagination().paginate_queryset(queryset, request)
+
+            offset = measure(offset_page, repeat)
+            keyset = measure(keyset_page, repeat)
+            self.stdout.write(
+                f"{depth:>8} {percentile(offset, 50):>10.2f}ms {percentile(offset, 95):>10.2f}ms "
+                f"{percentile(keyset, 50):>10.2f}ms {percentile(keyset, 95):>10.2f}ms"
+            )
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import math
+import time
+import tracemalloc
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from zooner import realtime
+from zooner.benchmarks import measure, percentile, scratch_database
+from zooner.models import Business, Chat, Message, Notification, Town, User
+from zooner.websocket import websocket_application
+
+
+class Socket:
+    """In-memory ASGI transport standing in for a client connection"""
+
+    def __init__(self, bench, user, token):
+        self.bench = bench
+        self.user = user
+        self.scope = {'type': 'websocket', 'path': '/ws/', 'query_string': f'token={token}'.encode()}
+        self.inbox = asyncio.Queue()
+        self.connected = asyncio.Event()
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def send(self, message):
+        if message['type'] == 'websocket.close':
+            raise RuntimeError(f"Connection refused with code {message['code']}")
+        if message['type'] != 'websocket.send':
+            return
+        event = json.loads(message['text'])
+        if event['type'] == 'connected':
+            self.connected.set()
+        else:
+            self.bench.delivered(event)
+
+
+class Command(BaseCommand):
+    help = 'Measure WebSocket connections and push latency of one worker against the polling load they replace'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000,
+                            help='Concurrent WebSocket connections (default: 2000)')
+        parser.add_argument('--rounds', type=int, default=20,
+                            help='Events pushed to every connection (default: 20)')
+        parser.add_argument('--messages', type=int, default=50,
+                            help='Chat messages created and pushed end to end (default: 50)')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds between polls of a polling client (default: 5)')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed requests per polled endpoint (default: 50)')
+
+    def handle(self, *args, **options):
+        options_ = {**settings.ZONER_SETTINGS, 'REALTIME_ENABLED': True,
+                    'REALTIME_BROKER': 'zooner.realtime.InProcessBroker'}
+        with override_settings(ZONER_SETTINGS=options_), scratch_database():
+            users, chat = self.seed(options['connections'])
+            poll_ms = self.polling(users[0], chat, options['repeat'])
+            asyncio.run(self.run(users, chat, options))
+            self.report_polling(options['connections'], options['poll_interval'], poll_ms)
+
+    def seed(self, connections):
+        self.stdout.write(f"Seeding {connections} users...")
+        users = User.objects.bulk_create([
+            User(username=f'ws{i}', email=f'ws{i}@zoner.app') for i in range(connections)
+        ])
+        town = Town.objects.create(name='Bench Town', slug='bench-town')
+        business = Business.objects.create(owner=users[1], name='Bench', slug='bench', description='-',
+                                           town=town, status='active')
+        chat = Chat.objects.create(business=business)
+        chat.participants.add(users[0], users[1])
+        for i in range(20):
+            Message.objects.create(chat=chat, sender=users[i % 2], content=f'Message {i}')
+            Notification.objects.create(recipient=users[0], sender=users[1], notification_type='message',
+                                        title='New message', message=f'Message {i}', related_business=business)
+        return users, chat
+
+    # Polling
+
+    def polling(self, user, chat, repeat):
+        """Median server time of the two requests a polling client repeats"""
+        client = APIClient()
+        client.force_authenticate(user)
+        timings = {}
+        for path in ('/api/notifications/', '/api/chats/<id>/messages/'):
+            url = path.replace('<id>', str(chat.pk))
+            timings[path] = percentile(measure(lambda: client.get(url), repeat), 50)
+        return timings
+
+    def report_polling(self, connections, interval, timings):
+        self.stdout.write("\nPolling equivalent")
+        for path, ms in timings.items():
+            self.stdout.write(f"  GET {path:<30} p50 {ms:>7.2f}ms")
+        rate = connections / interval * len(timings)
+        busy = rate * sum(timings.values()) / len(timings) / 1000
+        self.stdout.write(
+            f"  {connections} clients polling every {interval:g}s: {rate:.0f} req/s, "
+            f"{busy:.2f} worker-seconds per second (~{max(1, math.ceil(busy))} workers), "
+            f"whether or not anything changed"
+        )
+
+    # WebSockets
+
+    def delivered(self, event):
+        if event['type'] == 'bench':
+            self.latencies.append((time.perf_counter() - event['sent']) * 1000)
+        elif event['type'] == 'message':
+            self.latencies.append((time.perf_counter() - self.sent[event['message']['content']]) * 1000)
+        self.pending -= 1
+        if self.pending == 0:
+            self.done.set()
+
+    async def expect(self, count, publish):
+        self.pending, self.done = count, asyncio.Event()
+        start = time.perf_counter()
+        await publish()
+        await asyncio.wait_for(self.done.wait(), timeout=60)
+        return (time.perf_counter() - start) * 1000
+
+    async def run(self, users, chat, options):
+        broker = realtime.get_broker()
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        sockets = [Socket(self, user, token) for user, token in zip(users, tokens)]
+        tasks = []
+        for socket in sockets:
+            tasks.append(asyncio.create_task(websocket_application(socket.scope, socket.receive, socket.send)))
+            socket.inbox.put_nowait({'type': 'websocket.connect'})
+        await asyncio.gather(*(socket.connected.wait() for socket in sockets))
+        connect_ms = (time.perf_counter() - start) * 1000
+        per_socket = (tracemalloc.get_traced_memory()[0] - baseline) / len(sockets)
+        tracemalloc.stop()
+
+        self.stdout.write(f"\nWebSockets ({broker.subscriber_count()} connected)")
+        self.stdout.write(f"  connect + authenticate: {connect_ms:>9.0f}ms total, "
+                          f"{connect_ms / len(sockets):.2f}ms each, ~{per_socket / 1024:.1f} KiB each")
+
+        # Broadcast: one event to every connection
+        self.latencies, rounds = [], []
+        for _ in range(options['rounds']):
+            async def broadcast():
+                realtime.publish_to_users([user.pk for user in users],
+                                          {'type': 'bench', 'sent': time.perf_counter()})
+            rounds.append(await self.expect(len(sockets), broadcast))
+        self.stdout.write(
+            f"  push to all {len(sockets)}: p50 {percentile(rounds, 50):.1f}ms per round, "
+            f"delivery p50 {percentile(self.latencies, 50):.1f}ms p99 {percentile(self.latencies, 99):.1f}ms"
+        )
+
+        # End to end: a saved chat message reaches both participants
+        self.latencies, self.sent = [], {}
+        create = sync_to_async(Message.objects.create)
+        for i in range(options['messages']):
+            content = f'Pushed {i}'
+
+            async def send_message():
+                self.sent[content] = time.perf_counter()
+                await create(chat=chat, sender=users[0], content=content)
+            await self.expect(2, send_message)
+        self.stdout.write(
+            f"  chat message save -> socket: p50 {percentile(self.latencies, 50):.1f}ms "
+            f"p99 {percentile(self.latencies, 99):.1f}ms"
+        )
+
+        for socket in sockets:
+            socket.inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.gather(*tasks)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(sockets)} idle connections cost no requests; each change costs one push per recipient"
+        ))
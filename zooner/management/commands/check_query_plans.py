@@ -0,0 +1,113 @@
+import re
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from zooner.models import Business, Comment, Message, Notification, Post, UserEngagement
+from zooner.pagination import (
+    CommentCursorPagination, MessageCursorPagination, NotificationCursorPagination, PostCursorPagination,
+    keyset_filter,
+)
+
+# Any id will do: plans depend on the query shape, not on the rows
+ID = uuid.UUID(int=1)
+IDS = [uuid.UUID(int=n) for n in range(1, 4)]
+
+# SQLite: a full pass over a table (a SCAN not driven by an index, subquery
+# results aside), or a sort
+SQLITE_SCAN = re.compile(r'\bSCAN (?!\()(?!.*\bUSING (?:COVERING )?INDEX\b)\S+')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (?:ORDER|GROUP) BY')
+
+
+def page(queryset, pagination, position=True):
+    """``queryset`` as PostCursorPagination & co. fetch a page (the first, or a later one)"""
+    queryset = queryset.order_by(*pagination.ordering)
+    if position:
+        queryset = queryset.filter(keyset_filter(pagination.ordering, (timezone.now(), ID)))
+    return queryset[:pagination.page_size or 20]
+
+
+def hot_queries():
+    """(name, queryset) of the hot reads, shaped like the views and loaders that run them"""
+    posts = Post.objects.filter(is_active=True)
+    businesses = Business.objects.filter(status='active')
+    return [
+        # PostListView, search and the timeline fan-out
+        ('post feed', page(posts, PostCursorPagination, position=False)),
+        ('post feed, later page', page(posts, PostCursorPagination)),
+        ('business posts', page(posts.filter(business_id=ID), PostCursorPagination)),
+        # Without the loader's final sort, which only orders the few rows kept per business
+        ('recent posts (loaders)', posts.filter(business_id__in=IDS).annotate(row_number=Window(
+            expression=RowNumber(), partition_by=F('business_id'), order_by=F('published_at').desc(),
+        )).order_by()),
+        # BusinessListView, and the per-town/category counts of the loaders
+        ('business list', businesses.order_by('-created_at')[:20]),
+        ('town business counts', businesses.filter(town_id__in=IDS)
+            .values('town_id').annotate(total=Count('id')).values_list('town_id', 'total')),
+        ('category business counts', businesses.filter(category_id__in=IDS)
+            .values('category_id').annotate(total=Count('id')).values_list('category_id', 'total')),
+        # PostCommentsView, CommentRepliesView and the replies loader
+        ('post comments', page(Comment.objects.filter(post_id=ID, root=None, is_active=True),
+                               CommentCursorPagination)),
+        ('comment replies', page(Comment.objects.filter(root_id=ID, is_active=True), CommentCursorPagination)),
+        ('reply counts (loaders)', Comment.objects.filter(root_id__in=IDS, is_active=True)
+            .values('root_id').annotate(total=Count('id')).values_list('root_id', 'total')),
+        # Chat history and chats.mark_read
+        ('chat messages', page(Message.objects.filter(chat_id=ID), MessageCursorPagination)),
+        ('unread messages', Message.objects.filter(chat_id=ID, is_read=False).exclude(sender_id=ID)),
+        # NotificationListView and notifications._coalesce
+        ('notifications', page(Notification.objects.filter(recipient_id=ID), NotificationCursorPagination)),
+        ('unread notifications', Notification.objects.filter(
+            recipient_id__in=IDS, notification_type='like', is_read=False,
+            updated_at__gte=timezone.now() - timedelta(
+                seconds=settings.ZONER_SETTINGS['NOTIFICATION_COALESCE_WINDOW']),
+        ).order_by('recipient_id', '-updated_at')),
+        # analytics.rollup: engagement written late since the last run
+        ('late engagement (analytics)', UserEngagement.objects.filter(written_at__gte=timezone.now())
+            .order_by().values_list('created_at', flat=True)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot queries and fail if any of them scans a table or sorts instead of using an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to check (default: default)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only the failures')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        check = getattr(self, f'check_{connection.vendor}', None)
+        if check is None:
+            raise CommandError(f"Query plans can't be checked on {connection.vendor}.")
+
+        failures = 0
+        for name, queryset in hot_queries():
+            plan, problems = check(connection, queryset.using(options['database']))
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"❌ {name}: {', '.join(problems)}"))
+            else:
+                self.stdout.write(f"✅ {name}")
+            if problems or options['verbose_plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f"{failures} hot queries don't use an index. Is every migration applied?")
+        self.stdout.write(self.style.SUCCESS("✅ Every hot query uses an index."))
+
+    def check_sqlite(self, connection, queryset):
+        plan = queryset.explain()
+        return plan, [match.group(0) for line in plan.splitlines()
+                      for match in (SQLITE_SCAN.search(line), SQLITE_SORT.search(line)) if match]
+
+    def check_postgresql(self, connection, queryset):
+        # With sequential scans priced out, any "Seq Scan" left has no index to use
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        return plan, [line.strip() for line in plan.splitlines() if 'Seq Scan' in line]
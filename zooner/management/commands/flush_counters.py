@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from zooner.counters import flush_counter_shards
+
+
+class Command(BaseCommand):
+    help = 'Fold pending sharded like/comment counts into their posts'
+
+    def handle(self, *args, **kwargs):
+        flushed = flush_counter_shards()
+        self.stdout.write(self.style.SUCCESS(f"✅ {flushed} counter shards flushed."))
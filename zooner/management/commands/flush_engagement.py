@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from zooner.engagement import replay_segments
+
+
+class Command(BaseCommand):
+    help = 'Store engagement events left in log segments by stopped or crashed processes'
+
+    def handle(self, *args, **kwargs):
+        replayed = replay_segments()
+        self.stdout.write(self.style.SUCCESS(f"✅ {replayed} engagement events replayed."))
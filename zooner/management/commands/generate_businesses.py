@@ -1,84 +1,86 @@
+from decimal import Decimal
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from zooner.models import Business, Town, Category
 from django.utils.text import slugify
-from random import choice, randint, uniform
-import faker
-import uuid
+from zooner import geo
+from zooner.generators import Generator, Timer, add_arguments, ids, insert
+from zooner.models import Business, Category, Town, User
+
+BUSINESS_NAMES = [
+    "Jumbo Mart", "Tech Savvy", "Fresh Bites", "Bella Salon", "Quick Cleaners",
+    "Smart Electronics", "Sunrise Pharmacy", "Urban Gym", "Blue Bakery", "Classic Tailors",
+    "Happy Kids School", "Green Gardens", "Safari Rides", "Sparkle Auto", "Digital Hub",
+    "Mama Mboga", "Tamu Treats", "Photo Point", "Prime Print", "The Wellness Spot"
+]
+BUSINESS_HOURS = {
+    "Monday": "8am - 6pm",
+    "Tuesday": "8am - 6pm",
+    "Wednesday": "8am - 6pm",
+    "Thursday": "8am - 6pm",
+    "Friday": "8am - 6pm",
+    "Saturday": "9am - 4pm",
+    "Sunday": "Closed"
+}
+SPREAD = 0.05  # Degrees around the town centre (~5km)
 
-fake = faker.Faker()
-User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Generate sample businesses for testing'
 
-    def handle(self, *args, **kwargs):
-        owners = User.objects.all()
-        towns = Town.objects.all()
-        categories = Category.objects.all()
+    def add_arguments(self, parser):
+        add_arguments(parser, f'Businesses to create (default: {len(BUSINESS_NAMES)})')
+
+    def handle(self, *args, **options):
+        count = options['count'] if options['count'] is not None else len(BUSINESS_NAMES)
+        rng = Generator(options['seed'])
+        timer = Timer()
 
-        if not owners.exists():
+        # Business accounts own the businesses when there are any
+        owners = ids(User.objects.filter(role='business')) or ids(User.objects.all())
+        towns = list(Town.objects.order_by('pk').values_list('pk', 'latitude', 'longitude'))
+        categories = ids(Category.objects.all())
+
+        if not owners:
             self.stdout.write(self.style.ERROR("❌ No users found. Please create at least one user."))
             return
 
-        if not towns.exists():
+        if not towns:
             self.stdout.write(self.style.ERROR("❌ No towns found. Please run `generate_towns` first."))
             return
 
-        if not categories.exists():
+        if not categories:
             self.stdout.write(self.style.ERROR("❌ No categories found. Please run `generate_categories` first."))
             return
 
-        business_names = [
-            "Jumbo Mart", "Tech Savvy", "Fresh Bites", "Bella Salon", "Quick Cleaners",
-            "Smart Electronics", "Sunrise Pharmacy", "Urban Gym", "Blue Bakery", "Classic Tailors",
-            "Happy Kids School", "Green Gardens", "Safari Rides", "Sparkle Auto", "Digital Hub",
-            "Mama Mboga", "Tamu Treats", "Photo Point", "Prime Print", "The Wellness Spot"
-        ]
-
-        created = 0
-
-        for name in business_names:
-            owner = choice(owners)
-            town = choice(towns)
-            category = choice(categories)
-            slug = slugify(name) + "-" + uuid.uuid4().hex[:5]
-
-            description = fake.text(max_nb_chars=300)
-            email = fake.email()
-            phone = fake.phone_number()
-            address = fake.address()
-            lat = round(uniform(-1.5, 1.5), 6)
-            lon = round(uniform(34.0, 40.0), 6)
-            website = fake.url()
-            hours = {
-                "Monday": "8am - 6pm",
-                "Tuesday": "8am - 6pm",
-                "Wednesday": "8am - 6pm",
-                "Thursday": "8am - 6pm",
-                "Friday": "8am - 6pm",
-                "Saturday": "9am - 4pm",
-                "Sunday": "Closed"
-            }
-
-            Business.objects.create(
-                owner=owner,
-                name=name,
-                slug=slug,
-                description=description,
-                town=town,
-                address=address,
-                latitude=lat,
-                longitude=lon,
-                category=category,
-                phone=phone,
-                email=email,
-                website=website,
-                business_hours=hours,
-                status=choice(['active', 'pending', 'suspended']),
-                is_featured=choice([True, False]),
-                is_verified=choice([True, False])
-            )
-            created += 1
+        def businesses():
+            for _ in range(count):
+                pk = rng.uuid()
+                name = rng.choice(BUSINESS_NAMES)
+                town, lat, lon = rng.choice(towns)
+                if lat is None or lon is None:
+                    lat, lon = rng.uniform(-1.5, 1.5), rng.uniform(34.0, 40.0)
+                lat = round(float(lat) + rng.uniform(-SPREAD, SPREAD), 6)
+                lon = round(float(lon) + rng.uniform(-SPREAD, SPREAD), 6)
+                yield Business(
+                    id=pk,
+                    owner_id=rng.choice(owners),
+                    name=name,
+                    slug=f'{slugify(name)}-{pk.hex[:8]}',
+                    description=rng.sentence(rng.randint(15, 50)),
+                    town_id=town,
+                    address=f'{rng.randint(1, 999)} {rng.choice(["Moi", "Kenyatta", "Market", "Station"])} Road',
+                    latitude=Decimal(str(lat)),
+                    longitude=Decimal(str(lon)),
+                    geohash=geo.encode(lat, lon),  # Set by a pre_save signal bulk_create skips
+                    category_id=rng.choice(categories),
+                    phone=rng.phone(),
+                    email=f'contact-{pk.hex[:8]}@example.com',
+                    website=f'https://{slugify(name)}-{pk.hex[:8]}.example.com',
+                    business_hours=BUSINESS_HOURS,
+                    status=rng.choices(['active', 'pending', 'suspended'], [8, 1, 1])[0],
+                    is_featured=rng.random() < 0.1,
+                    is_verified=rng.random() < 0.5,
+                )
 
-        self.stdout.write(self.style.SUCCESS(f"✅ {created} businesses created successfully."))
+        created = insert(Business, businesses(), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {created} businesses created successfully in {timer}."))
+        self.stdout.write(self.style.WARNING("⚠️ Run `rebuild_search_index` to make them searchable."))
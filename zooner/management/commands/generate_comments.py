@@ -1,48 +1,51 @@
 from django.core.management.base import BaseCommand
-from zooner.models import Comment, User, Post
-from faker import Faker
-import random
+from zooner.counters import rebuild_counters
+from zooner.generators import Generator, Timer, add_arguments, ids, insert
+from zooner.models import Comment, Post, User
+
 
 class Command(BaseCommand):
     help = 'Generate fake comments for existing posts and users'
 
-    def handle(self, *args, **kwargs):
-        fake = Faker()
+    def add_arguments(self, parser):
+        add_arguments(parser, 'Top-level comments to create, each with 0 to 3 replies (default: 50)')
 
-        users = list(User.objects.all())
-        posts = list(Post.objects.all())
+    def handle(self, *args, **options):
+        count = options['count'] if options['count'] is not None else 50
+        rng = Generator(options['seed'])
+        timer = Timer()
+        users = ids(User.objects.all())
+        posts = ids(Post.objects.all())
 
         if not users or not posts:
             self.stdout.write(self.style.ERROR("❌ No users or posts found. Please create them first."))
             return
 
-        comments_created = 0
-
-        for _ in range(50):  # Generate 50 top-level comments
-            user = random.choice(users)
-            post = random.choice(posts)
-            content = fake.sentence(nb_words=15)
-
-            comment = Comment.objects.create(
-                user=user,
-                post=post,
-                content=content,
-                is_active=random.choice([True, True, True, False]),  # Mostly active
-            )
-            comments_created += 1
-
-            # Randomly generate 0–3 replies to this comment
-            for _ in range(random.randint(0, 3)):
-                reply_user = random.choice(users)
-                reply_content = fake.sentence(nb_words=10)
-
-                Comment.objects.create(
-                    user=reply_user,
-                    post=post,
-                    parent=comment,
-                    content=reply_content,
-                    is_active=True
+        def comments():
+            for _ in range(count):
+                comment = Comment(
+                    id=rng.uuid(),
+                    user_id=rng.choice(users),
+                    post_id=rng.choice(posts),
+                    content=rng.sentence(15),
+                    is_active=rng.random() < 0.75,  # Mostly active
                 )
-                comments_created += 1
-
-        self.stdout.write(self.style.SUCCESS(f"✅ Successfully created {comments_created} comments and replies."))
+                yield comment
+
+                # Randomly generate 0–3 replies to this comment; root and depth
+                # are set by a pre_save signal bulk_create skips
+                for _ in range(rng.randint(0, 3)):
+                    yield Comment(
+                        id=rng.uuid(),
+                        user_id=rng.choice(users),
+                        post_id=comment.post_id,
+                        parent_id=comment.pk,
+                        root_id=comment.pk,
+                        depth=1,
+                        content=rng.sentence(10),
+                        is_active=True,
+                    )
+
+        created = insert(Comment, comments(), options['batch_size'])
+        rebuild_counters({'Post.comments_count'})
+        self.stdout.write(self.style.SUCCESS(f"✅ Successfully created {created} comments and replies in {timer}."))
@@ -1,40 +1,38 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from zooner.models import Follow, Business
-from random import choice, sample
-import uuid
+from zooner import timeline
+from zooner.counters import rebuild_counters
+from zooner.generators import Generator, Timer, add_arguments, ids, insert, pairs
+from zooner.models import Business, Follow, User
 
-User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Generate user-business follow relationships'
 
-    def handle(self, *args, **kwargs):
-        users = User.objects.all()
-        businesses = Business.objects.all()
+    def add_arguments(self, parser):
+        add_arguments(parser, 'Follows to create, spread unevenly over the users (default: 3 to 7 per user)')
 
-        if not users.exists():
+    def handle(self, *args, **options):
+        rng = Generator(options['seed'])
+        timer = Timer()
+        users = ids(User.objects.all())
+        businesses = ids(Business.objects.all())
+
+        if not users:
             self.stdout.write(self.style.ERROR("❌ No users found."))
             return
 
-        if not businesses.exists():
+        if not businesses:
             self.stdout.write(self.style.ERROR("❌ No businesses found."))
             return
 
-        created = 0
-        skipped = 0
-
-        for user in users:
-            # Each user follows 3–7 random businesses
-            followed_businesses = sample(list(businesses), min(len(businesses), choice([3, 4, 5, 6, 7])))
-
-            for biz in followed_businesses:
-                # Avoid duplicate follows
-                if Follow.objects.filter(user=user, business=biz).exists():
-                    skipped += 1
-                    continue
-
-                Follow.objects.create(user=user, business=biz)
-                created += 1
-
-        self.stdout.write(self.style.SUCCESS(f"✅ {created} follows created, {skipped} skipped (already existed)."))
+        follows = (
+            Follow(id=rng.uuid(), user_id=user, business_id=business)
+            for user, business in pairs(rng, users, businesses, options['count'], per_left=(3, 7))
+        )
+        created = insert(Follow, follows, options['batch_size'])
+        rebuild_counters({'Business.followers_count', 'User.followers_count', 'User.following_count'})
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {created} follows created in {timer} (pairs that already existed were skipped)."
+        ))
+        if timeline.is_enabled():
+            self.stdout.write(self.style.WARNING("⚠️ Run `rebuild_timelines` to fill the new followers' feeds."))
@@ -1,38 +1,35 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from zooner.models import Like, Post
-from random import sample, randint
+from zooner.counters import rebuild_counters
+from zooner.generators import Generator, Timer, add_arguments, ids, insert, pairs
+from zooner.models import Like, Post, User
 
-User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Generate random likes for posts'
 
-    def handle(self, *args, **kwargs):
-        users = User.objects.all()
-        posts = Post.objects.all()
+    def add_arguments(self, parser):
+        add_arguments(parser, 'Likes to create, spread unevenly over the users (default: 5 to 10 per user)')
 
-        if not users.exists():
+    def handle(self, *args, **options):
+        rng = Generator(options['seed'])
+        timer = Timer()
+        users = ids(User.objects.all())
+        posts = ids(Post.objects.all())
+
+        if not users:
             self.stdout.write(self.style.ERROR("❌ No users found. Please create users first."))
             return
 
-        if not posts.exists():
+        if not posts:
             self.stdout.write(self.style.ERROR("❌ No posts found. Please generate posts first."))
             return
 
-        created = 0
-        skipped = 0
-
-        for user in users:
-            # Randomly like 5–10 posts per user
-            liked_posts = sample(list(posts), min(len(posts), randint(5, 10)))
-
-            for post in liked_posts:
-                if Like.objects.filter(user=user, post=post).exists():
-                    skipped += 1
-                    continue
-
-                Like.objects.create(user=user, post=post)
-                created += 1
-
-        self.stdout.write(self.style.SUCCESS(f"✅ {created} likes created, {skipped} skipped (already existed)."))
+        likes = (
+            Like(id=rng.uuid(), user_id=user, post_id=post)
+            for user, post in pairs(rng, users, posts, options['count'], per_left=(5, 10))
+        )
+        created = insert(Like, likes, options['batch_size'])
+        rebuild_counters({'Post.likes_count', 'Business.likes_count'})
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {created} likes created in {timer} (pairs that already existed were skipped)."
+        ))
@@ -1,58 +1,59 @@
+from datetime import timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.contrib.auth import get_user_model
-from zooner.models import Post, Business, Category
-from random import choice, randint, sample
-import faker
+from zooner import timeline
+from zooner.counters import rebuild_counters
+from zooner.generators import Generator, Timer, add_arguments, ids, insert
+from zooner.models import Business, Category, Post
+
+POST_TYPES = ['update', 'promotion', 'event', 'product', 'announcement']
+HASHTAGS = ['#offer', '#new', '#event', '#discount', '#update', '#launch', '#special', '#business', '#local', '#shop']
+PUBLISHED_WITHIN = timedelta(days=90)
 
-fake = faker.Faker()
-User = get_user_model()
 
 class Command(BaseCommand):
     help = 'Generate sample business posts'
 
-    def handle(self, *args, **kwargs):
-        businesses = Business.objects.all()
-        users = User.objects.all()
-        categories = Category.objects.all()
+    def add_arguments(self, parser):
+        add_arguments(parser, 'Posts to create, spread over the businesses (default: 2 to 5 per business)')
 
-        if not businesses.exists():
-            self.stdout.write(self.style.ERROR("❌ No businesses found. Run `generate_businesses` first."))
-            return
+    def handle(self, *args, **options):
+        rng = Generator(options['seed'])
+        timer = Timer()
+        businesses = list(Business.objects.order_by('pk').values_list('pk', 'owner_id'))
+        categories = ids(Category.objects.all())
 
-        if not users.exists():
-            self.stdout.write(self.style.ERROR("❌ No users found. Create at least one user."))
+        if not businesses:
+            self.stdout.write(self.style.ERROR("❌ No businesses found. Run `generate_businesses` first."))
             return
 
-        post_types = ['update', 'promotion', 'event', 'product', 'announcement']
-        hashtags_pool = ['#offer', '#new', '#event', '#discount', '#update', '#launch', '#special', '#business', '#local', '#shop']
-
-        created = 0
-
-        for business in businesses:
-            for _ in range(randint(2, 5)):  # Generate 2 to 5 posts per business
-                caption = fake.sentence(nb_words=15)
-                post_type = choice(post_types)
-                tags = sample(hashtags_pool, randint(2, 5))
-                author = business.owner
-                category = choice(categories)
-
-                Post.objects.create(
-                    business=business,
-                    author=author,
-                    caption=caption,
-                    post_type=post_type,
-                    tags=tags,
-                    category=category,
-                    likes_count=randint(0, 100),
-                    comments_count=randint(0, 50),
-                    shares_count=randint(0, 30),
-                    views_count=randint(10, 500),
+        if options['count'] is not None:
+            authors = (rng.choice(businesses) for _ in range(options['count']))
+        else:
+            authors = (business for business in businesses for _ in range(rng.randint(2, 5)))
+        now = timezone.now()
+
+        def posts():
+            for business, owner in authors:
+                yield Post(
+                    id=rng.uuid(),
+                    business_id=business,
+                    author_id=owner,
+                    caption=rng.sentence(15),
+                    post_type=rng.choice(POST_TYPES),
+                    tags=rng.sample(HASHTAGS, rng.randint(2, 5)),
+                    category_id=rng.choice(categories) if categories else None,
+                    shares_count=rng.randint(0, 30),
+                    views_count=rng.randint(10, 500),
                     is_active=True,
-                    is_featured=choice([True, False]),
-                    is_pinned=choice([True, False]),
-                    published_at=timezone.now()
+                    is_featured=rng.random() < 0.1,
+                    is_pinned=rng.random() < 0.05,
+                    published_at=now - PUBLISHED_WITHIN * rng.random(),
                 )
-                created += 1
 
-        self.stdout.write(self.style.SUCCESS(f"✅ {created} posts generated successfully."))
+        created = insert(Post, posts(), options['batch_size'])
+        rebuild_counters({'Business.posts_count'})
+        self.stdout.write(self.style.SUCCESS(f"✅ {created} posts generated successfully in {timer}."))
+        self.stdout.write(self.style.WARNING("⚠️ Run `rebuild_search_index` to make them searchable."))
+        if timeline.is_enabled():
+            self.stdout.write(self.style.WARNING("⚠️ Run `rebuild_timelines` to add them to followers' feeds."))
@@ -1,34 +1,47 @@
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
-from zooner.models import User
-from faker import Faker
 from django.utils import timezone
+from zooner.generators import FIRST_NAMES, LAST_NAMES, LOCATIONS, Generator, Timer, add_arguments, insert
+from zooner.models import User
+
+PASSWORD = 'password123'
+ROLES = ['user', 'business', 'admin']
+ROLE_WEIGHTS = [85, 14, 1]
+
 
 class Command(BaseCommand):
-    help = "Generate 29 fake users with password 'password123'"
+    help = f"Generate fake users with password '{PASSWORD}'"
 
-    def handle(self, *args, **kwargs):
-        fake = Faker()
-        password = 'password123'
+    def add_arguments(self, parser):
+        add_arguments(parser, 'Users to create (default: 29)')
 
-        for _ in range(29):
-            username = fake.user_name()
-            email = fake.unique.email()
-            phone = fake.phone_number()
-            location = fake.city()
-            bio = fake.text(max_nb_chars=200)
-            role = fake.random_element(elements=['user', 'business', 'admin'])
+    def handle(self, *args, **options):
+        count = options['count'] if options['count'] is not None else 29
+        rng = Generator(options['seed'])
+        timer = Timer()
+        # One hash for everyone: hashing is deliberately slow (~100ms each)
+        password = make_password(PASSWORD)
+        now = timezone.now()
 
-            user = User(
-                username=username,
-                email=email,
-                phone_number=phone,
-                location=location,
-                bio=bio,
-                role=role,
-                is_verified=fake.boolean(chance_of_getting_true=70),
-                last_active=timezone.now()
-            )
-            user.set_password(password)
-            user.save()
+        def users():
+            for _ in range(count):
+                pk = rng.uuid()
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                username = f'{first}.{last}.{pk.hex[:8]}'.lower()
+                yield User(
+                    id=pk,
+                    username=username,
+                    email=f'{username}@example.com',
+                    password=password,
+                    first_name=first,
+                    last_name=last,
+                    phone_number=rng.phone(),
+                    location=rng.choice(LOCATIONS),
+                    bio=rng.sentence(rng.randint(5, 25)),
+                    role=rng.choices(ROLES, ROLE_WEIGHTS)[0],
+                    is_verified=rng.random() < 0.7,
+                    last_active=now,
+                )
 
-        self.stdout.write(self.style.SUCCESS('✅ Successfully created 29 fake users'))
+        created = insert(User, users(), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Successfully created {created} fake users in {timer}'))
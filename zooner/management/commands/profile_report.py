@@ -0,0 +1,92 @@
+import json
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from zooner.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = 'Summarize the request profiling log: slowest endpoints and worst repeated-query (N+1) offenders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.ZONER_SETTINGS['PROFILING_LOG'],
+                            help='Profiling log to read (default: PROFILING_LOG)')
+        parser.add_argument('--top', type=int, default=10, help='Rows per section (default: 10)')
+        parser.add_argument('--min-requests', type=int, default=1,
+                            help='Leave out endpoints profiled fewer times than this (default: 1)')
+
+    def handle(self, *args, **options):
+        records = self.read(options['log'])
+        if not records:
+            self.stdout.write(self.style.WARNING(
+                "⚠️ No profiled requests yet. Set PROFILING_ENABLED=True and send some traffic."
+            ))
+            return
+        self.stdout.write(f"{len(records)} profiled requests\n")
+        self.endpoints(records, options['top'], options['min_requests'])
+        self.duplicates(records, options['top'])
+
+    def read(self, path):
+        try:
+            file = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            raise CommandError(f"No profiling log at {path}.")
+        records = []
+        with file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass  # Not a profile line
+        return records
+
+    def endpoints(self, records, top, min_requests):
+        routes = defaultdict(list)
+        for record in records:
+            routes[f"{record['method']} {record['route'] or record['path']}"].append(record)
+
+        rows = []
+        for route, requests in routes.items():
+            if len(requests) < min_requests:
+                continue
+            durations = [r['duration_ms'] for r in requests]
+            rows.append((
+                route, len(requests), percentile(durations, 50), percentile(durations, 95),
+                sum(r['queries'] for r in requests) / len(requests),
+                sum(r['db_ms'] for r in requests) / len(requests),
+                sum(r['serialize_ms'] for r in requests) / len(requests),
+                sum(r['response_bytes'] or 0 for r in requests) / len(requests) / 1024,
+            ))
+        rows.sort(key=lambda row: row[3], reverse=True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest endpoints (by p95)"))
+        self.stdout.write(f"  {'endpoint':<55} {'reqs':>6} {'p50':>9} {'p95':>9} {'queries':>8} "
+                          f"{'db':>9} {'serialize':>10} {'size':>9}")
+        for route, count, p50, p95, queries, db, serialize, size in rows[:top]:
+            self.stdout.write(f"  {route[:55]:<55} {count:>6} {p50:>7.1f}ms {p95:>7.1f}ms {queries:>8.1f} "
+                              f"{db:>7.1f}ms {serialize:>8.1f}ms {size:>7.1f}KB")
+
+    def duplicates(self, records, top):
+        offenders = defaultdict(lambda: {'requests': 0, 'queries': 0, 'worst': 0, 'ms': 0.0, 'routes': set()})
+        for record in records:
+            for duplicate in record['duplicates']:
+                offender = offenders[(duplicate['origin'], duplicate['sql'])]
+                offender['requests'] += 1
+                offender['queries'] += duplicate['count']
+                offender['worst'] = max(offender['worst'], duplicate['count'])
+                offender['ms'] += duplicate['ms']
+                offender['routes'].add(f"{record['method']} {record['route'] or record['path']}")
+
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING("Worst N+1 offenders (by repeated queries)"))
+        if not offenders:
+            self.stdout.write(self.style.SUCCESS("✅ No query repeated often enough within a request."))
+            return
+        ranked = sorted(offenders.items(), key=lambda item: item[1]['queries'], reverse=True)
+        for (origin, sql), offender in ranked[:top]:
+            self.stdout.write(
+                f"  {offender['queries']} queries in {offender['requests']} requests "
+                f"(up to {offender['worst']} per request, {offender['ms']:.1f}ms) from {origin or 'unknown'}"
+            )
+            self.stdout.write(f"    {', '.join(sorted(offender['routes']))}")
+            self.stdout.write(f"    {sql[:160]}")
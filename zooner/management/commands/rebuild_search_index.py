@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from zooner import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for businesses and posts'
+
+    def handle(self, *args, **kwargs):
+        if search.get_backend() is None:
+            raise CommandError("The configured database has no full-text search index.")
+        total = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"✅ Search index rebuilt with {total} documents."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from zooner import timeline
+from zooner.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every precomputed home feed from follows and recent posts'
+
+    def handle(self, *args, **kwargs):
+        timeline.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"✅ Timelines rebuilt with {FeedEntry.objects.count()} entries."))
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from zooner import analytics
+
+
+class Command(BaseCommand):
+    help = 'Roll UserEngagement, Follow, Like and Comment rows up into daily BusinessAnalytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='first_day', type=date.fromisoformat,
+                            help='Recompute from this day (YYYY-MM-DD) instead of the watermark')
+        parser.add_argument('--to', dest='last_day', type=date.fromisoformat,
+                            help='Last day to recompute with --from (default: today)')
+        parser.add_argument('--all', action='store_true', help='Recompute every day with activity')
+
+    def handle(self, *args, **options):
+        first_day, last_day = options['first_day'], options['last_day']
+        if options['all']:
+            first_day = analytics.first_activity() or timezone.localdate()
+        if first_day is None:
+            if last_day is not None:
+                raise CommandError('--to needs --from')
+            written = analytics.rollup()
+            self.stdout.write(self.style.SUCCESS(f"✅ {written} daily rows updated since the last run."))
+            return
+
+        last_day = last_day or timezone.localdate()
+        if last_day < first_day:
+            raise CommandError('--to is before --from')
+        written = analytics.rollup_range(first_day, last_day)
+        days = (last_day - first_day + timedelta(days=1)).days
+        self.stdout.write(self.style.SUCCESS(f"✅ {written} daily rows written for {days} days ({first_day} to {last_day})."))
@@ -0,0 +1,187 @@
+import io
+import logging
+import multiprocessing
+import random
+import tempfile
+import time
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+from zonner_backend.celery import app
+from zooner import routers
+from zooner.benchmarks import count_queries, percentile, scratch_database
+from zooner.generators import ids
+from zooner.models import Business, Chat, Post, User
+
+# What a gunicorn worker serves: likes, follows and messages, and the public pages
+WRITES = ['like', 'follow', 'message']
+READS = ['/api/businesses/', '/api/posts/', '/api/businesses/{slug}/', '/api/posts/{post}/comments/']
+
+
+class FailedHooks(logging.Handler):
+    """Counts the on_commit hooks (notification tasks) that failed, which the request doesn't see"""
+
+    def __init__(self, errors):
+        super().__init__(logging.ERROR)
+        self.errors = errors
+
+    def emit(self, record):
+        error = record.exc_info[1] if record.exc_info else record.getMessage()
+        self.errors[f'on_commit {type(error).__name__}: {error}'] += 1
+
+
+def stress(role, number, fixtures, seconds, results):
+    """One worker process: ``role`` requests for ``seconds``, then its stats on ``results``"""
+    rng = random.Random(number)
+    client = APIClient()
+    errors, timings = Counter(), []
+    # Counted in the report instead of logged with a traceback each
+    logging.getLogger('django.request').disabled = True
+    hooks = logging.getLogger('django.db.backends.base')
+    hooks.addHandler(FailedHooks(errors))
+    hooks.propagate = False
+    replica = count_queries(routers.REPLICA) if routers.is_enabled() else nullcontext([])
+    with replica as replica_queries:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            request(role, rng, client, fixtures, errors, timings)
+    connections.close_all()
+    results.put((role, errors, timings, len(replica_queries)))
+
+
+def request(role, rng, client, fixtures, errors, timings):
+    client.force_authenticate(User(pk=rng.choice(fixtures['users'])))
+    if role == 'writer':
+        action = rng.choice(WRITES)
+        if action == 'like':
+            method, url, data = client.post, f"/api/posts/{rng.choice(fixtures['posts'])}/like/", None
+        elif action == 'follow':
+            method, url, data = client.post, f"/api/businesses/{rng.choice(fixtures['businesses'])}/follow/", None
+        else:
+            chat, sender = rng.choice(fixtures['chats'])
+            client.force_authenticate(User(pk=sender))
+            method, url, data = client.post, f'/api/chats/{chat}/messages/create/', {'content': 'Stress'}
+    else:
+        method, data = client.get, None
+        url = rng.choice(READS).format(slug=rng.choice(fixtures['slugs']), post=rng.choice(fixtures['posts']))
+    start = time.perf_counter()
+    try:
+        response = method(url, data, format='json')
+        if response.status_code >= 400:
+            errors[f'HTTP {response.status_code}'] += 1
+    except Exception as e:
+        errors[f'{type(e).__name__}: {e}'] += 1
+    timings.append((time.perf_counter() - start) * 1000)
+
+
+class Command(BaseCommand):
+    help = 'Hammer a scratch copy of the SQLite database from several processes and fail on any lock error'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4,
+                            help='Processes liking, following and messaging (default: 4)')
+        parser.add_argument('--readers', type=int, default=4, help='Processes reading the public pages (default: 4)')
+        parser.add_argument('--seconds', type=float, default=10, help='How long every process runs (default: 10)')
+        parser.add_argument('--untuned', action='store_true',
+                            help="Use SQLite's defaults (rollback journal, deferred transactions, 5s timeout) "
+                                 "instead of the OPTIONS in DATABASES, for comparison")
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"stress_sqlite stresses SQLite; the default database is {connection.vendor}.")
+        tuned_options = connection.settings_dict['OPTIONS']
+        if options['untuned']:
+            connection.settings_dict['OPTIONS'] = {}
+
+        # No throttling or response caching: every request reaches the database
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        caches = {**settings.CACHES, 'default': dummy, 'responses': dummy}
+        # Notifications are written inline, as the Celery workers would alongside
+        # (the CELERY_ name: Celery reads the namespaced key first)
+        eager = app.conf.CELERY_TASK_ALWAYS_EAGER
+        app.conf.CELERY_TASK_ALWAYS_EAGER = True
+        try:
+            with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=caches), \
+                    scratch_database(Path(directory) / 'stress.sqlite3'):
+                fixtures = self.seed()
+                if options['untuned']:
+                    # Undo migration 0014
+                    with connection.cursor() as cursor:
+                        cursor.execute('PRAGMA journal_mode=DELETE')
+                results = self.run(fixtures, options)
+        finally:
+            app.conf.CELERY_TASK_ALWAYS_EAGER = eager
+            connection.settings_dict['OPTIONS'] = tuned_options
+        self.report(results, options['seconds'])
+
+    def seed(self):
+        quiet = {'stdout': io.StringIO()}
+        call_command('generate_towns', **quiet)
+        call_command('generate_categories', **quiet)
+        for name, count in [('users', 200), ('businesses', 20), ('posts', 200), ('comments', 200)]:
+            call_command(f'generate_{name}', count=count, seed=42, **quiet)
+        rng = random.Random(42)
+        customers = ids(User.objects.filter(role='user'))
+        chats = []
+        for business in Business.objects.select_related('owner').order_by('pk'):
+            customer = rng.choice(customers)
+            chat = Chat.objects.create(business=business)
+            chat.participants.add(customer, business.owner)
+            chats += [(chat.pk, customer), (chat.pk, business.owner_id)]
+        active = Business.objects.filter(status='active')
+        return {
+            'users': ids(User.objects.all()),
+            'businesses': ids(active),
+            'slugs': list(active.values_list('slug', flat=True)),
+            'posts': ids(Post.objects.filter(is_active=True)),
+            'chats': chats,
+        }
+
+    def run(self, fixtures, options):
+        self.stdout.write(f"{options['writers']} writers and {options['readers']} readers for "
+                          f"{options['seconds']:g}s{' (untuned)' if options['untuned'] else ''}...")
+        # Forked workers inherit the scratch database settings; not its open connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        roles = ['writer'] * options['writers'] + ['reader'] * options['readers']
+        processes = [
+            context.Process(target=stress, args=(role, number, fixtures, options['seconds'], results))
+            for number, role in enumerate(roles)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return collected
+
+    def report(self, results, seconds):
+        errors = Counter()
+        self.stdout.write(f"\n{'':<8} {'requests':>9} {'req/s':>8} {'p50':>9} {'p95':>9} {'errors':>7} "
+                          f"{'replica queries':>16}")
+        for role in ('writer', 'reader'):
+            mine = [result for result in results if result[0] == role]
+            if not mine:
+                continue
+            failed = Counter()
+            for _, role_errors, _, _ in mine:
+                failed.update(role_errors)
+            errors.update(failed)
+            timings = [timing for result in mine for timing in result[2]]
+            self.stdout.write(f"{role + 's':<8} {len(timings):>9} {len(timings) / seconds:>8.0f} "
+                              f"{percentile(timings, 50):>7.1f}ms {percentile(timings, 95):>7.1f}ms "
+                              f"{sum(failed.values()):>7} {sum(result[3] for result in mine):>16}")
+
+        if errors:
+            for error, count in errors.most_common():
+                self.stdout.write(self.style.ERROR(f"❌ {count} × {error[:200]}"))
+            raise CommandError(f"{sum(errors.values())} errors under concurrent load.")
+        self.stdout.write(self.style.SUCCESS("✅ No lock errors under concurrent load."))
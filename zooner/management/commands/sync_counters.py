@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from zooner.counters import rebuild_counters, verify_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify) the denormalized follower/post/like counter columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report counters that are out of sync; exit with an error if any are.'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            drift = {name: rows for name, rows in verify_counters().items() if rows}
+            if drift:
+                for name, rows in drift.items():
+                    self.stdout.write(self.style.WARNING(f"⚠️ {name}: {rows} rows out of sync"))
+                raise CommandError("Counters are out of sync. Run `sync_counters` to rebuild them.")
+            self.stdout.write(self.style.SUCCESS("✅ All counters are in sync."))
+            return
+
+        rebuild_counters()
+        self.stdout.write(self.style.SUCCESS("✅ Counters rebuilt successfully."))
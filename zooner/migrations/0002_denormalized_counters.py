@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:42
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, outer_field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{outer_field: OuterRef('pk')})
+            .order_by()
+            .values(outer_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def populate_counters(apps, schema_editor):
+    Business = apps.get_model('zooner', 'Business')
+    User = apps.get_model('zooner', 'User')
+    Follow = apps.get_model('zooner', 'Follow')
+    Post = apps.get_model('zooner', 'Post')
+    Like = apps.get_model('zooner', 'Like')
+
+    Business.objects.update(
+        followers_count=_count(Follow.objects.all(), 'business'),
+        posts_count=_count(Post.objects.all(), 'business'),
+        likes_count=_count(Like.objects.all(), 'post__business'),
+    )
+    User.objects.update(
+        followers_count=_count(Follow.objects.all(), 'business__owner'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
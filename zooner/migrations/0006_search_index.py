@@ -0,0 +1,89 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE zooner_search_index USING fts5(
+    key, kind UNINDEXED, object_id UNINDEXED, town_id UNINDEXED, title, body,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+)
+"""
+
+SQLITE_POPULATE = [
+    """
+    INSERT INTO zooner_search_index (key, kind, object_id, town_id, title, body)
+    SELECT 'o' || b.id || ' b' || b.id, 'business', b.id, b.town_id, b.name, b.description
+    FROM zooner_business b WHERE b.status = 'active'
+    """,
+    """
+    INSERT INTO zooner_search_index (key, kind, object_id, town_id, title, body)
+    SELECT 'o' || p.id || ' b' || p.business_id, 'post', p.id, b.town_id,
+           COALESCE((SELECT group_concat(ltrim(t.value, '#'), ' ') FROM json_each(p.tags) t), ''),
+           p.caption
+    FROM zooner_post p JOIN zooner_business b ON b.id = p.business_id WHERE p.is_active
+    """,
+]
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE zooner_search_index (
+        kind varchar(10) NOT NULL,
+        object_id uuid NOT NULL,
+        business_id uuid NOT NULL,
+        town_id uuid NULL,
+        title text NOT NULL DEFAULT '',
+        body text NOT NULL DEFAULT '',
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+        ) STORED,
+        PRIMARY KEY (kind, object_id)
+    )
+    """,
+    "CREATE INDEX zooner_search_document_idx ON zooner_search_index USING GIN (document)",
+    "CREATE INDEX zooner_search_business_idx ON zooner_search_index (business_id)",
+]
+
+POSTGRES_POPULATE = [
+    """
+    INSERT INTO zooner_search_index (kind, object_id, business_id, town_id, title, body)
+    SELECT 'business', b.id, b.id, b.town_id, b.name, b.description
+    FROM zooner_business b WHERE b.status = 'active'
+    """,
+    """
+    INSERT INTO zooner_search_index (kind, object_id, business_id, town_id, title, body)
+    SELECT 'post', p.id, p.business_id, b.town_id,
+           COALESCE((SELECT string_agg(ltrim(t.value, '#'), ' ')
+                     FROM jsonb_array_elements_text(p.tags::jsonb) t), ''),
+           p.caption
+    FROM zooner_post p JOIN zooner_business b ON b.id = p.business_id WHERE p.is_active
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [SQLITE_CREATE, *SQLITE_POPULATE]
+    elif vendor == 'postgresql':
+        statements = [*POSTGRES_CREATE, *POSTGRES_POPULATE]
+    else:
+        # No native full-text index; SearchView falls back to icontains
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS zooner_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0005_feed_entries'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
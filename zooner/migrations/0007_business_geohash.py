@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:53
+
+from django.db import migrations, models
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=9):
+    # Frozen copy of zooner.geo.encode
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, float(longitude)) if even else (lat_range, float(latitude))
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def populate_geohashes(apps, schema_editor):
+    Business = apps.get_model('zooner', 'Business')
+    located = Business.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for business in located.only('pk', 'latitude', 'longitude').iterator(chunk_size=1000):
+        business.geohash = encode(business.latitude, business.longitude)
+        batch.append(business)
+    Business.objects.bulk_update(batch, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(populate_geohashes, migrations.RunPython.noop),
+    ]
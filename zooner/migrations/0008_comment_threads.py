@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_threads(apps, schema_editor):
+    # Walk the reply trees one level at a time from the top-level comments
+    Comment = apps.get_model('zooner', 'Comment')
+    depth = 0
+    while True:
+        parents = Comment.objects.filter(pk=OuterRef('parent_id'))
+        updated = Comment.objects.filter(parent__isnull=False, parent__depth=depth).exclude(
+            parent__parent__isnull=False, parent__root__isnull=True,
+        ).update(
+            root=Coalesce(Subquery(parents.values('root_id')[:1]), 'parent_id'),
+            depth=depth + 1,
+        )
+        if not updated:
+            break
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0007_business_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_replies', to='zooner.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'root', 'created_at', 'id'], name='comment_post_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['root', 'created_at', 'id'], name='comment_thread_keyset_idx'),
+        ),
+        migrations.RunPython(populate_threads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def populate_inbox_state(apps, schema_editor):
+    Chat = apps.get_model('zooner', 'Chat')
+    Message = apps.get_model('zooner', 'Message')
+    ChatReadState = apps.get_model('zooner', 'ChatReadState')
+
+    latest = Message.objects.filter(chat=OuterRef('pk')).order_by('-created_at', '-id')
+    Chat.objects.update(
+        last_message=Subquery(latest.values('pk')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+    )
+
+    # Unread messages of a participant are the unread ones sent by others
+    unread = {}
+    for chat_id, sender_id, total in (
+        Message.objects.filter(is_read=False).values('chat_id', 'sender_id')
+        .annotate(total=Count('id')).values_list('chat_id', 'sender_id', 'total')
+    ):
+        unread.setdefault(chat_id, {})[sender_id] = total
+    states = []
+    for chat_id, user_id in Chat.participants.through.objects.values_list('chat_id', 'user_id').iterator():
+        by_sender = unread.get(chat_id, {})
+        states.append(ChatReadState(
+            chat_id=chat_id,
+            user_id=user_id,
+            unread_count=sum(by_sender.values()) - by_sender.get(user_id, 0),
+        ))
+    ChatReadState.objects.bulk_create(states, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0008_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='zooner.message'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ChatReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='zooner.chat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('chat', 'user')},
+            },
+        ),
+        migrations.RunPython(populate_inbox_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0009_chat_inbox_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='events_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
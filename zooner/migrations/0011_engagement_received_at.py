@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0010_notification_events_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userengagement',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
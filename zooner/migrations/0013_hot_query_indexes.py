@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0012_analytics_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_keyset_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_thread_keyset_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_published_keyset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['-created_at'], name='business_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['town'], name='business_active_town_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['category'], name='business_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_active', True), ('root', None)), fields=['post', 'created_at', 'id'], name='comment_post_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['root', 'created_at', 'id'], name='comment_thread_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['chat', 'sender'], name='message_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', 'notification_type', '-created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-published_at', '-id'], name='post_active_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['business', '-published_at', '-id'], name='post_business_active_idx'),
+        ),
+    ]
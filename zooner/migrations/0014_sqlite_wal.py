@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:20
+
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # Persisted in the database file, so set once here rather than by every
+    # connection (settings.DATABASES); only outside a transaction
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+
+def disable_wal(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=DELETE')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('zooner', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, disable_wal),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:30
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # Rows already stored were written when created, as far as rollups go:
+    # otherwise the next rollup would recompute every day since the first event
+    UserEngagement = apps.get_model('zooner', 'UserEngagement')
+    UserEngagement.objects.update(written_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zooner', '0014_sqlite_wal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userengagement',
+            name='written_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userengagement',
+            index=models.Index(fields=['written_at'], name='engagement_written_idx'),
+        ),
+    ]
@@ -28,6 +28,10 @@ class User(AbstractUser):
     updated_at = models.DateTimeField(auto_now=True)
     last_active = models.DateTimeField(default=timezone.now)
     
+    # Denormalized counters (maintained by zooner.signals, rebuilt by sync_counters)
+    followers_count = models.PositiveIntegerField(default=0)  # Followers across owned businesses
+    following_count = models.PositiveIntegerField(default=0)  # Businesses this user follows
+    
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
@@ -103,6 +107,7 @@ class Business(models.Model):
     address = models.TextField(max_length=500, blank=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)  # Set from latitude/longitude
     
     # Business details
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='businesses')
@@ -122,6 +127,11 @@ class Business(models.Model):
     is_featured = models.BooleanField(default=False)
     is_verified = models.BooleanField(default=False)
     
+    # Denormalized counters (maintained by zooner.signals, rebuilt by sync_counters)
+    followers_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)  # Likes across all posts
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -129,17 +139,18 @@ class Business(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Businesses'
+        indexes = [
+            # Only active businesses are listed: the business list (newest
+            # first) and the per-town/category counts read these alone
+            models.Index(fields=['-created_at'], condition=models.Q(status='active'),
+                         name='business_active_created_idx'),
+            models.Index(fields=['town'], condition=models.Q(status='active'), name='business_active_town_idx'),
+            models.Index(fields=['category'], condition=models.Q(status='active'),
+                         name='business_active_category_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.town.name}"
-    
-    @property
-    def followers_count(self):
-        return self.followers.count()
-    
-    @property
-    def posts_count(self):
-        return self.posts.count()
 
 
 class Post(models.Model):
@@ -189,11 +200,38 @@ class Post(models.Model):
     
     class Meta:
         ordering = ['-published_at']
+        indexes = [
+            # Keyset pagination (PostCursorPagination) of active posts: the
+            # feed, and one business's posts (business page, timelines,
+            # recent posts)
+            models.Index(fields=['-published_at', '-id'], condition=models.Q(is_active=True),
+                         name='post_active_keyset_idx'),
+            models.Index(fields=['business', '-published_at', '-id'], condition=models.Q(is_active=True),
+                         name='post_business_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.business.name} - {self.caption[:50]}..."
 
 
+class PostCounterShard(models.Model):
+    """
+    Pending counter deltas for high-traffic posts
+    Used to store: Likes/comments absorbed across several rows instead of the
+    single Post row; flushed into Post periodically (see flush_counters)
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    likes_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['post', 'shard']
+    
+    def __str__(self):
+        return f"Counter shard {self.shard} for post {self.post_id}"
+
+
 class Follow(models.Model):
     """
     User-Business follow relationship
@@ -206,11 +244,36 @@ class Follow(models.Model):
     
     class Meta:
         unique_together = ['user', 'business']
+        indexes = [
+            # Daily analytics rollups (zooner.analytics) scan by date
+            models.Index(fields=['created_at'], name='follow_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} follows {self.business.name}"
 
 
+class FeedEntry(models.Model):
+    """
+    Precomputed home-feed entry (fan-out-on-write timeline)
+    Used to store: One row per (follower, post), written when a followed business posts
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='+')
+    published_at = models.DateTimeField()  # Copied from the post so a feed page is one index range read
+    
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-published_at', '-post'], name='feed_entry_timeline_idx'),
+            models.Index(fields=['user', 'business'], name='feed_entry_user_business_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Feed entry for {self.user_id}: post {self.post_id}"
+
+
 class Like(models.Model):
     """
     Post likes model
@@ -223,6 +286,9 @@ class Like(models.Model):
     
     class Meta:
         unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['created_at'], name='like_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} likes {self.post.business.name}'s post"
@@ -237,6 +303,11 @@ class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Top-level comment of the thread (null for top-level comments) and
+    # nesting level, set by zooner.signals; a whole thread is one range read
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='thread_replies', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     
     content = models.TextField(max_length=500)
     is_active = models.BooleanField(default=True)
@@ -246,6 +317,15 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Active top-level comments of a post (root IS NULL) and active
+            # replies of a thread, both paged by (created_at, id)
+            models.Index(fields=['post', 'created_at', 'id'], condition=models.Q(root=None, is_active=True),
+                         name='comment_post_active_idx'),
+            models.Index(fields=['root', 'created_at', 'id'], condition=models.Q(is_active=True),
+                         name='comment_thread_active_idx'),
+            models.Index(fields=['created_at'], name='comment_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} commented on {self.post.business.name}'s post"
@@ -266,6 +346,11 @@ class Chat(models.Model):
     business = models.ForeignKey(Business, on_delete=models.CASCADE, null=True, blank=True, related_name='chats')
     chat_type = models.CharField(max_length=15, choices=CHAT_TYPES, default='user_business')
     
+    # Denormalized inbox preview (maintained by zooner.signals)
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+', editable=False)
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -278,6 +363,23 @@ class Chat(models.Model):
         return f"Chat: {participant_names}"
 
 
+class ChatReadState(models.Model):
+    """
+    Per-participant read state of a chat
+    Used to store: Unread message counters for the inbox
+    """
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_read_states')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['chat', 'user']
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.unread_count} unread in {self.chat_id}"
+
+
 class Message(models.Model):
     """
     Individual messages within chats
@@ -306,6 +408,12 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination within a chat (MessageCursorPagination)
+            models.Index(fields=['chat', 'created_at', 'id'], name='message_chat_keyset_idx'),
+            # Unread messages of a chat from the other participants (chats.mark_read)
+            models.Index(fields=['chat', 'sender'], condition=models.Q(is_read=False), name='message_unread_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} in {self.chat}"
@@ -343,11 +451,24 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     is_sent = models.BooleanField(default=False)  # For push notifications
     
+    # Events coalesced into this notification ("12 people liked your post")
+    events_count = models.PositiveIntegerField(default=1)
+    
     created_at = models.DateTimeField(auto_now_add=True)
+    # Time of the latest event coalesced into it, which lists are ordered by.
+    # Not auto_now: marking a notification read mustn't move it.
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
     read_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            # Keyset pagination per recipient (NotificationCursorPagination)
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_keyset_idx'),
+            # Unread notifications of a recipient, where new events are coalesced
+            models.Index(fields=['recipient', 'notification_type', '-updated_at'], condition=models.Q(is_read=False),
+                         name='notification_unread_idx'),
+        ]
     
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.title}"
@@ -378,10 +499,17 @@ class UserEngagement(models.Model):
     metadata = models.JSONField(default=dict, blank=True)  # Store additional data
     session_id = models.CharField(max_length=100, blank=True)
     
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set explicitly by batched ingestion (zooner.engagement) to the time the batch was received
+    created_at = models.DateTimeField(default=timezone.now)
+    # When the row was inserted: later than created_at for replayed log segments and retried flushes
+    written_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='engagement_created_idx'),
+            models.Index(fields=['written_at'], name='engagement_written_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.engagement_type}"
@@ -419,6 +547,19 @@ class BusinessAnalytics(models.Model):
         return f"{self.business.name} analytics for {self.date}"
 
 
+class RollupWatermark(models.Model):
+    """
+    Progress marker of an incremental rollup job
+    Used to store: The time up to which a rollup (e.g. zooner.analytics) has processed its source rows
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} up to {self.value}"
+
+
 class ReportedContent(models.Model):
     """
     Content reporting model for moderation
@@ -0,0 +1,165 @@
+# ============================================================================
+# NOTIFICATIONS.PY - Notification fan-out, run by the tasks in zooner.tasks
+# ============================================================================
+#
+# Activity is turned into Notification rows off the request path: the signal
+# handlers queue a task once the triggering row is committed and the task
+# calls one of the notify_* functions below.
+#
+# Rows are written with bulk_create in batches, so a post reaching thousands
+# of followers costs a few INSERTs. Likes, comments, follows and messages on
+# the same target are coalesced: while the recipient still has an unread
+# notification for it younger than NOTIFICATION_COALESCE_WINDOW, that row is
+# updated ("alice and 11 others liked your post") and moved back to the top
+# (Notification.updated_at, which lists are ordered and paged by; created_at
+# stays the time of the first event) instead of a new one being added. Two workers racing on the first event of
+# a burst can at worst leave two rows for it.
+
+import itertools
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import realtime
+from .models import Chat, Comment, Follow, Message, Notification, Post, User
+
+BATCH_SIZE = 1000
+COALESCED_TYPES = ('like', 'comment', 'follow', 'message')
+
+TITLES = dict(Notification.NOTIFICATION_TYPES)
+ACTIONS = {
+    'like': 'liked your post',
+    'comment': 'commented on your post',
+    'follow': 'started following {business}',
+}
+
+
+def describe(notification_type, sender, count, business=None):
+    if notification_type == 'post':
+        return f'{business.name} shared a new post'
+    if notification_type == 'message':
+        return f'{sender.username} sent you a message' if count == 1 else \
+            f'{sender.username} sent you {count} messages'
+    others = '' if count == 1 else f' and {count - 1} other{"s" if count > 2 else ""}'
+    action = ACTIONS[notification_type].format(business=business.name if business else '')
+    return f'{sender.username}{others} {action}'
+
+
+def _window_start():
+    return timezone.now() - timedelta(seconds=settings.ZONER_SETTINGS['NOTIFICATION_COALESCE_WINDOW'])
+
+
+def _coalesce(notification_type, recipient_ids, sender, targets, business):
+    """Merge into the recipients' recent unread notifications; returns them"""
+    pending = (
+        Notification.objects.select_for_update()
+        .filter(recipient_id__in=recipient_ids, notification_type=notification_type, is_read=False,
+                updated_at__gte=_window_start(), related_business=business, **targets)
+        .order_by('recipient_id', '-updated_at')
+    )
+    merged, now = {}, timezone.now()
+    for notification in pending:
+        if notification.recipient_id in merged:
+            continue
+        # The same person liking again (after an unlike) isn't news
+        if notification.sender_id != sender.pk or notification_type == 'message':
+            notification.events_count += 1
+        notification.sender = sender
+        notification.message = describe(notification_type, sender, notification.events_count, business)
+        notification.updated_at = now
+        notification.is_sent = False
+        merged[notification.recipient_id] = notification
+    Notification.objects.bulk_update(
+        merged.values(), ['events_count', 'sender', 'message', 'updated_at', 'is_sent'],
+    )
+    return list(merged.values())
+
+
+def notify(notification_type, recipient_ids, sender=None, business=None, **targets):
+    """
+    Notify ``recipient_ids`` (an iterable of user ids) of one event, coalescing
+    where the type allows; ``targets`` are the related_* fields. Returns the
+    number of recipients notified.
+    """
+    recipient_ids = iter(recipient_ids)
+    total = 0
+    while True:
+        batch = set(itertools.islice(recipient_ids, BATCH_SIZE))
+        if not batch:
+            return total
+        if sender is not None:
+            batch.discard(sender.pk)  # Never notify people of their own activity
+        if batch:
+            total += _notify_batch(notification_type, batch, sender, business, targets)
+
+
+def _notify_batch(notification_type, recipient_ids, sender, business, targets):
+    with transaction.atomic():
+        merged = []
+        if notification_type in COALESCED_TYPES:
+            merged = _coalesce(notification_type, recipient_ids, sender, targets, business)
+            recipient_ids = recipient_ids - {n.recipient_id for n in merged}
+        created = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=pk, sender=sender, notification_type=notification_type,
+                title=TITLES[notification_type], message=describe(notification_type, sender, 1, business),
+                related_business=business, **targets,
+            )
+            for pk in recipient_ids
+        ])
+        notifications = merged + created
+        if realtime.is_enabled():
+            transaction.on_commit(lambda: push(notifications))
+    return len(notifications)
+
+
+def push(notifications):
+    """Send notifications written in bulk (no post_save) to open WebSockets"""
+    from .serializers import NotificationSerializer
+    for notification, data in zip(notifications, NotificationSerializer(notifications, many=True).data):
+        realtime.publish_to_users([notification.recipient_id], realtime.notification_event(data))
+
+
+# Events
+
+def notify_post_liked(post_id, user_id):
+    post = Post.objects.select_related('business', 'author').filter(pk=post_id).first()
+    sender = User.objects.filter(pk=user_id).first()
+    if post is None or sender is None or not post.likes.filter(user_id=user_id).exists():
+        return 0  # Unliked before the task ran
+    return notify('like', [post.author_id], sender, post.business, related_post=post)
+
+
+def notify_post_commented(comment_id):
+    comment = Comment.objects.select_related('user', 'post__business', 'parent').filter(pk=comment_id).first()
+    if comment is None:
+        return 0
+    recipients = [comment.post.author_id]
+    if comment.parent is not None:
+        recipients.append(comment.parent.user_id)
+    return notify('comment', recipients, comment.user, comment.post.business, related_post=comment.post)
+
+
+def notify_business_followed(business_id, user_id):
+    follow = Follow.objects.select_related('business', 'user').filter(business_id=business_id, user_id=user_id).first()
+    if follow is None:
+        return 0  # Unfollowed before the task ran
+    return notify('follow', [follow.business.owner_id], follow.user, follow.business)
+
+
+def notify_post_published(post_id):
+    post = Post.objects.select_related('business', 'author').filter(pk=post_id, is_active=True).first()
+    if post is None:
+        return 0
+    followers = Follow.objects.filter(business_id=post.business_id).values_list('user_id', flat=True)
+    return notify('post', followers.iterator(chunk_size=BATCH_SIZE), post.author, post.business,
+                  related_post=post)
+
+
+def notify_message_sent(message_id):
+    message = Message.objects.select_related('sender', 'chat__business').filter(pk=message_id).first()
+    if message is None:
+        return 0
+    chat = message.chat
+    recipients = Chat.participants.through.objects.filter(chat=chat).values_list('user_id', flat=True)
+    return notify('message', recipients, message.sender, chat.business, related_chat=chat)
@@ -0,0 +1,174 @@
+# ============================================================================
+# PAGINATION.PY - Keyset (cursor) pagination for the high-volume lists
+# ============================================================================
+
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(ordering, position):
+    """
+    Filter selecting the rows that sort after ``position`` under
+    ``ordering`` (timestamp field, tie-breaker field). The leading inclusive
+    bound on the timestamp is redundant but lets the database turn the row
+    comparison into an index range scan.
+    """
+    timestamp_field, pk_field = (f.lstrip('-') for f in ordering)
+    timestamp, pk = position
+    lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+    return Q(**{f'{timestamp_field}__{lookup}e': timestamp}) & (
+        Q(**{f'{timestamp_field}__{lookup}': timestamp})
+        | Q(**{f'{pk_field}__{lookup}': pk})
+    )
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek pagination on ``(<timestamp>, id)``.
+
+    Instead of ``OFFSET n`` plus a ``COUNT(*)`` for every page, each page
+    filters on the position of the last row it returned, so page 1000 costs
+    the same as page 1 as long as the ordering is backed by an index. The
+    cursor is an opaque token encoding that position; rows inserted while a
+    client pages through do not shift or duplicate later pages.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Timestamp field, then the primary key as a tie-breaker
+    ordering = ('-created_at', '-id')
+    # Parse the cursor's position as those fields would, so a forged cursor
+    # is rejected here instead of failing the query
+    position_fields = (models.DateTimeField(), models.UUIDField())
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = queryset.order_by(*self.ordering)
+
+        def fetch(position, limit):
+            rows = queryset
+            if position is not None:
+                rows = rows.filter(keyset_filter(self.ordering, position))
+            return list(rows[:limit])
+
+        return self.paginate_source(fetch, request)
+
+    def paginate_source(self, fetch, request):
+        """
+        Paginate rows produced by ``fetch(position, limit)``, which must
+        return up to ``limit`` objects sorting after ``position`` (``None``
+        for the first page) in this paginator's ordering.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        results = fetch(self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        timestamp_field, pk_field = self.position_fields
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            timestamp = timestamp_field.to_python(data['t'])
+            pk = pk_field.to_python(data['id'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None or pk is None or timezone.is_naive(timestamp):
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, pk
+
+    def encode_cursor(self, instance):
+        timestamp_field, pk_field = (f.lstrip('-') for f in self.ordering)
+        data = {
+            't': getattr(instance, timestamp_field).isoformat(),
+            'id': str(getattr(instance, pk_field)),
+        }
+        return base64.urlsafe_b64encode(json.dumps(data).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': 'http://api.example.org/accounts/?{cursor_query_param}=eyJ0IjogIjIwMjUtMDEtMDFUMDA6MDA6MDBaIn0='.format(
+                        cursor_query_param=self.cursor_query_param)
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering = ('-published_at', '-id')
+
+
+class MessageCursorPagination(KeysetPagination):
+    # Chat history reads oldest-first, as before
+    ordering = ('created_at', 'id')
+
+
+class NotificationCursorPagination(KeysetPagination):
+    # Coalesced notifications move up with each event they take in
+    ordering = ('-updated_at', '-id')
+
+
+class CommentCursorPagination(KeysetPagination):
+    # Conversations read oldest-first, for comments and their replies alike
+    ordering = ('created_at', 'id')
@@ -0,0 +1,187 @@
+# ============================================================================
+# PROFILING.PY - Opt-in per-request SQL and latency profiling
+# ============================================================================
+#
+# With PROFILING_ENABLED, ProfilingMiddleware records for a sample
+# (PROFILING_SAMPLE_RATE) of requests:
+#
+#   * every SQL query, through an execute wrapper on the database
+#     connections: how many, their total time, and the queries whose SQL
+#     (parameters aside) ran PROFILING_DUPLICATE_THRESHOLD times or more,
+#     the signature of an N+1, with the project line that first issued them;
+#   * the time spent building serializer.data (DRF), including any queries
+#     it runs, and the response size.
+#
+# They are sent as a Server-Timing header, which browser devtools show next
+# to each request, and logged as one JSON line per request on the
+# 'zooner.profiling' logger (PROFILING_LOG). `manage.py profile_report`
+# summarizes that log. When disabled, the middleware drops out of the stack
+# at startup and costs nothing. Serializer timing wraps BaseSerializer.data
+# only while a sampled request is in flight, and restores it afterwards.
+
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('zooner_profile', default=None)
+
+PLACEHOLDER_LIST = re.compile(r'\((?:%s, )+%s\)')  # IN (%s, %s, ...) of any length
+SIGNATURE_LENGTH = 300
+
+
+def signature(sql):
+    """The SQL of a query with IN lists of any length folded together"""
+    return PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+def _origin():
+    """'path:line in function' of the innermost project frame outside this module"""
+    root = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and filename != __file__ and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class Profile:
+    """What one request spent in the database and serializers"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self._signatures = {}  # signature -> [count, seconds, origin]
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            key = signature(sql)
+            entry = self._signatures.get(key)
+            if entry is None:
+                self._signatures[key] = [1, elapsed, _origin()]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def duplicates(self, threshold):
+        repeated = [(sql, *entry) for sql, entry in self._signatures.items() if entry[0] >= threshold]
+        repeated.sort(key=lambda item: item[1], reverse=True)
+        return [
+            {'sql': sql[:SIGNATURE_LENGTH], 'count': count, 'ms': round(seconds * 1000, 2), 'origin': origin}
+            for sql, count, seconds, origin in repeated
+        ]
+
+
+_serializer_data = BaseSerializer.data
+
+
+def _timed_serializer_data(self):
+    profile = _current.get()
+    if profile is None or profile.serializing:  # Nested serializers are part of the outer one
+        return _serializer_data.fget(self)
+    profile.serializing = True
+    start = time.perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        profile.serialize_time += time.perf_counter() - start
+        profile.serializing = False
+
+
+_patch_lock = threading.Lock()
+_patched = 0  # Sampled requests in flight, in any thread
+
+
+@contextmanager
+def timed_serializers():
+    """Time BaseSerializer.data within the block; the class is restored once no request needs it"""
+    global _patched
+    with _patch_lock:
+        if not _patched:
+            # Serializer.data and ListSerializer.data both go through BaseSerializer.data
+            BaseSerializer.data = property(_timed_serializer_data)
+        _patched += 1
+    try:
+        yield
+    finally:
+        with _patch_lock:
+            _patched -= 1
+            if not _patched:
+                BaseSerializer.data = _serializer_data
+
+
+def server_timing(record):
+    return ', '.join([
+        f'db;dur={record["db_ms"]};desc="{record["queries"]} queries"',
+        f'serialize;dur={record["serialize_ms"]}',
+        f'total;dur={record["duration_ms"]}',
+    ])
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.ZONER_SETTINGS['PROFILING_ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = settings.ZONER_SETTINGS
+        if random.random() >= options['PROFILING_SAMPLE_RATE']:
+            return self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(timed_serializers())
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        record = {
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'route': '/' + match.route if match else None,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': profile.queries,
+            'db_ms': round(profile.db_time * 1000, 2),
+            'serialize_ms': round(profile.serialize_time * 1000, 2),
+            'response_bytes': None if response.streaming else len(response.content),
+            'duplicates': profile.duplicates(options['PROFILING_DUPLICATE_THRESHOLD']),
+        }
+        if options['PROFILING_SERVER_TIMING']:
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {server_timing(record)}' if existing else server_timing(record)
+        logger.info(json.dumps(record))
+        return response
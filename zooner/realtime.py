@@ -0,0 +1,171 @@
+# ============================================================================
+# REALTIME.PY - Pub/sub for events pushed over WebSockets
+# ============================================================================
+#
+# Chat messages, typing indicators, read receipts and notifications are
+# published to per-user channels ("user:<id>") and delivered to every
+# WebSocket that user has open (zooner.websocket). The broker is chosen with
+# REALTIME_BROKER:
+#
+#   * InProcessBroker - asyncio queues in this process. Only sockets served
+#                       by the publishing process see the event, so it suits
+#                       a single ASGI worker (and development)
+#   * RedisBroker     - Redis pub/sub, for several workers. Each process
+#                       keeps one Redis connection and fans events out to
+#                       its own sockets locally
+#
+# publish() is synchronous and safe to call from any thread, so views and
+# signal handlers running under sync_to_async can use it directly.
+
+import asyncio
+import json
+import threading
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+QUEUE_SIZE = 256  # Events buffered per socket before a slow client starts losing them
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # The client can't keep up; it catches up through the REST endpoints
+        pass
+
+
+class Subscription:
+    """Events of one channel for one socket; ``await get()`` the next one"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        await self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+
+    def __init__(self):
+        self._subscriptions = {}  # channel -> set of Subscription
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        """Send ``event`` (a JSON-serializable dict) to ``channel``"""
+        return self.deliver(channel, event)
+
+    def deliver(self, channel, event):
+        """Hand ``event`` to the local subscribers of ``channel``; returns how many"""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(_offer, subscription.queue, event)
+        return len(subscriptions)
+
+    async def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        with self._lock:
+            remaining = self._subscriptions.get(subscription.channel, set())
+            remaining.discard(subscription)
+            if not remaining:
+                self._subscriptions.pop(subscription.channel, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis and subscribes the process to the channels of
+    its connected users only, on a single shared pub/sub connection.
+    """
+
+    def __init__(self):
+        super().__init__()
+        import redis
+        self.url = settings.ZONER_SETTINGS['REALTIME_REDIS_URL']
+        self._client = redis.Redis.from_url(self.url)
+        self._pubsub = None
+        self._listener = None
+
+    def publish(self, channel, event):
+        return self._client.publish(channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    async def subscribe(self, channel):
+        subscription = await super().subscribe(channel)
+        if self._pubsub is None:
+            from redis import asyncio as aioredis
+            self._pubsub = aioredis.Redis.from_url(self.url).pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(channel)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        await super().unsubscribe(subscription)
+        with self._lock:
+            idle = subscription.channel not in self._subscriptions
+        if idle and self._pubsub is not None:
+            await self._pubsub.unsubscribe(subscription.channel)
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            if message['type'] == 'message':
+                self.deliver(message['channel'].decode(), json.loads(message['data']))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.ZONER_SETTINGS['REALTIME_BROKER'])()
+        return _broker
+
+
+def is_enabled():
+    return settings.ZONER_SETTINGS['REALTIME_ENABLED']
+
+
+def publish_to_users(user_ids, event):
+    broker = get_broker()
+    for user_id in user_ids:
+        broker.publish(user_channel(user_id), event)
+
+
+# Events
+
+def message_event(message, data):
+    return {'type': 'message', 'chat': str(message.chat_id), 'message': data}
+
+
+def notification_event(data):
+    return {'type': 'notification', 'notification': data}
+
+
+def typing_event(chat_id, user_id):
+    return {'type': 'typing', 'chat': str(chat_id), 'user': str(user_id)}
+
+
+def read_event(chat_id, user_id, read_at):
+    return {'type': 'read', 'chat': str(chat_id), 'user': str(user_id), 'read_at': read_at.isoformat()}
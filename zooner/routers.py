@@ -0,0 +1,62 @@
+# ============================================================================
+# ROUTERS.PY - Read replica routing
+# ============================================================================
+#
+# When DATABASES has a 'replica' alias, the views marked with
+# ReplicaReadMixin (public list and detail endpoints) run their GET
+# requests against it. Every other read, any read inside a transaction on
+# the primary, and all writes go to 'default', so the rest of the code
+# never sees the replica: a replicated copy may lag the primary slightly,
+# which is fine for catalogue pages but not for read-modify-write code.
+
+import contextvars
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+_replica_reads = contextvars.ContextVar('zooner_replica_reads', default=False)
+
+
+def is_enabled():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Send the reads of the enclosed block to the replica, if there is one"""
+    token = _replica_reads.set(is_enabled())
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA
+        # Explicitly, or objects read from the replica would keep using it
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReplicaReadMixin:
+    """Serve the view's GET requests from the read replica (see replica_reads)"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
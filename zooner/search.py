@@ -0,0 +1,252 @@
+# ============================================================================
+# SEARCH.PY - Full-text search index for businesses and posts
+# ============================================================================
+#
+# Businesses and posts are mirrored into a single inverted index table,
+# zooner_search_index, created by migration 0006:
+#
+#   * SQLite     - an FTS5 virtual table ranked with bm25()
+#   * PostgreSQL - a table with a generated tsvector column and a GIN index,
+#                  ranked with ts_rank()
+#
+# Rows are kept in sync by zooner.signals on every save/delete and can be
+# rebuilt in bulk with `manage.py rebuild_search_index`. On any other
+# database, or before migration 0006, get_backend() returns None and
+# SearchView falls back to icontains.
+
+import functools
+import itertools
+import re
+import uuid
+from django.db import connection
+from .models import Business, Post, Town
+
+TABLE = 'zooner_search_index'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+BATCH_SIZE = 1000
+
+
+def business_document(business):
+    return {
+        'kind': 'business',
+        'object_id': business.pk,
+        'business_id': business.pk,
+        'town_id': business.town_id,
+        'title': business.name,
+        'body': business.description,
+    }
+
+
+def post_document(post, town_id):
+    return {
+        'kind': 'post',
+        'object_id': post.pk,
+        'business_id': post.business_id,
+        'town_id': town_id,
+        'title': ' '.join(str(tag).lstrip('#') for tag in post.tags or []),
+        'body': post.caption,
+    }
+
+
+class BaseSearchBackend:
+
+    def search(self, kind, query, town_ids=None, limit=10):
+        """Ids of the best ``kind`` matches for ``query``, best first"""
+        terms = TOKEN_RE.findall(query.lower())
+        if not terms:
+            return []
+        if town_ids is not None and not town_ids:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(*self.search_sql(kind, terms, town_ids, limit))
+            return [value if isinstance(value, uuid.UUID) else uuid.UUID(value) for value, in cursor.fetchall()]
+
+    def replace(self, kind, documents):
+        documents = list(documents)
+        self.delete(kind, [doc['object_id'] for doc in documents])
+        self.insert(documents)
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _in(self, values):
+        return ', '.join(['%s'] * len(values))
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 only indexes full-text columns, so each row also carries a ``key``
+    column of lookup tokens (``o<object id>`` and ``b<business id>``) that
+    lets writes find their rows through the index instead of a table scan.
+    Searches are restricted to the title/body columns.
+    """
+
+    @staticmethod
+    def _hex(value):
+        return uuid.UUID(str(value)).hex if value is not None else None
+
+    def _key_match(self, prefix, values):
+        return ' OR '.join(f'key : "{prefix}{self._hex(v)}"' for v in values)
+
+    def insert(self, documents):
+        rows = [
+            (
+                f"o{self._hex(doc['object_id'])} b{self._hex(doc['business_id'])}",
+                doc['kind'], self._hex(doc['object_id']), self._hex(doc['town_id']),
+                doc['title'], doc['body'],
+            )
+            for doc in documents
+        ]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (key, kind, object_id, town_id, title, body) "
+                    f"VALUES (%s, %s, %s, %s, %s, %s)",
+                    rows,
+                )
+
+    def delete(self, kind, object_ids):
+        if object_ids:
+            self._execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN "
+                f"(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s) AND kind = %s",
+                [self._key_match('o', object_ids), kind],
+            )
+
+    def set_town(self, business_id, town_id):
+        self._execute(
+            f"UPDATE {TABLE} SET town_id = %s WHERE rowid IN "
+            f"(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)",
+            [self._hex(town_id), self._key_match('b', [business_id])],
+        )
+
+    def clear(self):
+        self._execute(f"DELETE FROM {TABLE}")
+
+    def search_sql(self, kind, terms, town_ids, limit):
+        # Every term must match, the last one as a prefix ("caf" finds "cafe")
+        phrases = [f'"{term}"' for term in terms]
+        phrases[-1] += '*'
+        sql = f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s"
+        params = ['{title body} : ' + ' '.join(phrases), kind]
+        if town_ids is not None:
+            sql += f" AND town_id IN ({self._in(town_ids)})"
+            params += [self._hex(pk) for pk in town_ids]
+        # Title matches weigh ten times body matches; lower bm25() is better
+        sql += f" ORDER BY bm25({TABLE}, 0, 0, 0, 0, 10.0, 1.0) LIMIT %s"
+        return sql, [*params, limit]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+
+    def insert(self, documents):
+        rows = [
+            (doc['kind'], doc['object_id'], doc['business_id'], doc['town_id'], doc['title'], doc['body'])
+            for doc in documents
+        ]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (kind, object_id, business_id, town_id, title, body) "
+                    f"VALUES (%s, %s, %s, %s, %s, %s)",
+                    rows,
+                )
+
+    def delete(self, kind, object_ids):
+        if object_ids:
+            self._execute(
+                f"DELETE FROM {TABLE} WHERE kind = %s AND object_id IN ({self._in(object_ids)})",
+                [kind, *object_ids],
+            )
+
+    def set_town(self, business_id, town_id):
+        self._execute(f"UPDATE {TABLE} SET town_id = %s WHERE business_id = %s", [town_id, business_id])
+
+    def clear(self):
+        self._execute(f"TRUNCATE {TABLE}")
+
+    def search_sql(self, kind, terms, town_ids, limit):
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        sql = f"SELECT object_id FROM {TABLE} WHERE document @@ to_tsquery('simple', %s) AND kind = %s"
+        params = [tsquery, kind]
+        if town_ids is not None:
+            sql += f" AND town_id IN ({self._in(town_ids)})"
+            params += list(town_ids)
+        sql += " ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC LIMIT %s"
+        return sql, [*params, tsquery, limit]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    backend = BACKENDS.get(connection.vendor)
+    if backend is None or not has_index(connection.vendor, connection.settings_dict['NAME']):
+        return None
+    return backend()
+
+
+@functools.cache
+def has_index(vendor, name):
+    """Whether database ``name`` has the index table; looked up once per process (cleared by migrate)"""
+    return TABLE in connection.introspection.table_names()
+
+
+# Keeping the index in sync
+
+def index_business(business):
+    backend = get_backend()
+    if backend is None:
+        return
+    if business.status == 'active':
+        backend.replace('business', [business_document(business)])
+    else:
+        backend.delete('business', [business.pk])
+    # Posts are filtered by their business's town
+    backend.set_town(business.pk, business.town_id)
+
+
+def index_post(post):
+    backend = get_backend()
+    if backend is None:
+        return
+    if post.is_active:
+        town_id = Business.objects.filter(pk=post.business_id).values_list('town_id', flat=True).first()
+        backend.replace('post', [post_document(post, town_id)])
+    else:
+        backend.delete('post', [post.pk])
+
+
+def unindex(kind, pk):
+    backend = get_backend()
+    if backend is not None:
+        backend.delete(kind, [pk])
+
+
+def rebuild_index():
+    """Re-index every active business and post; returns the number of documents"""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    backend.clear()
+    businesses = Business.objects.filter(status='active')
+    posts = Post.objects.filter(is_active=True).select_related('business')
+    documents = itertools.chain(
+        (business_document(b) for b in businesses.iterator(chunk_size=BATCH_SIZE)),
+        (post_document(p, p.business.town_id) for p in posts.iterator(chunk_size=BATCH_SIZE)),
+    )
+    total = 0
+    while True:
+        batch = list(itertools.islice(documents, BATCH_SIZE))
+        if not batch:
+            return total
+        backend.insert(batch)
+        total += len(batch)
+
+
+def town_ids_matching(name):
+    return list(Town.objects.filter(name__icontains=name).values_list('pk', flat=True))
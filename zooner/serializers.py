@@ -2,11 +2,100 @@
 # SERIALIZERS.PY - Data serialization for API responses
 # ============================================================================
 
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.conf import settings
+from django.db.models.manager import BaseManager
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from . import activity
+from .loaders import (
+    load_category_business_counts, load_town_business_counts, load_comment_replies, preload_businesses,
+    preload_chats, preload_comments, preload_notifications, preload_posts,
+)
+from .pagination import CommentCursorPagination
 from .models import *
 
+
+COMPACT_VIEW = 'compact'
+
+
+class SparseFieldsMixin:
+    """
+    Lets clients trim responses per request:
+
+    * ``?view=compact`` keeps only ``Meta.compact_fields``, on this serializer
+      and on every nested one (a post's business shrinks to a name card,
+      without the owner profile and recent posts).
+    * ``?fields=a,b`` keeps only the listed fields of the top-level objects.
+
+    The loaders only fetch data for the fields that remain.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return fields
+        params = request.query_params
+        keep = None
+        compact_fields = getattr(self.Meta, 'compact_fields', None)
+        if compact_fields is not None and params.get('view') == COMPACT_VIEW:
+            keep = set(compact_fields)
+        if params.get('fields') and self._is_top_level():
+            requested = {name.strip() for name in params['fields'].split(',')}
+            keep = requested if keep is None else keep & requested
+        if keep is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in keep}
+
+    def _is_top_level(self):
+        # Serializers built inside method fields (recent_posts, replies, ...)
+        # share the context but are not the response objects
+        root = self.context.setdefault('sparse_fields_root', self.root)
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None and self.root is root
+
+
+class PreloadingListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that batch-loads the data its children need before
+    serializing, so a page costs the same number of queries at any size.
+    """
+    preload = None
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        if items:
+            self.preload(items, self.context, self.child.fields)
+        return super().to_representation(items)
+
+class PostListSerializer(PreloadingListSerializer):
+    preload = staticmethod(preload_posts)
+
+class BusinessListSerializer(PreloadingListSerializer):
+    preload = staticmethod(preload_businesses)
+
+class TownListSerializer(PreloadingListSerializer):
+    preload = staticmethod(load_town_business_counts)
+
+class CategoryListSerializer(PreloadingListSerializer):
+    preload = staticmethod(load_category_business_counts)
+
+class CommentListSerializer(PreloadingListSerializer):
+    preload = staticmethod(preload_comments)
+
+class ChatListSerializer(PreloadingListSerializer):
+    preload = staticmethod(preload_chats)
+
+class NotificationListSerializer(PreloadingListSerializer):
+    preload = staticmethod(preload_notifications)
+
 # User Serializers
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -26,46 +115,77 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
-class UserSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
-    
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'role', 'profile_image', 'bio', 
                  'location', 'is_verified', 'followers_count', 'following_count',
                  'created_at', 'last_active')
-        read_only_fields = ('id', 'created_at', 'is_verified')
-    
-    def get_followers_count(self, obj):
-        return obj.following.count()
-    
-    def get_following_count(self, obj):
-        return Follow.objects.filter(user=obj).count()
+        compact_fields = ('id', 'username', 'profile_image', 'is_verified')
+        read_only_fields = ('id', 'created_at', 'is_verified', 'followers_count', 'following_count')
+
+class LoginUserSerializer(serializers.ModelSerializer):
+    """The profile sent with the tokens: enough for the app shell, the rest is at /auth/profile/"""
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'email', 'role', 'profile_image', 'is_verified')
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """
+    Token pair plus the lean profile of the user it authenticated, without
+    looking them up again; last_login is recorded by zooner.activity
+    (UPDATE_LAST_LOGIN is off).
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data['user'] = LoginUserSerializer(self.user).data
+        activity.touch(self.user.pk, login=True)
+        return data
+
+class ActivityTokenRefreshSerializer(TokenRefreshSerializer):
+    """A refreshed token means an active user: coalesced last_active update"""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Already verified by super(); the rotated-out token is blacklisted by now
+        refresh = self.token_class(attrs['refresh'], verify=False)
+        user_id = refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        if user_id:
+            activity.touch(user_id)
+        return data
 
 # Town & Category Serializers
-class TownSerializer(serializers.ModelSerializer):
+class TownSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     businesses_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Town
         fields = ('id', 'name', 'slug', 'country', 'region', 'businesses_count', 'is_active')
+        compact_fields = ('id', 'name', 'slug')
+        list_serializer_class = TownListSerializer
     
     def get_businesses_count(self, obj):
+        counts = self.context.get('town_business_counts', {})
+        if obj.pk in counts:
+            return counts[obj.pk]
         return obj.businesses.filter(status='active').count()
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     businesses_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
         fields = ('id', 'name', 'slug', 'description', 'icon', 'color', 'businesses_count')
+        compact_fields = ('id', 'name', 'slug', 'icon', 'color')
+        list_serializer_class = CategoryListSerializer
     
     def get_businesses_count(self, obj):
+        counts = self.context.get('category_business_counts', {})
+        if obj.pk in counts:
+            return counts[obj.pk]
         return obj.businesses.filter(status='active').count()
 
 # Business Serializers
-class BusinessSerializer(serializers.ModelSerializer):
+class BusinessSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     town = TownSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
@@ -80,16 +200,35 @@ class BusinessSerializer(serializers.ModelSerializer):
                  'followers_count', 'posts_count', 'is_following', 'recent_posts',
                  'created_at', 'updated_at')
         read_only_fields = ('id', 'slug', 'followers_count', 'posts_count', 'created_at')
+        compact_fields = ('id', 'name', 'slug', 'logo', 'town', 'category', 'is_verified', 'followers_count')
+        list_serializer_class = BusinessListSerializer
     
     def get_is_following(self, obj):
+        followed = self.context.get('followed_businesses', {})
+        if obj.pk in followed:
+            return followed[obj.pk]
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Follow.objects.filter(user=request.user, business=obj).exists()
         return False
     
     def get_recent_posts(self, obj):
-        recent_posts = obj.posts.filter(is_active=True)[:3]
-        return PostSerializer(recent_posts, many=True, context=self.context).data
+        recent_posts = self.context.get('recent_posts', {}).get(obj.pk)
+        if recent_posts is None:
+            recent_posts = obj.posts.filter(is_active=True)[:3]
+        return BusinessPostSerializer(recent_posts, many=True, context=self.context).data
+
+class NearbyBusinessSerializer(BusinessSerializer):
+    """Business with its distance from the queried point (context['distances'])"""
+    distance_km = serializers.SerializerMethodField()
+    
+    class Meta(BusinessSerializer.Meta):
+        fields = BusinessSerializer.Meta.fields + ('latitude', 'longitude', 'distance_km')
+        compact_fields = BusinessSerializer.Meta.compact_fields + ('latitude', 'longitude', 'distance_km')
+    
+    def get_distance_km(self, obj):
+        distance = self.context.get('distances', {}).get(obj.pk)
+        return round(distance, 3) if distance is not None else None
 
 class BusinessCreateSerializer(serializers.ModelSerializer):
     town_id = serializers.UUIDField(write_only=True)
@@ -98,7 +237,8 @@ class BusinessCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Business
         fields = ('name', 'description', 'town_id', 'category_id', 'address',
-                 'phone', 'email', 'website', 'hero_image', 'logo', 'business_hours')
+                 'latitude', 'longitude', 'phone', 'email', 'website', 'hero_image', 'logo',
+                 'business_hours')
     
     def create(self, validated_data):
         town_id = validated_data.pop('town_id')
@@ -113,7 +253,7 @@ class BusinessCreateSerializer(serializers.ModelSerializer):
         return business
 
 # Post Serializers
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     business = BusinessSerializer(read_only=True)
     author = UserSerializer(read_only=True)
     is_liked = serializers.SerializerMethodField()
@@ -126,13 +266,28 @@ class PostSerializer(serializers.ModelSerializer):
                  'views_count', 'is_featured', 'is_pinned', 'is_liked',
                  'created_at', 'published_at')
         read_only_fields = ('id', 'likes_count', 'comments_count', 'shares_count', 'views_count')
+        compact_fields = ('id', 'business', 'caption', 'post_type', 'image', 'likes_count',
+                          'comments_count', 'is_liked', 'published_at')
+        list_serializer_class = PostListSerializer
     
     def get_is_liked(self, obj):
+        liked = self.context.get('liked_posts', {})
+        if obj.pk in liked:
+            return liked[obj.pk]
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Like.objects.filter(user=request.user, post=obj).exists()
         return False
 
+class BusinessPostSerializer(PostSerializer):
+    """Post nested under its own business (recent_posts), without the business"""
+    business = None
+    
+    class Meta(PostSerializer.Meta):
+        fields = tuple(f for f in PostSerializer.Meta.fields if f != 'business')
+        compact_fields = tuple(f for f in PostSerializer.Meta.compact_fields if f != 'business')
+        list_serializer_class = serializers.ListSerializer
+
 class PostCreateSerializer(serializers.ModelSerializer):
     business_id = serializers.UUIDField(write_only=True)
     category_id = serializers.UUIDField(write_only=True, required=False)
@@ -154,22 +309,69 @@ class PostCreateSerializer(serializers.ModelSerializer):
         return post
 
 # Comment Serializers
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    A comment. Top-level comments embed the first COMMENT_REPLIES_LIMIT
+    replies of their thread (all depths, oldest first; ``parent`` and
+    ``depth`` let clients nest them) and a ``replies_next`` link to page
+    through the rest.
+    """
     user = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
+    replies_count = serializers.SerializerMethodField()
+    replies_next = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = ('id', 'user', 'content', 'parent', 'replies', 'created_at', 'updated_at')
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        fields = ('id', 'user', 'content', 'parent', 'depth', 'replies', 'replies_count',
+                 'replies_next', 'created_at', 'updated_at')
+        compact_fields = ('id', 'user', 'content', 'parent', 'depth', 'replies', 'replies_count',
+                          'replies_next', 'created_at')
+        read_only_fields = ('id', 'depth', 'created_at', 'updated_at')
+        list_serializer_class = CommentListSerializer
+    
+    def _thread_replies(self, obj):
+        if obj.root_id is not None:
+            return None
+        if obj.pk not in self.context.get('comment_replies', {}):
+            load_comment_replies([obj], self.context)
+        return self.context['comment_replies'][obj.pk]
     
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True, context=self.context).data
-        return []
+        replies = self._thread_replies(obj)
+        if not replies:
+            return []
+        return ReplySerializer(replies, many=True, context=self.context).data
+    
+    def get_replies_count(self, obj):
+        if self._thread_replies(obj) is None:
+            return 0
+        return self.context['comment_reply_counts'][obj.pk]
+    
+    def get_replies_next(self, obj):
+        replies = self._thread_replies(obj)
+        request = self.context.get('request')
+        if not replies or request is None or self.get_replies_count(obj) <= len(replies):
+            return None
+        url = request.build_absolute_uri(
+            reverse('comment-replies', kwargs={'post_id': obj.post_id, 'comment_id': obj.pk})
+        )
+        paginator = CommentCursorPagination()
+        return replace_query_param(url, paginator.cursor_query_param, paginator.encode_cursor(replies[-1]))
+
+class ReplySerializer(CommentSerializer):
+    """Reply listed flat under its thread's top-level comment"""
+    replies = None
+    replies_count = None
+    replies_next = None
+    
+    class Meta(CommentSerializer.Meta):
+        fields = tuple(f for f in CommentSerializer.Meta.fields if not f.startswith('replies'))
+        compact_fields = tuple(f for f in CommentSerializer.Meta.compact_fields if not f.startswith('replies'))
+        list_serializer_class = serializers.ListSerializer
 
 # Chat & Message Serializers
-class ChatSerializer(serializers.ModelSerializer):
+class ChatSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     participants = UserSerializer(many=True, read_only=True)
     business = BusinessSerializer(read_only=True)
     last_message = serializers.SerializerMethodField()
@@ -177,22 +379,27 @@ class ChatSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Chat
-        fields = ('id', 'participants', 'business', 'chat_type', 'last_message',
+        fields = ('id', 'participants', 'business', 'chat_type', 'last_message', 'last_message_at',
                  'unread_count', 'is_active', 'created_at', 'updated_at')
+        compact_fields = ('id', 'business', 'chat_type', 'last_message', 'unread_count', 'updated_at')
+        list_serializer_class = ChatListSerializer
     
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
-        if last_message:
-            return MessageSerializer(last_message, context=self.context).data
-        return None
+        if obj.last_message_id is None:
+            return None
+        return MessageSerializer(obj.last_message, context=self.context).data
     
     def get_unread_count(self, obj):
+        counts = self.context.get('chat_unread_counts', {})
+        if obj.pk in counts:
+            return counts[obj.pk]
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.messages.filter(is_read=False).exclude(sender=request.user).count()
+            state = ChatReadState.objects.filter(chat=obj, user=request.user).values_list('unread_count', flat=True)
+            return state.first() or 0
         return 0
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     
     class Meta:
@@ -200,16 +407,52 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ('id', 'sender', 'content', 'message_type', 'attachment',
                  'is_read', 'read_at', 'created_at', 'updated_at')
         read_only_fields = ('id', 'is_read', 'read_at', 'created_at', 'updated_at')
+        compact_fields = ('id', 'sender', 'content', 'message_type', 'is_read', 'created_at')
 
 # Notification Serializers
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     related_business = BusinessSerializer(read_only=True)
     
     class Meta:
         model = Notification
         fields = ('id', 'notification_type', 'title', 'message', 'sender',
-                 'related_business', 'is_read', 'created_at', 'read_at')
-        read_only_fields = ('id', 'created_at', 'read_at')
+                 'related_business', 'events_count', 'is_read', 'created_at', 'updated_at', 'read_at')
+        compact_fields = ('id', 'notification_type', 'title', 'sender', 'related_business',
+                          'events_count', 'is_read', 'created_at', 'updated_at')
+        list_serializer_class = NotificationListSerializer
+        read_only_fields = ('id', 'events_count', 'created_at', 'updated_at', 'read_at')
+
+
 
+# Engagement Serializers
+class EngagementEventSerializer(serializers.Serializer):
+    """One event of a POST /engagement/ batch"""
+    id = serializers.UUIDField()  # Generated by the client; retried batches are deduplicated on it
+    type = serializers.ChoiceField(choices=UserEngagement.ENGAGEMENT_TYPES)
+    post = serializers.UUIDField(required=False, allow_null=True)
+    business = serializers.UUIDField(required=False, allow_null=True)
+    session_id = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    metadata = serializers.DictField(required=False, default=dict)
 
+class EngagementBatchSerializer(serializers.Serializer):
+    events = EngagementEventSerializer(many=True, allow_empty=False)
+    
+    def validate_events(self, events):
+        limit = settings.ZONER_SETTINGS['ENGAGEMENT_MAX_BATCH']
+        if len(events) > limit:
+            raise serializers.ValidationError(f'Send at most {limit} events per batch.')
+        return events
+
+# Dashboard Serializers
+class DashboardBusinessSerializer(serializers.ModelSerializer):
+    """A business on its owner's dashboard: maintained counters and the period's rolled-up metrics"""
+    period = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Business
+        fields = ('id', 'name', 'slug', 'logo', 'status', 'followers_count', 'posts_count', 'likes_count',
+                  'period')
+    
+    def get_period(self, obj):
+        return self.context['business_periods'][obj.pk]
@@ -0,0 +1,258 @@
+# ============================================================================
+# SIGNALS.PY - Model signal handlers
+# ============================================================================
+
+from django.db import transaction
+from django.db.models import Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import cache, chats, geo, realtime, search, tasks, timeline
+from .counters import bump, flush_counter_shards, is_counted_by_caller, update_follow_counters
+from .models import Business, Category, Chat, ChatReadState, Comment, Follow, Like, Message, Notification, Post, Town, User
+from .serializers import MessageSerializer, NotificationSerializer
+
+
+# Follow counters
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        update_follow_counters(instance, 1)
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    # FollowBusinessView counts unfollows itself
+    if not is_counted_by_caller():
+        update_follow_counters(instance, -1)
+
+
+# Post counters
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Business.objects.filter(pk=instance.business_id), 'posts_count', 1)
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # Into Business before like_deleted takes the post's likes back out
+    flush_counter_shards(instance)
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(Business.objects.filter(pk=instance.business_id), 'posts_count', -1)
+
+
+# Like counters (LikePostView counts likes and unlikes itself)
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    # Cascades and the admin; a deleted post's likes go first, while the post still exists
+    if not is_counted_by_caller():
+        bump(Post.objects.filter(pk=instance.post_id), 'likes_count', -1)
+        bump(Business.objects.filter(posts=instance.post_id), 'likes_count', -1)
+
+
+
+# Chat inbox: last message and per-participant unread counters
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    Chat.objects.filter(pk=instance.chat_id).update(
+        last_message=instance, last_message_at=instance.created_at, updated_at=instance.created_at,
+    )
+    bump(ChatReadState.objects.filter(chat_id=instance.chat_id).exclude(user_id=instance.sender_id),
+         'unread_count', 1)
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    # last_message was set to NULL if it was this one: fall back to the newest left
+    latest = Message.objects.filter(chat_id=instance.chat_id).order_by('-created_at', '-id')
+    Chat.objects.filter(pk=instance.chat_id, last_message=None).update(
+        last_message=Subquery(latest.values('pk')[:1]), last_message_at=Subquery(latest.values('created_at')[:1]),
+    )
+    if not instance.is_read:
+        bump(ChatReadState.objects.filter(chat_id=instance.chat_id).exclude(user_id=instance.sender_id),
+             'unread_count', -1)
+
+@receiver(m2m_changed, sender=Chat.participants.through)
+def chat_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # chat.participants.add(user) or, reversed, user.chats.add(chat)
+    owner = 'user_id' if reverse else 'chat_id'
+    other = 'chat_id' if reverse else 'user_id'
+    if action == 'post_add':
+        ChatReadState.objects.bulk_create(
+            [ChatReadState(**{owner: instance.pk, other: pk}) for pk in pk_set], ignore_conflicts=True,
+        )
+    elif action == 'post_remove':
+        ChatReadState.objects.filter(**{owner: instance.pk, f'{other}__in': pk_set}).delete()
+    elif action == 'post_clear':
+        ChatReadState.objects.filter(**{owner: instance.pk}).delete()
+
+
+
+# WebSocket pushes (zooner.realtime), sent once the row is committed
+@receiver(post_save, sender=Message)
+def message_pushed(sender, instance, created, **kwargs):
+    if created and realtime.is_enabled():
+        transaction.on_commit(lambda: realtime.publish_to_users(
+            chats.participant_ids(instance.chat_id),
+            realtime.message_event(instance, MessageSerializer(instance).data),
+        ))
+
+@receiver(post_save, sender=Notification)
+def notification_pushed(sender, instance, created, **kwargs):
+    if created and realtime.is_enabled():
+        transaction.on_commit(lambda: realtime.publish_to_users(
+            [instance.recipient_id], realtime.notification_event(NotificationSerializer(instance).data),
+        ))
+
+
+# Comment threads
+@receiver(pre_save, sender=Comment)
+def comment_thread(sender, instance, **kwargs):
+    if instance._state.adding and instance.parent_id:
+        parent = instance.parent
+        instance.root_id = parent.root_id or parent.pk
+        instance.depth = parent.depth + 1
+
+
+def _enqueue(task, *args):
+    """Queue a zooner.tasks task once the current transaction commits"""
+    # robust: a broker outage is logged instead of failing the request, and
+    # without publish retries (settings.CELERY_TASK_PUBLISH_RETRY) costs ~1ms
+    transaction.on_commit(lambda: task.delay(*map(str, args)), robust=True)
+
+
+# Notifications (zooner.notifications, written by the workers)
+@receiver(post_save, sender=Like)
+def like_notified(sender, instance, created, **kwargs):
+    if created:
+        _enqueue(tasks.notify_post_liked, instance.post_id, instance.user_id)
+
+@receiver(post_save, sender=Comment)
+def comment_notified(sender, instance, created, **kwargs):
+    if created:
+        _enqueue(tasks.notify_post_commented, instance.pk)
+
+@receiver(post_save, sender=Follow)
+def follow_notified(sender, instance, created, **kwargs):
+    if created:
+        _enqueue(tasks.notify_business_followed, instance.business_id, instance.user_id)
+
+@receiver(post_save, sender=Post)
+def post_notified(sender, instance, created, **kwargs):
+    if created and instance.is_active:
+        _enqueue(tasks.notify_post_published, instance.pk)
+
+@receiver(post_save, sender=Message)
+def message_notified(sender, instance, created, **kwargs):
+    if created:
+        _enqueue(tasks.notify_message_sent, instance.pk)
+
+
+# Home feed timelines, written inline on commit: unlike a notification, a
+# feed entry lost with a failed publish is only restored by rebuild_timelines
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        transaction.on_commit(lambda: timeline.fan_out_post(instance))
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created and timeline.is_enabled():
+        transaction.on_commit(lambda: timeline.backfill(instance.user_id, instance.business_id))
+
+@receiver(post_delete, sender=Follow)
+def follow_trim(sender, instance, **kwargs):
+    if timeline.is_enabled():
+        timeline.trim(instance.user_id, instance.business_id)
+
+
+# Full-text search index
+@receiver(post_save, sender=Business)
+def business_indexed(sender, instance, **kwargs):
+    search.index_business(instance)
+
+@receiver(post_delete, sender=Business)
+def business_unindexed(sender, instance, **kwargs):
+    search.unindex('business', instance.pk)
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    search.index_post(instance)
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    search.unindex('post', instance.pk)
+
+@receiver(post_migrate)
+def search_index_migrated(sender, **kwargs):
+    # The index table may have been created or dropped
+    search.has_index.cache_clear()
+
+
+# Stored values of a business about to be saved, to invalidate what it moves away from
+@receiver(pre_save, sender=Business)
+def business_previous_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if not instance._state.adding:
+        instance._previous_state = Business.objects.filter(pk=instance.pk).values(
+            'geohash', 'slug', *cache.COUNTED_FIELDS).first()
+
+
+# Geohash for /businesses/nearby/
+@receiver(pre_save, sender=Business)
+def business_geohash(sender, instance, **kwargs):
+    if instance.latitude is not None and instance.longitude is not None:
+        instance.geohash = geo.encode(instance.latitude, instance.longitude)
+    else:
+        instance.geohash = ''
+
+@receiver(post_save, sender=Business)
+def business_moved(sender, instance, **kwargs):
+    if instance._previous_state:
+        geo.cell_cache.invalidate(instance._previous_state['geohash'])
+    geo.cell_cache.invalidate(instance.geohash)
+
+@receiver(post_delete, sender=Business)
+def business_removed(sender, instance, **kwargs):
+    geo.cell_cache.invalidate(instance.geohash)
+
+
+# Cached catalogue responses (zooner.cache). Town and category names and
+# business counts are embedded in every business payload: a business
+# joining or leaving a town's or category's count changes the payload of
+# every other business there too.
+@receiver([post_save, post_delete], sender=Town)
+def town_changed(sender, instance, **kwargs):
+    cache.invalidate('towns', 'businesses', 'business-details')
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    cache.invalidate('categories', 'businesses', 'business-details')
+
+@receiver([post_save, post_delete], sender=Business)
+def business_changed(sender, instance, signal, created=False, **kwargs):
+    namespaces = ['businesses', cache.business_namespace(instance.slug),
+                  cache.dashboard_namespace(instance.owner_id)]
+    previous = None if created or signal is post_delete else getattr(instance, '_previous_state', None)
+    if previous and previous['slug'] != instance.slug:
+        namespaces.append(cache.business_namespace(previous['slug']))
+    if previous is None or any(previous[field] != getattr(instance, field) for field in cache.COUNTED_FIELDS):
+        namespaces += ['towns', 'categories', 'business-details']
+    cache.invalidate(*namespaces)
+
+@receiver([post_save, post_delete], sender=Follow)
+@receiver([post_save, post_delete], sender=Post)
+def business_content_changed(sender, instance, **kwargs):
+    # followers_count, posts_count and recent_posts
+    _invalidate_businesses(Business.objects.filter(pk=instance.business_id))
+
+@receiver(post_save, sender=User)
+def owner_changed(sender, instance, **kwargs):
+    # last_login/last_active are written by zooner.activity with update(), which sends no post_save
+    _invalidate_businesses(instance.owned_businesses.all())
+
+def _invalidate_businesses(businesses):
+    slugs = list(businesses.values_list('slug', flat=True))
+    if slugs:
+        cache.invalidate('businesses', *map(cache.business_namespace, slugs))
@@ -0,0 +1,47 @@
+# ============================================================================
+# TASKS.PY - Celery tasks (zonner_backend.celery)
+# ============================================================================
+#
+# Work moved off the request path. Tasks take ids rather than instances and
+# re-read their rows, which may have changed or gone away since the task was
+# queued. zooner.signals queues them once the triggering row is committed.
+
+from celery import shared_task
+from . import analytics, engagement, notifications
+from .counters import flush_counter_shards
+
+
+# Notifications
+@shared_task
+def notify_post_liked(post_id, user_id):
+    return notifications.notify_post_liked(post_id, user_id)
+
+@shared_task
+def notify_post_commented(comment_id):
+    return notifications.notify_post_commented(comment_id)
+
+@shared_task
+def notify_business_followed(business_id, user_id):
+    return notifications.notify_business_followed(business_id, user_id)
+
+@shared_task
+def notify_post_published(post_id):
+    return notifications.notify_post_published(post_id)
+
+@shared_task
+def notify_message_sent(message_id):
+    return notifications.notify_message_sent(message_id)
+
+
+# Periodic (CELERY_BEAT_SCHEDULE)
+@shared_task
+def flush_counters():
+    return flush_counter_shards()
+
+@shared_task
+def replay_engagement_log():
+    return engagement.replay_segments()
+
+@shared_task
+def rollup_business_analytics():
+    return analytics.rollup()
@@ -1,3 +1,914 @@
-from django.test import TestCase
+import asyncio
+import base64
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
+from django.apps import apps as django_apps
+from django.core.cache import caches
+from django.db import DatabaseError, connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from zonner_backend.celery import app
+from . import analytics, chats, engagement, geo, notifications, profiling, realtime, tasks, websocket
+from .counters import current_post_counter, flush_counter_shards, rebuild_counters, verify_counters
+from .management.commands import check_query_plans
+from .models import (
+    Business, BusinessAnalytics, Category, Chat, Comment, FeedEntry, Follow, Like, Message, Notification, Post,
+    PostCounterShard, Town, User, UserEngagement,
+)
 
-# Create your tests here.
+_sequence = itertools.count()
+
+
+def make_user(**fields):
+    n = next(_sequence)
+    return User.objects.create_user(username=f'user{n}', email=f'user{n}@example.com', password='password',
+                                    **fields)
+
+
+def make_business(owner=None, town=None, category=None, **fields):
+    n = next(_sequence)
+    fields = {'name': f'Business {n}', 'slug': f'business-{n}', 'description': 'A business',
+              'status': 'active', **fields}
+    town = town or Town.objects.create(name=f'Town {n}', slug=f'town-{n}')
+    category = category or Category.objects.create(name=f'Category {n}', slug=f'category-{n}')
+    return Business.objects.create(owner=owner or make_user(role='business'), town=town, category=category,
+                                   **fields)
+
+
+def make_post(business, **fields):
+    return Post.objects.create(business=business, author=business.owner, caption='A post',
+                               category=business.category, **fields)
+
+
+@contextmanager
+def celery_conf(**changes):
+    """Override CELERY_* settings of the Celery app within the block"""
+    saved = {name: getattr(app.conf, f'CELERY_{name}') for name in changes}
+    try:
+        for name, value in changes.items():
+            setattr(app.conf, f'CELERY_{name}', value)
+        app.close()  # Drop connections made with the old settings
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(app.conf, f'CELERY_{name}', value)
+        app.close()
+
+
+def run_concurrently(function, threads):
+    """Call ``function`` from ``threads`` threads released at once, each with a connection of its own"""
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def run():
+        try:
+            barrier.wait()
+            function()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+
+
+class APITestMixin:
+    """An API client, and no responses or throttle history cached by an earlier test"""
+
+    def setUp(self):
+        super().setUp()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.client = APIClient()
+
+
+class QueryBudgetTests(APITestMixin, TestCase):
+    """
+    The public pages run a fixed number of queries, however many businesses
+    and posts they show: nested data is batch-loaded (zooner.loaders), not
+    fetched per object.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_user()
+        town = Town.objects.create(name='Nakuru', slug='nakuru')
+        category = Category.objects.create(name='Food', slug='food')
+        cls.businesses = [make_business(town=town, category=category) for _ in range(3)]
+        cls.businesses.append(make_business())
+        cls.posts = [make_post(business) for business in cls.businesses for _ in range(4)]
+
+    def assertQueries(self, url, number, user=None):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(number):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_business_list(self):
+        # Count, page, recent posts, town and category counts
+        response = self.assertQueries('/api/businesses/', 5)
+        self.assertEqual(len(response.data['results']), 4)
+        # And which businesses the viewer follows and recent posts they like
+        self.assertQueries('/api/businesses/', 7, user=self.viewer)
+
+    def test_business_detail(self):
+        business = self.businesses[0]
+        # Business, recent posts, town and category counts
+        response = self.assertQueries(f'/api/businesses/{business.slug}/', 4)
+        self.assertEqual(len(response.data['recent_posts']), 3)
+
+    def test_post_list(self):
+        # Page, and the businesses': recent posts, town and category counts
+        response = self.assertQueries('/api/posts/', 4)
+        self.assertEqual(len(response.data['results']), len(self.posts))
+        # And which posts the viewer likes and businesses they follow
+        self.assertQueries('/api/posts/', 6, user=self.viewer)
+
+    def test_post_detail(self):
+        self.assertQueries(f'/api/posts/{self.posts[0].pk}/', 4)
+        self.assertQueries(f'/api/posts/{self.posts[0].pk}/', 7, user=self.viewer)
+
+
+class QueryPlanTests(TestCase):
+    """The hot reads are served by an index, not a table scan or a sort (check_query_plans)"""
+
+    def test_hot_queries_use_an_index(self):
+        command = check_query_plans.Command()
+        check = getattr(command, f'check_{connection.vendor}')
+        for name, queryset in check_query_plans.hot_queries():
+            with self.subTest(query=name):
+                plan, problems = check(connection, queryset)
+                self.assertEqual(problems, [], plan)
+
+
+@override_settings(ZONER_SETTINGS={**settings.ZONER_SETTINGS, 'PROFILING_ENABLED': True,
+                                    'PROFILING_SAMPLE_RATE': 1.0, 'PROFILING_SERVER_TIMING': True})
+class ProfilingTests(APITestMixin, TestCase):
+
+    def test_profiled_request(self):
+        make_post(make_business())
+        with self.assertLogs('zooner.profiling', 'INFO') as logs:
+            response = self.client.get('/api/posts/')
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['route'], record['status'], record['queries']), ('/api/posts/', 200, 4))
+
+    def test_serializers_patched_only_during_the_request(self):
+        make_post(make_business())
+        timed = mock.patch.object(profiling, '_timed_serializer_data', wraps=profiling._timed_serializer_data)
+        with timed as wrapper, self.assertLogs('zooner.profiling', 'INFO'):
+            self.client.get('/api/posts/')
+        self.assertTrue(wrapper.called)
+        # Serializers outside sampled requests (workers, other tests) are untouched
+        self.assertIs(vars(BaseSerializer)['data'], profiling._serializer_data)
+
+
+class ResponseCacheTests(APITestMixin, TestCase):
+
+    def test_business_detail_counts_follow_other_businesses(self):
+        business = make_business()
+        url = f'/api/businesses/{business.slug}/'
+        self.assertEqual(self.client.get(url).json()['town']['businesses_count'], 1)
+
+        other = make_business(town=business.town, category=business.category)
+        response = self.client.get(url)
+        self.assertEqual(response.json()['town']['businesses_count'], 2)
+        self.assertEqual(response.json()['category']['businesses_count'], 2)
+
+        other.status = 'closed'
+        other.save()
+        self.assertEqual(self.client.get(url).json()['town']['businesses_count'], 1)
+
+        # Edits that leave the counts alone keep the other pages cached
+        other.description = 'Closed for good'
+        other.save()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_cached_response_headers(self):
+        make_business()
+        miss = self.client.get('/api/businesses/')
+        hit = self.client.get('/api/businesses/')
+        self.assertIn('Authorization', miss['Vary'])
+        self.assertEqual((hit['Vary'], hit['ETag'], hit.content), (miss['Vary'], miss['ETag'], miss.content))
+        not_modified = self.client.get('/api/businesses/', HTTP_IF_NONE_MATCH=miss['ETag'])
+        self.assertEqual((not_modified.status_code, not_modified['Vary']), (304, miss['Vary']))
+
+
+class ActivityTests(APITestMixin, TestCase):
+
+    def login(self, user):
+        return self.client.post('/api/auth/login/', {'email': user.email, 'password': 'password'})
+
+    def test_login_records_last_login_once_per_interval(self):
+        user = make_user()
+        self.assertEqual(self.login(user).status_code, 200)
+        user.refresh_from_db()
+        self.assertIsNotNone(user.last_login)
+        self.assertGreaterEqual(user.last_active, user.last_login)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.login(user).status_code, 200)
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "zooner_user"')])
+
+
+class SearchTests(APITestMixin, TestCase):
+
+    def test_index_is_looked_up_once(self):
+        business = make_business(name='Mama Mboga Greens')
+        with CaptureQueriesContext(connection) as queries:
+            business.save()
+            response = self.client.get('/api/search/', {'q': 'mboga'})
+        self.assertEqual([found['id'] for found in response.data['businesses']], [str(business.pk)])
+        self.assertFalse([query for query in queries if 'sqlite_master' in query['sql']])
+
+
+class ReplaySegmentsTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.user = make_user()
+
+    def segment(self, events):
+        path = os.path.join(self.directory, f'{uuid.uuid4().hex}{engagement.SEGMENT_SUFFIX}')
+        rows = [{'id': str(uuid.uuid4()), 'user_id': str(self.user.pk), 'engagement_type': 'app_open',
+                 'created_at': timezone.now().isoformat()} for _ in range(events)]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(row) + '\n' for row in rows))
+        return path, rows
+
+    def test_replay(self):
+        self.segment(2), self.segment(3)
+        self.assertEqual(engagement.replay_segments(self.directory), 5)
+        self.assertEqual(UserEngagement.objects.count(), 5)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_segment_removed_by_a_concurrent_replay(self):
+        segments = {rows[0]['id']: path for path, rows in (self.segment(2), self.segment(3))}
+        write_rows = engagement.write_rows
+
+        def replayed_meanwhile(rows):
+            # The other replay deletes the segment after this one has read it
+            os.remove(segments[rows[0]['id']])
+            return write_rows(rows)
+
+        with mock.patch.object(engagement, 'write_rows', replayed_meanwhile):
+            self.assertEqual(engagement.replay_segments(self.directory), 5)
+        self.assertEqual(UserEngagement.objects.count(), 5)
+
+
+class AnalyticsTests(APITestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.business = make_business()
+        self.post = make_post(self.business)
+        self.today = timezone.localdate()
+
+    def view(self, at=None):
+        return UserEngagement.objects.create(user=make_user(), engagement_type='view', related_post=self.post,
+                                             created_at=at or timezone.now())
+
+    def rolled_up(self):
+        return dict(BusinessAnalytics.objects.filter(business=self.business).values_list('date', 'post_views'))
+
+    def test_rollup_is_idempotent(self):
+        self.view(), self.view()
+        Like.objects.create(user=make_user(), post=self.post)
+        self.assertEqual(analytics.rollup_range(self.today, self.today), 1)
+        self.assertEqual(analytics.rollup_range(self.today, self.today), 1)
+
+        row = BusinessAnalytics.objects.get(business=self.business)
+        self.assertEqual((row.date, row.post_views, row.reach, row.total_likes), (self.today, 2, 2, 1))
+        self.assertEqual(row.engagement_rate, Decimal('50.00'))
+
+    def test_stale_rows_are_deleted(self):
+        yesterday, before = self.today - timedelta(days=1), self.today - timedelta(days=2)
+        for day in (yesterday, before):
+            BusinessAnalytics.objects.create(business=self.business, date=day, post_views=9)
+        self.view()
+
+        analytics.rollup_range(yesterday, self.today)
+        # Yesterday has no activity left; the day before is out of the range
+        self.assertEqual(self.rolled_up(), {self.today: 1, before: 9})
+
+    def test_rows_written_late_are_rolled_up(self):
+        analytics.rollup()
+        # A replayed log segment: written now, created days before the watermark
+        days_ago = self.today - timedelta(days=3)
+        self.view(at=timezone.now() - timedelta(days=3))
+
+        analytics.rollup()
+        self.assertEqual(self.rolled_up(), {days_ago: 1})
+
+    def test_series(self):
+        # Thursday 1 January to Tuesday 20 January 2026
+        first, last = date(2026, 1, 1), date(2026, 1, 20)
+        for day, views in ((2, 10), (4, 5), (5, 3), (20, 1)):
+            BusinessAnalytics.objects.create(business=self.business, date=date(2026, 1, day), post_views=views)
+
+        weeks = analytics.series(self.business.pk, first, last, 'week')
+        self.assertEqual([(point['start'].day, point['end'].day, point['post_views']) for point in weeks],
+                         [(1, 4, 15), (5, 11, 3), (12, 18, 0), (19, 20, 1)])
+        months = analytics.series(self.business.pk, first, last, 'month')
+        self.assertEqual([(point['start'], point['end'], point['post_views']) for point in months],
+                         [(first, last, 19)])
+        days = analytics.series(self.business.pk, first, last, 'day')
+        self.assertEqual(len(days), 20)
+        self.assertEqual(sum(point['post_views'] for point in days), 19)
+        self.assertEqual(days[4]['post_views'], 3)
+
+
+class NearbyTests(TestCase):
+    """geo.nearby() finds exactly what a distance check over every business finds"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.town = Town.objects.create(name='Nairobi', slug='nairobi')
+        cls.category = Category.objects.create(name='Shops', slug='shops')
+        cls.owner = make_user(role='business')
+
+    def setUp(self):
+        geo.cell_cache.clear()
+        self.addCleanup(geo.cell_cache.clear)
+
+    def place(self, latitude, longitude, **fields):
+        # Rounded as stored, so the geohash is that of the stored point
+        wrap = lambda lon: (lon + 180) % 360 - 180
+        return make_business(self.owner, self.town, self.category, latitude=Decimal(f'{latitude:.6f}'),
+                             longitude=Decimal(f'{wrap(longitude):.6f}'), **fields)
+
+    def scatter(self, latitude, longitude, spread_km, count, seed):
+        rng = random.Random(seed)
+        degrees = math.degrees(spread_km / geo.EARTH_RADIUS_KM)
+        for _ in range(count):
+            self.place(latitude + rng.uniform(-degrees, degrees),
+                       longitude + rng.uniform(-degrees, degrees) / math.cos(math.radians(latitude)))
+
+    def brute_force(self, latitude, longitude, radius_km):
+        distances = [
+            (geo.haversine_km(latitude, longitude, lat, lon), pk)
+            for pk, lat, lon in Business.objects.filter(status='active').values_list('pk', 'latitude', 'longitude')
+        ]
+        return [pk for distance, pk in sorted(distances) if distance <= radius_km]
+
+    def assertNearby(self, latitude, longitude, radius_km):
+        expected = self.brute_force(latitude, longitude, radius_km)
+        found = [pk for pk, distance in geo.nearby(latitude, longitude, radius_km, limit=len(expected) + 10)]
+        self.assertEqual(found, expected)
+        # Fewer than all: the progressive radius still returns the nearest
+        limit = max(len(expected) // 3, 1)
+        self.assertEqual([pk for pk, distance in geo.nearby(latitude, longitude, radius_km, limit)],
+                         expected[:limit])
+
+    def test_cell_edges(self):
+        # Every geohash cell boundary meets at (0, 0)
+        self.scatter(0.0, 0.0, 3, 150, seed=1)
+        for latitude, longitude in ((0.0, 0.0), (0.00001, -0.00001), (-0.01, 0.01)):
+            for radius in (0.5, 2, 5):
+                with self.subTest(center=(latitude, longitude), radius=radius):
+                    self.assertNearby(latitude, longitude, radius)
+
+    def test_antimeridian(self):
+        self.scatter(-17.8, 180.0, 10, 150, seed=2)
+        for longitude in (179.999, -179.999, 179.95):
+            for radius in (1, 5, 20):
+                with self.subTest(longitude=longitude, radius=radius):
+                    self.assertNearby(-17.8, longitude, radius)
+
+    def test_city(self):
+        self.scatter(-1.2921, 36.8219, 30, 150, seed=3)
+        self.place(-1.2921, 36.8219, status='closed')
+        for radius in (3, 10, 50):
+            with self.subTest(radius=radius):
+                self.assertNearby(-1.2921, 36.8219, radius)
+
+    def test_cached_cells_follow_saves_and_deletes(self):
+        near = self.place(-1.2921, 36.8219)
+        far = self.place(-1.4, 36.9)
+        self.assertEqual(geo.nearby(-1.2921, 36.8219, 2, 10)[0][0], near.pk)
+
+        far.latitude, far.longitude = Decimal('-1.292200'), Decimal('36.822000')
+        far.save()
+        self.assertEqual([pk for pk, distance in geo.nearby(-1.2921, 36.8219, 2, 10)], [near.pk, far.pk])
+        near.delete()
+        self.assertEqual([pk for pk, distance in geo.nearby(-1.2921, 36.8219, 2, 10)], [far.pk])
+
+
+class EngagementIngestTests(APITestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        options = override_settings(ZONER_SETTINGS={**settings.ZONER_SETTINGS, 'ENGAGEMENT_LOG_DIR': self.directory,
+                                                    'ENGAGEMENT_MAX_PENDING': 4})
+        options.enable()
+        self.addCleanup(options.disable)
+        # A buffer of this test's own, flushed by the test rather than by a background thread
+        self.buffer = engagement.EngagementBuffer()
+        for patch in (mock.patch.object(engagement, 'buffer', self.buffer),
+                      mock.patch.object(engagement.EngagementBuffer, '_start_flusher')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client.force_authenticate(make_user())
+
+    def send(self, events):
+        return self.client.post('/api/engagement/', {'events': [
+            {'id': str(uuid.uuid4()), 'type': 'app_open'} for _ in range(events)
+        ]}, format='json')
+
+    def test_accept(self):
+        response = self.send(3)
+        self.assertEqual((response.status_code, response.data['accepted']), (202, 3))
+        self.assertEqual(self.buffer.pending, 3)
+        self.assertFalse(UserEngagement.objects.exists())
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual((UserEngagement.objects.count(), self.buffer.pending), (3, 0))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_backpressure(self):
+        self.assertEqual(self.send(3).status_code, 202)
+        with self.assertLogs('django.request', 'ERROR'):
+            response = self.send(2)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.ZONER_SETTINGS['ENGAGEMENT_FLUSH_INTERVAL']))
+        self.assertEqual(self.buffer.pending, 3)
+
+        self.buffer.flush()
+        self.assertEqual(self.send(2).status_code, 202)
+
+    def test_failed_flush_keeps_the_batch(self):
+        self.send(3)
+        with mock.patch.object(engagement, 'write_rows', side_effect=TypeError), \
+                self.assertLogs('zooner.engagement', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.pending, 3)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(UserEngagement.objects.count(), 3)
+
+
+def cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+class CursorPaginationTests(APITestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        business = make_business()
+        cls.posts = [make_post(business) for _ in range(3)]
+
+    def test_pages(self):
+        response = self.client.get('/api/posts/?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_forged_cursor(self):
+        for forged in [
+            'not base64!', cursor([]), cursor({'t': '2025-01-01T00:00:00+00:00'}),
+            cursor({'t': '2025-01-01T00:00:00+00:00', 'id': 'not-a-uuid'}),
+            cursor({'t': '2025-01-01T00:00:00+00:00', 'id': ['x']}),
+            cursor({'t': 'yesterday', 'id': str(self.posts[0].pk)}),
+            cursor({'t': '2025-13-01T00:00:00+00:00', 'id': str(self.posts[0].pk)}),
+            cursor({'t': '2025-01-01T00:00:00', 'id': str(self.posts[0].pk)}),
+        ]:
+            with self.subTest(cursor=forged):
+                response = self.client.get('/api/posts/', {'cursor': forged})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+class CommentThreadTests(APITestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = make_post(make_business())
+        user = make_user()
+        comment = lambda parent=None: Comment.objects.create(post=cls.post, user=user, content='A comment',
+                                                              parent=parent)
+        cls.thread = comment()
+        first = comment(cls.thread)
+        second = comment(first)
+        # Replies of the thread in the order they were written, at any depth
+        cls.replies = [first, second, comment(second), comment(cls.thread), comment(first)]
+        cls.other = comment()
+        comment(cls.other)
+
+    def threads(self):
+        return {comment.pk: (comment.root_id, comment.depth) for comment in Comment.objects.all()}
+
+    def test_root_and_depth(self):
+        self.assertEqual((self.thread.root_id, self.thread.depth), (None, 0))
+        self.assertEqual([(reply.root_id, reply.depth) for reply in self.replies],
+                         [(self.thread.pk, 1), (self.thread.pk, 2), (self.thread.pk, 3), (self.thread.pk, 1),
+                          (self.thread.pk, 2)])
+
+    def test_backfill(self):
+        saved = self.threads()
+        Comment.objects.update(root=None, depth=0)
+        import_module('zooner.migrations.0008_comment_threads').populate_threads(django_apps, None)
+        self.assertEqual(self.threads(), saved)
+
+    def test_thread_embeds_first_replies(self):
+        response = self.client.get(f'/api/posts/{self.post.pk}/comments/')
+        thread, other = response.data['results']
+        self.assertEqual(thread['id'], str(self.thread.pk))
+        limit = settings.ZONER_SETTINGS['COMMENT_REPLIES_LIMIT']
+        self.assertEqual([reply['id'] for reply in thread['replies']],
+                         [str(reply.pk) for reply in self.replies[:limit]])
+        self.assertEqual(thread['replies_count'], len(self.replies))
+        self.assertEqual((other['replies_count'], other['replies_next']), (1, None))
+
+        # replies_next carries on after the embedded replies
+        response = self.client.get(thread['replies_next'])
+        self.assertEqual([reply['id'] for reply in response.data['results']],
+                         [str(reply.pk) for reply in self.replies[limit:]])
+        self.assertIsNone(response.data['next'])
+
+    def test_reply_pages(self):
+        url = f'/api/posts/{self.post.pk}/comments/{self.thread.pk}/replies/?page_size=2'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append([reply['id'] for reply in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(pages, [[str(reply.pk) for reply in self.replies[start:start + 2]] for start in (0, 2, 4)])
+        self.assertEqual(response.data['results'][0]['depth'], 2)
+
+    def test_replies_of_a_reply(self):
+        # Threads are listed by their top-level comment only
+        url = f'/api/posts/{self.post.pk}/comments/{self.replies[0].pk}/replies/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ChatInboxTests(APITestMixin, TestCase):
+    """Chat.last_message and the per-participant unread counters (ChatReadState)"""
+
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob = make_user(), make_user()
+        self.chat = Chat.objects.create(chat_type='user_user')
+        self.chat.participants.add(self.alice, self.bob)
+
+    def send(self, sender, content='Hello'):
+        self.client.force_authenticate(sender)
+        response = self.client.post(f'/api/chats/{self.chat.pk}/messages/create/', {'content': content})
+        self.assertEqual(response.status_code, 201, response.content)
+        return Message.objects.get(pk=response.data['id'])
+
+    def inbox(self, user):
+        self.client.force_authenticate(user)
+        chat, = self.client.get('/api/chats/').data['results']
+        return chat['unread_count'], chat['last_message'] and chat['last_message']['content']
+
+    def test_unread_counts(self):
+        self.send(self.alice, 'One'), self.send(self.alice, 'Two')
+        self.assertEqual(self.inbox(self.bob), (2, 'Two'))
+        self.assertEqual(self.inbox(self.alice), (0, 'Two'))
+
+        self.assertEqual(chats.mark_read(self.chat, self.bob), 2)
+        self.assertEqual(self.inbox(self.bob), (0, 'Two'))
+        self.assertFalse(self.chat.messages.filter(is_read=False).exists())
+        # Nothing left to mark
+        self.assertEqual(chats.mark_read(self.chat, self.bob), 0)
+
+        self.send(self.bob, 'Three')
+        self.assertEqual(self.inbox(self.alice), (1, 'Three'))
+
+    def test_deleted_messages(self):
+        first, second = self.send(self.alice, 'One'), self.send(self.alice, 'Two')
+        second.delete()
+        self.assertEqual(self.inbox(self.bob), (1, 'One'))
+        first.delete()
+        self.assertEqual(self.inbox(self.bob), (0, None))
+
+    def test_failed_send_leaves_the_inbox_alone(self):
+        self.send(self.alice, 'One')
+        with mock.patch('zooner.signals.bump', side_effect=DatabaseError), self.assertRaises(DatabaseError), \
+                self.assertLogs('django.request', 'ERROR'):
+            self.send(self.alice, 'Two')
+        self.assertEqual(self.chat.messages.count(), 1)
+        self.assertEqual(self.inbox(self.bob), (1, 'One'))
+
+
+class NotificationTests(APITestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.business = make_business()
+        self.owner = self.business.owner
+        self.posts = [make_post(self.business) for _ in range(5)]
+
+    def like(self, post, user=None):
+        notifications.notify('like', [self.owner.pk], user or make_user(), self.business, related_post=post)
+
+    def page(self, url):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(url)
+        return [item['id'] for item in response.data['results']], response.data['next']
+
+    def test_coalesced_notification_moves_up(self):
+        first, second = self.posts[:2]
+        self.like(first), self.like(second)
+        notification = Notification.objects.get(related_post=first)
+
+        self.like(first)
+        coalesced = Notification.objects.get(related_post=first)
+        self.assertEqual((coalesced.pk, coalesced.events_count), (notification.pk, 2))
+        self.assertEqual(coalesced.created_at, notification.created_at)
+        self.assertGreater(coalesced.updated_at, notification.updated_at)
+        self.assertEqual(self.page('/api/notifications/')[0][0], str(coalesced.pk))
+
+    def test_paging_while_coalescing(self):
+        for post in self.posts:
+            self.like(post)
+        seen, next_url = self.page('/api/notifications/?page_size=2')
+        # One already seen and one not reached yet take in new events
+        self.like(self.posts[-1]), self.like(self.posts[0])
+        while next_url:
+            page, next_url = self.page(next_url)
+            seen += page
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 4)  # The one that moved up is on the first page now
+
+
+class InProcessBrokerTests(SimpleTestCase):
+
+    async def test_publish_subscribe(self):
+        broker = realtime.InProcessBroker()
+        subscription = await broker.subscribe(realtime.user_channel(1))
+        other = await broker.subscribe(realtime.user_channel(2))
+
+        self.assertEqual(broker.publish(realtime.user_channel(1), {'type': 'pong'}), 1)
+        self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'type': 'pong'})
+        # From another thread, as views and signal handlers publish
+        publisher = threading.Thread(target=broker.publish, args=(realtime.user_channel(1), {'type': 'read'}))
+        publisher.start()
+        publisher.join()
+        self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'type': 'read'})
+        self.assertTrue(other.queue.empty())
+
+        await subscription.close()
+        self.assertEqual(broker.publish(realtime.user_channel(1), {'type': 'pong'}), 0)
+        self.assertEqual(broker.subscriber_count(), 1)
+
+
+class WebSocketClient:
+    """Drives zooner.websocket's ASGI application like a server would"""
+
+    def __init__(self, query_string=b'', path=websocket.PATH):
+        self.received = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.received.put_nowait({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': path, 'query_string': query_string}
+        self.task = asyncio.create_task(websocket.websocket_application(scope, self.received.get, self.sent.put))
+
+    async def receive(self):
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+    async def receive_json(self):
+        return json.loads((await self.receive())['text'])
+
+    def send_json(self, data):
+        self.received.put_nowait({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def disconnect(self):
+        self.received.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 5)
+
+
+@override_settings(ZONER_SETTINGS={**settings.ZONER_SETTINGS, 'REALTIME_ENABLED': True,
+                                    'REALTIME_BROKER': 'zooner.realtime.InProcessBroker'})
+class WebSocketTests(TransactionTestCase):
+    # The application closes stale connections around its ORM calls, as a request would
+
+    def setUp(self):
+        self.user = make_user()
+        patch = mock.patch.object(realtime, '_broker', realtime.InProcessBroker())
+        self.broker = patch.start()
+        self.addCleanup(patch.stop)
+
+    async def test_rejected_handshakes(self):
+        for query_string in (b'', b'token=not-a-jwt'):
+            with self.subTest(query_string=query_string):
+                client = WebSocketClient(query_string)
+                self.assertEqual(await client.receive(), {'type': 'websocket.close', 'code': 4401})
+        client = WebSocketClient(path='/elsewhere/')
+        self.assertEqual(await client.receive(), {'type': 'websocket.close', 'code': 4404})
+
+    async def test_connected(self):
+        client = WebSocketClient(f'token={AccessToken.for_user(self.user)}'.encode())
+        self.assertEqual(await client.receive(), {'type': 'websocket.accept'})
+        self.assertEqual(await client.receive_json(), {'type': 'connected', 'user': str(self.user.pk)})
+
+        client.send_json({'type': 'ping'})
+        self.assertEqual(await client.receive_json(), {'type': 'pong'})
+        realtime.publish_to_users([self.user.pk], {'type': 'notification', 'notification': {}})
+        self.assertEqual(await client.receive_json(), {'type': 'notification', 'notification': {}})
+
+        await client.disconnect()
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+
+class BrokerDownTests(APITestMixin, TransactionTestCase):
+    """Writes queue their tasks on commit; an unreachable broker must not hold up or fail the request"""
+
+    def setUp(self):
+        super().setUp()
+        # Nothing listens on port 1: every publish is refused
+        conf = celery_conf(BROKER_URL='redis://127.0.0.1:1/0', TASK_ALWAYS_EAGER=False)
+        conf.__enter__()
+        self.addCleanup(conf.__exit__, None, None, None)
+
+    def test_like_publishes_once(self):
+        with self.assertLogs('django.db.backends.base', 'ERROR'):
+            post = make_post(make_business())
+        self.client.force_authenticate(make_user())
+        publish = mock.patch.object(app.amqp, 'send_task_message', wraps=app.amqp.send_task_message)
+        with publish as send, self.assertLogs('django.db.backends.base', 'ERROR'):
+            response = self.client.post(f'/api/posts/{post.pk}/like/')
+        self.assertEqual(response.status_code, 200, response.content)
+        # No publish retries, and no notification written inline instead
+        self.assertEqual([call.args[1] for call in send.call_args_list], [tasks.notify_post_liked.name])
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(ZONER_SETTINGS={**settings.ZONER_SETTINGS, 'TIMELINE_ENABLED': True})
+    def test_timelines_do_not_need_the_broker(self):
+        business, follower = make_business(), make_user()
+        with self.assertLogs('django.db.backends.base', 'ERROR'):
+            Follow.objects.create(user=follower, business=business)
+            post = make_post(business)
+        self.assertTrue(FeedEntry.objects.filter(user=follower, post=post).exists())
+
+
+class ConcurrentCounterTests(APITestMixin, TransactionTestCase):
+    """Counters stay equal to the rows they count when requests race"""
+
+    def setUp(self):
+        super().setUp()
+        # Notifications written inline, as without Redis in development
+        conf = celery_conf(TASK_ALWAYS_EAGER=True)
+        conf.__enter__()
+        self.addCleanup(conf.__exit__, None, None, None)
+
+    def toggle(self, user, url, threads=2, rounds=10):
+        def request():
+            client = APIClient()
+            client.force_authenticate(user)
+            response = client.post(url)
+            self.assertEqual(response.status_code, 200, response.content)
+
+        for _ in range(rounds):
+            run_concurrently(request, threads)
+
+    def test_racing_unfollows(self):
+        business, user = make_business(), make_user()
+        # Other followers, so a second decrement isn't absorbed by the floor at zero
+        for follower in [user] + [make_user() for _ in range(3)]:
+            self.client.force_authenticate(follower)
+            self.client.post(f'/api/businesses/{business.pk}/follow/')
+        self.toggle(user, f'/api/businesses/{business.pk}/follow/', threads=4)
+
+        follows = Follow.objects.filter(business=business).count()
+        business.refresh_from_db()
+        user.refresh_from_db()
+        business.owner.refresh_from_db()
+        self.assertEqual(business.followers_count, follows)
+        self.assertEqual(user.following_count, Follow.objects.filter(user=user).count())
+        self.assertEqual(business.owner.followers_count, follows)
+
+    def test_likes_during_rebuild(self):
+        post = make_post(make_business())
+        # Four likers and four rebuilds, assigned before the threads start
+        jobs = [make_user() for _ in range(4)] + [None] * 4
+
+        def like_or_rebuild():
+            user = jobs.pop()
+            if user is None:
+                return rebuild_counters({'Post.likes_count', 'Business.likes_count'})
+            client = APIClient()
+            client.force_authenticate(user)
+            client.post(f'/api/posts/{post.pk}/like/')
+
+        run_concurrently(like_or_rebuild, len(jobs))
+        post.refresh_from_db()
+        post.business.refresh_from_db()
+        self.assertEqual((post.likes_count, post.business.likes_count), (4, 4))
+
+    def test_racing_likes_and_unlikes(self):
+        post, user = make_post(make_business()), make_user()
+        for liker in [user] + [make_user() for _ in range(3)]:
+            self.client.force_authenticate(liker)
+            self.client.post(f'/api/posts/{post.pk}/like/')
+        self.toggle(user, f'/api/posts/{post.pk}/like/', threads=4)
+
+        likes = Like.objects.filter(post=post).count()
+        post.refresh_from_db()
+        post.business.refresh_from_db()
+        self.assertEqual(post.likes_count, likes)
+        self.assertEqual(post.business.likes_count, likes)
+
+
+@override_settings(ZONER_SETTINGS={**settings.ZONER_SETTINGS, 'SHARDED_COUNTER_THRESHOLD': 0})
+class RebuildCounterTests(APITestMixin, TestCase):
+
+    def like(self, post, likes):
+        for _ in range(likes):
+            self.client.force_authenticate(make_user())
+            self.client.post(f'/api/posts/{post.pk}/like/')
+
+    def test_rebuild_keeps_pending_shard_deltas(self):
+        post = make_post(make_business())
+        self.like(post, 3)
+        self.assertEqual(current_post_counter(post, 'likes_count'), 3)
+
+        rebuild_counters()
+        self.assertEqual(current_post_counter(post, 'likes_count'), 3)
+        flush_counter_shards()
+        post.refresh_from_db()
+        post.business.refresh_from_db()
+        self.assertEqual((post.likes_count, post.business.likes_count), (3, 3))
+
+    def test_rebuild_in_batches(self):
+        posts = [make_post(make_business()) for _ in range(5)]
+        for likes, post in enumerate(posts):
+            self.like(post, likes)
+        Post.objects.update(likes_count=7)
+        Business.objects.update(likes_count=7)
+
+        with mock.patch('zooner.counters.REBUILD_BATCH_SIZE', 2):
+            rebuild_counters()
+        self.assertEqual(verify_counters()['Post.likes_count'], 0)
+        self.assertEqual(verify_counters()['Business.likes_count'], 0)
+        self.assertEqual(sorted(current_post_counter(post, 'likes_count') for post in posts), [0, 1, 2, 3, 4])
+
+    def test_verify_leaves_shards_pending(self):
+        post = make_post(make_business())
+        self.like(post, 3)
+        shards = list(PostCounterShard.objects.values_list('pk', 'likes_count'))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(any(verify_counters().values()))
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+        self.assertEqual(list(PostCounterShard.objects.values_list('pk', 'likes_count')), shards)
+
+        Post.objects.filter(pk=post.pk).update(likes_count=1)
+        self.assertEqual(verify_counters()['Post.likes_count'], 1)
+
+
+class CascadeCounterTests(TestCase):
+    """Rows deleted outside the views (account deletion, the admin) still update the counters"""
+
+    def test_deleted_liker_and_follower(self):
+        business = make_business()
+        post, other = make_post(business), make_post(business)
+        users = [make_user() for _ in range(3)]
+        for user in users:
+            Follow.objects.create(user=user, business=business)
+            Like.objects.create(user=user, post=post)
+        Post.objects.filter(pk=post.pk).update(likes_count=3)
+        Business.objects.filter(pk=business.pk).update(likes_count=3)
+
+        users[0].delete()
+        post.refresh_from_db()
+        business.refresh_from_db()
+        self.assertEqual((post.likes_count, business.likes_count, business.followers_count), (2, 2, 2))
+
+        # A deleted post takes its likes out of the business once
+        post.delete()
+        business.refresh_from_db()
+        self.assertEqual((business.likes_count, business.posts_count), (0, 1))
+        self.assertEqual(other.pk, business.posts.get().pk)
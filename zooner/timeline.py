@@ -0,0 +1,115 @@
+# ============================================================================
+# TIMELINE.PY - Precomputed home feeds (fan-out-on-write)
+# ============================================================================
+#
+# When a business posts, the post is pushed into a FeedEntry row for each of
+# its followers, so reading a home feed is a range read on
+# (user, published_at) instead of a subquery over Follow plus a sort of every
+# matching post. Businesses with more than TIMELINE_FANOUT_LIMIT followers are
+# not fanned out; their posts are merged in when the feed is read.
+
+from django.conf import settings
+from .models import Business, FeedEntry, Follow, Post
+from .pagination import PostCursorPagination, keyset_filter
+
+BATCH_SIZE = 1000
+ENTRY_ORDERING = ('-published_at', '-post_id')
+
+
+def is_enabled():
+    return settings.ZONER_SETTINGS['TIMELINE_ENABLED']
+
+
+def _fanout_limit():
+    return settings.ZONER_SETTINGS['TIMELINE_FANOUT_LIMIT']
+
+
+def fans_out(business_id):
+    return Business.objects.filter(pk=business_id, followers_count__lte=_fanout_limit()).exists()
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Push ``post`` into the feed of every follower of its business"""
+    if not post.is_active or not fans_out(post.business_id):
+        return
+    follower_ids = Follow.objects.filter(business_id=post.business_id).values_list('user_id', flat=True)
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post.pk, business_id=post.business_id, published_at=post.published_at)
+        for user_id in follower_ids.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill(user_id, business_id):
+    """Seed a new follower's feed with the business's latest posts"""
+    if not fans_out(business_id):
+        return
+    posts = (
+        Post.objects.filter(business_id=business_id, is_active=True)
+        .order_by('-published_at')
+        .values_list('pk', 'published_at')[:settings.ZONER_SETTINGS['TIMELINE_BACKFILL_POSTS']]
+    )
+    _bulk_insert(
+        FeedEntry(user_id=user_id, post_id=post_id, business_id=business_id, published_at=published_at)
+        for post_id, published_at in posts
+    )
+
+
+def trim(user_id, business_id):
+    """Drop a business's posts from a feed after an unfollow"""
+    FeedEntry.objects.filter(user_id=user_id, business_id=business_id).delete()
+
+
+def rebuild():
+    """Recreate every feed from Follow and the latest posts of each business"""
+    FeedEntry.objects.all().delete()
+    businesses = Business.objects.filter(followers_count__gt=0, followers_count__lte=_fanout_limit())
+    for business_id in businesses.values_list('pk', flat=True).iterator():
+        posts = list(
+            Post.objects.filter(business_id=business_id, is_active=True)
+            .order_by('-published_at')
+            .values_list('pk', 'published_at')[:settings.ZONER_SETTINGS['TIMELINE_BACKFILL_POSTS']]
+        )
+        follower_ids = Follow.objects.filter(business_id=business_id).values_list('user_id', flat=True)
+        _bulk_insert(
+            FeedEntry(user_id=user_id, post_id=post_id, business_id=business_id, published_at=published_at)
+            for user_id in follower_ids.iterator(chunk_size=BATCH_SIZE)
+            for post_id, published_at in posts
+        )
+
+
+def read_post_ids(user, position, limit):
+    """
+    Ids of up to ``limit`` feed posts for ``user`` sorting after ``position``
+    (a PostCursorPagination cursor), newest first.
+    """
+    entries = FeedEntry.objects.filter(user=user, post__is_active=True)
+    if position is not None:
+        entries = entries.filter(keyset_filter(ENTRY_ORDERING, position))
+    rows = list(entries.order_by(*ENTRY_ORDERING).values_list('published_at', 'post_id')[:limit])
+
+    # Fan-out-on-read for businesses too large to fan out on write
+    large = Follow.objects.filter(user=user, business__followers_count__gt=_fanout_limit())
+    large_ids = list(large.values_list('business_id', flat=True))
+    if large_ids:
+        posts = Post.objects.filter(business_id__in=large_ids, is_active=True)
+        if position is not None:
+            posts = posts.filter(keyset_filter(PostCursorPagination.ordering, position))
+        rows += posts.order_by(*PostCursorPagination.ordering).values_list('published_at', 'id')[:limit]
+        rows.sort(reverse=True)
+
+    post_ids = []
+    for _, post_id in rows:
+        if post_id not in post_ids:
+            post_ids.append(post_id)
+    return post_ids[:limit]
@@ -6,23 +6,58 @@
 from rest_framework import generics, status, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count
+from datetime import timedelta
+from django.db.models import Q, Count, Sum
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from .counters import counted_by_caller, current_post_counter, increment_post_counter, update_follow_counters
+from .pagination import (
+    CommentCursorPagination, MessageCursorPagination, NotificationCursorPagination, PostCursorPagination,
+)
+from . import analytics, chats, engagement, geo, search, timeline
+from .cache import CachedResponseMixin, business_namespace, dashboard_namespace
+from .routers import ReplicaReadMixin
 from .serializers import *
 
 
+# Related rows every serialized post/business embeds; joined up front so the
+# list serializers only have to batch-load counts and flags.
+POST_RELATED = ('business__owner', 'business__town', 'business__category', 'author', 'category')
+BUSINESS_RELATED = ('owner', 'town', 'category')
+CHAT_RELATED = ('business__owner', 'business__town', 'business__category', 'last_message__sender')
+
+
+def in_order(queryset, ids):
+    """Objects of ``queryset`` with the given ids, in the order of ``ids``"""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+class PreloadedRetrieveMixin:
+    """
+    Batch-load what the serializer's method fields need for the one object,
+    with the preloader its list serializer runs for a page, instead of
+    letting each nested field fall back to its own query.
+    """
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        serializer.Meta.list_serializer_class.preload([instance], serializer.context, serializer.fields)
+        return Response(serializer.data)
+
+
 # Authentication Views
 class CustomTokenObtainPairView(TokenObtainPairView):
-    def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        if response.status_code == 200:
-            user = User.objects.get(email=request.data['email'])
-            user_data = UserSerializer(user).data
-            response.data['user'] = user_data
-        return response
+    serializer_class = LoginSerializer
+
+class ActivityTokenRefreshView(TokenRefreshView):
+    serializer_class = ActivityTokenRefreshSerializer
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -46,23 +81,28 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 # Town Views
-class TownListView(generics.ListAPIView):
+class TownListView(ReplicaReadMixin, CachedResponseMixin, generics.ListAPIView):
     queryset = Town.objects.filter(is_active=True)
     serializer_class = TownSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'region']
+    cache_namespaces = ('towns',)
+    cache_authenticated = True
 
 # Category Views
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ReplicaReadMixin, CachedResponseMixin, generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('categories',)
+    cache_authenticated = True
 
 # Business Views
-class BusinessListView(generics.ListAPIView):
+class BusinessListView(ReplicaReadMixin, CachedResponseMixin, generics.ListAPIView):
     serializer_class = BusinessSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = ('businesses',)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['town', 'category', 'is_featured']
     search_fields = ['name', 'description']
@@ -70,17 +110,47 @@ class BusinessListView(generics.ListAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = Business.objects.filter(status='active')
+        queryset = Business.objects.filter(status='active').select_related(*BUSINESS_RELATED)
         town_name = self.request.query_params.get('town_name', None)
         if town_name:
             queryset = queryset.filter(town__name__icontains=town_name)
         return queryset
 
-class BusinessDetailView(generics.RetrieveAPIView):
-    queryset = Business.objects.filter(status='active')
+class NearbyBusinessesView(ReplicaReadMixin, APIView):
+    """Active businesses within ``radius`` km of ``lat``/``lon``, nearest first"""
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        try:
+            latitude = float(request.query_params['lat'])
+            longitude = float(request.query_params['lon'])
+            radius = float(request.query_params.get('radius', 5))
+            limit = int(request.query_params.get('limit', 20))
+        except (KeyError, ValueError):
+            return Response({'message': 'lat and lon query parameters required'}, status=status.HTTP_400_BAD_REQUEST)
+        max_radius = settings.ZONER_SETTINGS['NEARBY_MAX_RADIUS_KM']
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < radius <= max_radius:
+            return Response(
+                {'message': f'Invalid coordinates or radius (max {max_radius} km)'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        distances = dict(geo.nearby(latitude, longitude, radius, min(max(limit, 1), 100)))
+        businesses = in_order(
+            Business.objects.filter(status='active').select_related(*BUSINESS_RELATED),
+            list(distances),
+        )
+        context = {'request': request, 'distances': distances}
+        return Response({'results': NearbyBusinessSerializer(businesses, many=True, context=context).data})
+
+class BusinessDetailView(ReplicaReadMixin, CachedResponseMixin, PreloadedRetrieveMixin, generics.RetrieveAPIView):
+    queryset = Business.objects.filter(status='active').select_related(*BUSINESS_RELATED)
     serializer_class = BusinessSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
+    
+    def get_cache_namespaces(self):
+        return ('business-details', business_namespace(self.kwargs['slug']))
 
 class BusinessCreateView(generics.CreateAPIView):
     serializer_class = BusinessCreateSerializer
@@ -98,7 +168,7 @@ class MyBusinessesView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Business.objects.filter(owner=self.request.user)
+        return Business.objects.filter(owner=self.request.user).select_related(*BUSINESS_RELATED)
 
 # Follow/Unfollow Business
 class FollowBusinessView(APIView):
@@ -106,25 +176,30 @@ class FollowBusinessView(APIView):
     
     def post(self, request, business_id):
         business = get_object_or_404(Business, id=business_id, status='active')
-        follow, created = Follow.objects.get_or_create(user=request.user, business=business)
         
-        if created:
-            return Response({'message': 'Following business', 'following': True})
-        else:
-            follow.delete()
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(user=request.user, business=business)
+            if created:
+                return Response({'message': 'Following business', 'following': True})
+            
+            # Only the request that actually removed the row decrements
+            with counted_by_caller():
+                deleted, _ = Follow.objects.filter(pk=follow.pk).delete()
+            if deleted:
+                update_follow_counters(follow, -1)
             return Response({'message': 'Unfollowed business', 'following': False})
 
 # Post Views
-class PostListView(generics.ListAPIView):
+class PostListView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = PostCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['business', 'post_type', 'category']
     search_fields = ['caption', 'tags']
-    ordering = ['-published_at']
     
     def get_queryset(self):
-        queryset = Post.objects.filter(is_active=True)
+        queryset = Post.objects.filter(is_active=True).select_related(*POST_RELATED)
         
         # Filter by town if provided
         town_name = self.request.query_params.get('town_name', None)
@@ -138,9 +213,31 @@ class PostListView(generics.ListAPIView):
             queryset = queryset.filter(business__in=followed_businesses)
         
         return queryset
+    
+    def list(self, request, *args, **kwargs):
+        if self.uses_timeline():
+            page = self.paginator.paginate_source(self.fetch_timeline, request)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return super().list(request, *args, **kwargs)
+    
+    def uses_timeline(self):
+        """Plain ?following=1 feeds are served from the precomputed timeline"""
+        params = set(self.request.query_params) - {'following', 'cursor', 'page_size'}
+        return (
+            timeline.is_enabled()
+            and self.request.user.is_authenticated
+            and self.request.query_params.get('following')
+            and not params
+        )
+    
+    def fetch_timeline(self, position, limit):
+        post_ids = timeline.read_post_ids(self.request.user, position, limit)
+        posts = Post.objects.select_related(*POST_RELATED).in_bulk(post_ids)
+        return [posts[pk] for pk in post_ids if pk in posts]
 
-class PostDetailView(generics.RetrieveAPIView):
-    queryset = Post.objects.filter(is_active=True)
+class PostDetailView(ReplicaReadMixin, PreloadedRetrieveMixin, generics.RetrieveAPIView):
+    queryset = Post.objects.filter(is_active=True).select_related(*POST_RELATED)
     serializer_class = PostSerializer
     permission_classes = [permissions.AllowAny]
 
@@ -148,13 +245,13 @@ class PostCreateView(generics.CreateAPIView):
     serializer_class = PostCreateSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class BusinessPostsView(generics.ListAPIView):
+class BusinessPostsView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
         business_id = self.kwargs['business_id']
-        return Post.objects.filter(business_id=business_id, is_active=True)
+        return Post.objects.filter(business_id=business_id, is_active=True).select_related(*POST_RELATED)
 
 # Like/Unlike Post
 class LikePostView(APIView):
@@ -162,26 +259,43 @@ class LikePostView(APIView):
     
     def post(self, request, post_id):
         post = get_object_or_404(Post, id=post_id, is_active=True)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
         
-        if created:
-            post.likes_count += 1
-            post.save()
-            return Response({'message': 'Post liked', 'liked': True, 'likes_count': post.likes_count})
-        else:
-            like.delete()
-            post.likes_count -= 1
-            post.save()
-            return Response({'message': 'Post unliked', 'liked': False, 'likes_count': post.likes_count})
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
+            if created:
+                likes_count = increment_post_counter(post, 'likes_count', 1)
+                return Response({'message': 'Post liked', 'liked': True, 'likes_count': likes_count})
+            
+            # Only the request that actually removed the row decrements
+            with counted_by_caller():
+                deleted, _ = Like.objects.filter(pk=like.pk).delete()
+            if deleted:
+                likes_count = increment_post_counter(post, 'likes_count', -1)
+            else:
+                likes_count = current_post_counter(post, 'likes_count')
+            return Response({'message': 'Post unliked', 'liked': False, 'likes_count': likes_count})
 
 # Comment Views
-class CommentListView(generics.ListAPIView):
+class CommentListView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CommentCursorPagination
     
     def get_queryset(self):
         post_id = self.kwargs['post_id']
-        return Comment.objects.filter(post_id=post_id, parent=None, is_active=True)
+        return Comment.objects.filter(post_id=post_id, root=None, is_active=True).select_related('user')
+
+class CommentRepliesView(ReplicaReadMixin, generics.ListAPIView):
+    """All replies of a thread, at any depth, oldest first"""
+    serializer_class = ReplySerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = CommentCursorPagination
+    
+    def get_queryset(self):
+        thread = get_object_or_404(
+            Comment, id=self.kwargs['comment_id'], post_id=self.kwargs['post_id'], root=None, is_active=True
+        )
+        return Comment.objects.filter(root=thread, is_active=True).select_related('user')
 
 class CommentCreateView(generics.CreateAPIView):
     serializer_class = CommentSerializer
@@ -190,11 +304,13 @@ class CommentCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         post_id = self.kwargs['post_id']
         post = get_object_or_404(Post, id=post_id)
-        serializer.save(user=self.request.user, post=post)
+        parent = serializer.validated_data.get('parent')
+        if parent is not None and parent.post_id != post.pk:
+            raise serializers.ValidationError({'parent': 'Reply to a comment on the same post.'})
         
-        # Update comment count
-        post.comments_count += 1
-        post.save()
+        with transaction.atomic():
+            serializer.save(user=self.request.user, post=post)
+            increment_post_counter(post, 'comments_count', 1)
 
 # Chat Views
 class ChatListView(generics.ListAPIView):
@@ -202,18 +318,31 @@ class ChatListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Chat.objects.filter(participants=self.request.user, is_active=True)
+        return (
+            Chat.objects.filter(participants=self.request.user, is_active=True)
+            .select_related(*CHAT_RELATED)
+        )
 
 class ChatDetailView(generics.RetrieveAPIView):
     serializer_class = ChatSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Chat.objects.filter(participants=self.request.user)
+        return Chat.objects.filter(participants=self.request.user).select_related(*CHAT_RELATED)
+
+class MarkChatReadView(APIView):
+    """Mark every message of a chat sent by the other participants as read"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, chat_id):
+        chat = get_object_or_404(Chat, id=chat_id, participants=request.user)
+        marked = chats.mark_read(chat, request.user)
+        return Response({'message': 'Chat marked as read', 'marked': marked})
 
 class MessageListView(generics.ListAPIView):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MessageCursorPagination
     
     def get_queryset(self):
         chat_id = self.kwargs['chat_id']
@@ -227,12 +356,15 @@ class MessageCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         chat_id = self.kwargs['chat_id']
         chat = get_object_or_404(Chat, id=chat_id, participants=self.request.user)
-        serializer.save(sender=self.request.user, chat=chat)
+        # With the inbox preview and unread counters zooner.signals updates
+        with transaction.atomic():
+            serializer.save(sender=self.request.user, chat=chat)
 
 # Notification Views
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
     
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
@@ -247,8 +379,26 @@ class MarkNotificationReadView(APIView):
         notification.save()
         return Response({'message': 'Notification marked as read'})
 
+# Engagement ingestion
+class EngagementIngestView(APIView):
+    """Batches of UserEngagement events from the app, written in bulk by zooner.engagement"""
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'engagement'
+    
+    def post(self, request):
+        serializer = EngagementBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            accepted = engagement.accept(request.user, serializer.validated_data['events'])
+        except engagement.Backpressure:
+            retry_after = settings.ZONER_SETTINGS['ENGAGEMENT_FLUSH_INTERVAL']
+            return Response({'message': 'Too many events waiting to be stored, retry later'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': str(retry_after)})
+        return Response({'accepted': accepted}, status=status.HTTP_202_ACCEPTED)
+
 # Search View
-class SearchView(APIView):
+class SearchView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
@@ -258,11 +408,28 @@ class SearchView(APIView):
         if not query:
             return Response({'message': 'Query parameter required'}, status=status.HTTP_400_BAD_REQUEST)
         
+        backend = search.get_backend()
+        if backend is not None:
+            # Ranked full-text search over the search index
+            town_ids = search.town_ids_matching(town_name) if town_name else None
+            businesses = in_order(
+                Business.objects.filter(status='active').select_related(*BUSINESS_RELATED),
+                backend.search('business', query, town_ids),
+            )
+            posts = in_order(
+                Post.objects.filter(is_active=True).select_related(*POST_RELATED),
+                backend.search('post', query, town_ids),
+            )
+            return Response({
+                'businesses': BusinessSerializer(businesses, many=True, context={'request': request}).data,
+                'posts': PostSerializer(posts, many=True, context={'request': request}).data
+            })
+        
         # Search businesses
         businesses = Business.objects.filter(
             Q(name__icontains=query) | Q(description__icontains=query),
             status='active'
-        )
+        ).select_related(*BUSINESS_RELATED)
         
         if town_name:
             businesses = businesses.filter(town__name__icontains=town_name)
@@ -271,33 +438,120 @@ class SearchView(APIView):
         posts = Post.objects.filter(
             Q(caption__icontains=query) | Q(tags__icontains=query),
             is_active=True
-        )
+        ).select_related(*POST_RELATED)
         
         if town_name:
             posts = posts.filter(business__town__name__icontains=town_name)
         
         return Response({
-            'businesses': BusinessSerializer(businesses[:10], many=True).data,
+            'businesses': BusinessSerializer(businesses[:10], many=True, context={'request': request}).data,
             'posts': PostSerializer(posts[:10], many=True, context={'request': request}).data
         })
 
 # Dashboard Stats (for business owners)
-class DashboardStatsView(APIView):
+class DashboardStatsView(CachedResponseMixin, generics.RetrieveAPIView):
+    """
+    Business owner dashboard: lifetime totals from the maintained counters
+    and the last ``?days=`` (7, 30 or 90) of daily metrics from the
+    BusinessAnalytics rollups (zooner.analytics). Cached per owner.
+    """
+    serializer_class = DashboardBusinessSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_authenticated = True
+    cache_timeout = settings.ZONER_SETTINGS['DASHBOARD_CACHE_TTL']
+    ranges = (7, 30, 90)
+    default_range = 30
     
-    def get(self, request):
+    def get_cache_namespaces(self):
+        return ('dashboards', dashboard_namespace(self.request.user.pk))
+    
+    def retrieve(self, request, *args, **kwargs):
         if request.user.role != 'business':
             return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        days = request.query_params.get('days', str(self.default_range))
+        if not days.isdigit() or int(days) not in self.ranges:
+            return Response({'days': f'Choose one of {", ".join(map(str, self.ranges))}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        days = int(days)
+        last_day = timezone.localdate()
+        first_day = last_day - timedelta(days=days - 1)
+        
         businesses = Business.objects.filter(owner=request.user)
-        total_followers = Follow.objects.filter(business__in=businesses).count()
-        total_posts = Post.objects.filter(business__in=businesses).count()
-        total_likes = Like.objects.filter(post__business__in=businesses).count()
+        counters = businesses.aggregate(
+            total_businesses=Count('id'), total_followers=Sum('followers_count'),
+            total_posts=Sum('posts_count'), total_likes=Sum('likes_count'),
+        )
+        daily, per_business = analytics.summarize(businesses, first_day, last_day)
+        series = [
+            {'date': day, **daily.get(day, analytics.empty_metrics())}
+            for day in (first_day + timedelta(days=offset) for offset in range(days))
+        ]
+        businesses = list(businesses.order_by('name'))
+        context = self.get_serializer_context()
+        context['business_periods'] = {
+            business.pk: per_business.get(business.pk, analytics.empty_metrics()) for business in businesses
+        }
+        
+        return Response({
+            **{name: value or 0 for name, value in counters.items()},
+            'days': days,
+            'as_of': analytics.last_rollup(),
+            'period': analytics.total(daily.values()),
+            'daily': series,
+            'businesses': DashboardBusinessSerializer(businesses, many=True, context=context).data,
+        })
+
+
+class BusinessAnalyticsView(APIView):
+    """
+    Chart data of one business for its owner: the BusinessAnalytics rollups
+    between ``?from=`` and ``?to=`` (YYYY-MM-DD, the last 30 days by default)
+    summed per ``?bucket=`` day, week or month (zooner.analytics.series).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_range = 30
+    
+    def get(self, request, business_id):
+        business = get_object_or_404(Business, id=business_id)
+        if business.owner_id != request.user.pk:
+            return Response({'message': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in analytics.BUCKETS:
+            return Response({'bucket': f'Choose one of {", ".join(analytics.BUCKETS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        errors = {}
+        last_day = self.parse_day('to', timezone.localdate(), errors)
+        first_day = self.parse_day('from', last_day and last_day - timedelta(days=self.default_range - 1), errors)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        if first_day > last_day:
+            return Response({'from': 'Must not be after "to".'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = settings.ZONER_SETTINGS['ANALYTICS_MAX_POINTS']
+        if analytics.bucket_count(first_day, last_day, bucket) > limit:
+            return Response({'bucket': f'At most {limit} points per series; use a larger bucket or a shorter range.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        points = analytics.series(business.pk, first_day, last_day, bucket)
         return Response({
-            'total_businesses': businesses.count(),
-            'total_followers': total_followers,
-            'total_posts': total_posts,
-            'total_likes': total_likes,
-            'businesses': BusinessSerializer(businesses, many=True).data
-        })
\ No newline at end of file
+            'business': business.pk,
+            'from': first_day,
+            'to': last_day,
+            'bucket': bucket,
+            'as_of': analytics.last_rollup(),
+            'total': analytics.total(points),
+            'series': points,
+        })
+    
+    def parse_day(self, name, default, errors):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            errors[name] = 'Enter a date as YYYY-MM-DD.'
+        return day
\ No newline at end of file
@@ -0,0 +1,165 @@
+# ============================================================================
+# WEBSOCKET.PY - /ws/ endpoint pushing chat and notification events
+# ============================================================================
+#
+# A plain ASGI application, mounted next to Django in zonner_backend.asgi.
+# Clients connect to /ws/?token=<JWT access token> and receive JSON events:
+#
+#   {"type": "message", "chat": ..., "message": {...}}   new chat message
+#   {"type": "typing", "chat": ..., "user": ...}          participant typing
+#   {"type": "read", "chat": ..., "user": ..., "read_at": ...}
+#   {"type": "notification", "notification": {...}}
+#
+# and may send:
+#
+#   {"type": "ping"}                     answered with {"type": "pong"}
+#   {"type": "typing", "chat": <id>}     relayed to the other participants
+#   {"type": "read", "chat": <id>}       same as POST /api/chats/<id>/read/
+#
+# Each socket costs one subscription and two idle coroutines, so a single
+# worker holds thousands of them; see `manage.py benchmark_realtime`.
+
+import asyncio
+import json
+import time
+import uuid
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from . import chats, realtime
+from .models import Chat
+
+PATH = '/ws/'
+TYPING_INTERVAL = 3  # Seconds between relayed typing events per chat and socket
+
+# Close codes (4000-4999 are left to applications)
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_DISABLED = 4503
+
+
+def database_sync_to_async(func):
+    """sync_to_async for ORM work, releasing stale connections like a request would"""
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper)
+
+
+@database_sync_to_async
+def authenticate(token):
+    auth = JWTAuthentication()
+    try:
+        user = auth.get_user(auth.get_validated_token(token))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    return user if user.is_active else None
+
+
+@database_sync_to_async
+def chat_participants(chat_id, user):
+    """Participant ids of a chat ``user`` is in, or None"""
+    participants = chats.participant_ids(chat_id)
+    return participants if user.pk in participants else None
+
+
+@database_sync_to_async
+def mark_read(chat_id, user):
+    return chats.mark_read(Chat.objects.get(pk=chat_id), user)
+
+
+class Connection:
+
+    def __init__(self, user, send):
+        self.user = user
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self._participants = {}  # chat id -> participant ids
+        self._typing_sent = {}   # chat id -> monotonic time
+
+    async def send_json(self, data):
+        async with self._send_lock:
+            await self._send({'type': 'websocket.send', 'text': json.dumps(data, cls=DjangoJSONEncoder)})
+
+    async def serve(self, receive):
+        subscription = await realtime.get_broker().subscribe(realtime.user_channel(self.user.pk))
+        pusher = asyncio.create_task(self.push(subscription))
+        try:
+            await self.send_json({'type': 'connected', 'user': str(self.user.pk)})
+            while True:
+                event = await receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    await self.handle(event.get('text') or event.get('bytes') or '')
+        finally:
+            pusher.cancel()
+            await subscription.close()
+
+    async def push(self, subscription):
+        while True:
+            await self.send_json(await subscription.get())
+
+    async def handle(self, raw):
+        try:
+            data = json.loads(raw)
+            kind = data['type']
+        except (ValueError, TypeError, KeyError):
+            return await self.send_json({'type': 'error', 'detail': 'Expected a JSON object with a "type"'})
+
+        if kind == 'ping':
+            return await self.send_json({'type': 'pong'})
+        if kind not in ('typing', 'read'):
+            return await self.send_json({'type': 'error', 'detail': f'Unknown event type "{kind}"'})
+
+        try:
+            chat_id = str(uuid.UUID(str(data.get('chat'))))
+        except ValueError:
+            chat_id = None
+        participants = await self.participants(chat_id) if chat_id else None
+        if participants is None:
+            return await self.send_json({'type': 'error', 'detail': 'Chat not found', 'chat': data.get('chat')})
+
+        if kind == 'typing':
+            now = time.monotonic()
+            if now - self._typing_sent.get(chat_id, 0) >= TYPING_INTERVAL:
+                self._typing_sent[chat_id] = now
+                others = [pk for pk in participants if pk != self.user.pk]
+                # A blocking round trip with RedisBroker: off the event loop,
+                # and not queued behind the ORM's thread
+                await sync_to_async(realtime.publish_to_users, thread_sensitive=False)(
+                    others, realtime.typing_event(chat_id, self.user.pk))
+        else:
+            await mark_read(chat_id, self.user)
+
+    async def participants(self, chat_id):
+        if chat_id not in self._participants:
+            participants = await chat_participants(chat_id, self.user)
+            if participants is None:
+                return None
+            self._participants[chat_id] = participants
+        return self._participants[chat_id]
+
+
+async def websocket_application(scope, receive, send):
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    if scope['path'] != PATH:
+        return await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+    if not realtime.is_enabled():
+        return await send({'type': 'websocket.close', 'code': CLOSE_DISABLED})
+
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+    user = await authenticate(token) if token else None
+    if user is None:
+        return await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+
+    await send({'type': 'websocket.accept'})
+    await Connection(user, send).serve(receive)